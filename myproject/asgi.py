@@ -12,5 +12,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+os.environ.setdefault('PORTAL_DB_PROFILE', 'production') # WAL, persistent connections, read routing
+# Serve the native async portal views (see portal/async_views.py)
+os.environ.setdefault('PORTAL_ASYNC_VIEWS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# STATIC_ROOT is answered before Django: precompressed, immutable, zero-copy if the server can
+from portal.static_assets import StaticFilesASGI  # noqa: E402
+
+application = StaticFilesASGI(django_application)
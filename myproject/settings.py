@@ -7,6 +7,10 @@ from pathlib import Path
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Runtime files: the cache, rate-limit, lockout and metrics stores and portal.log.
+# `manage.py test` moves them to a throwaway directory (see TEST_RUNNER below).
+RUNTIME_DIR = Path(os.environ.get('PORTAL_RUNTIME_DIR', BASE_DIR))
+
 
 # ==============================================================================
 # CORE DJANGO SETTINGS
@@ -38,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'portal.metrics.MetricsMiddleware', # First, so its timing covers everything below
+    'portal.jsonlog.RequestLogContextMiddleware', # Request id / user / view / latency on portal log records
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     
@@ -70,6 +76,13 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'myproject.wsgi.application'
 
+# Route login/dashboard/resources to portal/async_views.py. myproject/asgi.py
+# switches this on; WSGI deployments keep the sync views in portal/views.py.
+PORTAL_ASYNC_VIEWS = os.environ.get('PORTAL_ASYNC_VIEWS', '0') == '1'
+
+# Runs the tests with RUNTIME_DIR (above) in a temporary directory
+TEST_RUNNER = 'portal.test_runner.IsolatedRuntimeTestRunner'
+
 
 # Database
 DATABASES = {
@@ -79,21 +92,145 @@ DATABASES = {
     }
 }
 
+# Deployment profile for SQLite; myproject/wsgi.py and myproject/asgi.py switch it
+# on, manage.py (tests, migrations, runserver) keeps the plain settings above.
+PORTAL_DB_PROFILE = os.environ.get('PORTAL_DB_PROFILE', 'default')
+
+# Run on every new connection: WAL lets readers and the single writer proceed in
+# parallel; NORMAL only fsyncs at checkpoints (a power loss can drop the last
+# commits, never corrupt the file); reads come from a 256 MiB memory map and a
+# 64 MiB page cache.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL;'
+    'PRAGMA synchronous=NORMAL;'
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA cache_size=-65536;'
+    'PRAGMA temp_store=MEMORY;'
+)
+# The read-only 'replica' connection must not write: setting journal_mode is a
+# write on a file not in WAL yet (it is persistent, so 'default' switches the
+# file once, see portal/db_router.py), and synchronous only matters to writers.
+SQLITE_READ_PRAGMAS = (
+    'PRAGMA mmap_size=268435456;'
+    'PRAGMA cache_size=-65536;'
+    'PRAGMA temp_store=MEMORY;'
+)
+
+if PORTAL_DB_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600, # Keep connections (and their page cache) across requests
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS,
+            # Take the write lock at BEGIN: a deferred transaction that reads first
+            # cannot wait for the lock later and fails with "database is locked".
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20, # Seconds a writer waits for the lock
+        },
+    })
+    # The same file opened read-only; portal.db_router sends reads here
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'uri': True, 'init_command': SQLITE_READ_PRAGMAS, 'timeout': 20},
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_ROUTERS = ['portal.db_router.ReadReplicaRouter']
+
 
 # ==============================================================================
-# CACHING (FIXED: Switched to FileSystemCache for persistence)
+# CACHING (Single-file SQLite cache with an expiry index, see portal/cache_backends.py)
 # ==============================================================================
 
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
-        # IMPORTANT: This must be an existing, writable directory
-        'LOCATION': BASE_DIR / 'django_cache_files', 
+        'BACKEND': 'portal.cache_backends.SQLiteCache',
+        # Created on first use; the -wal/-shm companions live next to it
+        'LOCATION': RUNTIME_DIR / 'django_cache.sqlite3', 
         'TIMEOUT': 300, # Default timeout matches your 5-minute lockout time
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 3, # Drop 1/3 of the entries when MAX_ENTRIES is exceeded
+            'CULL_EVERY': 100, # Writes between cull passes
+        },
     }
 }
 
 
+# ==============================================================================
+# RATE LIMITING & LOGIN LOCKOUT (see portal/ratelimit.py, portal/lockout.py)
+# ==============================================================================
+
+# SQLiteBackend shares buckets between all worker processes on this host;
+# 'portal.ratelimit.MemoryBackend' is per-process and needs no file.
+RATE_LIMIT_BACKEND = 'portal.ratelimit.SQLiteBackend'
+RATE_LIMIT_OPTIONS = {
+    'path': RUNTIME_DIR / 'ratelimit.sqlite3',
+}
+# Per-view overrides of the @rate_limit(limit, period) defaults, keyed by view function name
+RATE_LIMITS = {
+    # 'dashboard_view': {'limit': 20, 'period': 60},
+}
+
+# Failed-login counters for login_view (see portal/lockout.py), shared by all workers
+LOGIN_LOCKOUT_DB = RUNTIME_DIR / 'lockout.sqlite3'
+
+
+# ==============================================================================
+# RESOURCE LISTING (Keyset pagination, see portal/pagination.py)
+# ==============================================================================
+
+RESOURCES_PAGE_SIZE = 20 # Default rows per list; override per request with ?page_size=
+RESOURCES_MAX_PAGE_SIZE = 100 # Hard ceiling so ?page_size= cannot request the whole table
+RESOURCES_CACHE_TIMEOUT = 300 # Lifetime of cached lists; writes invalidate them immediately anyway
+
+
+# ==============================================================================
+# DUPLICATE RESOURCES (normalized URLs + MinHash/LSH, see portal/duplicates.py)
+# ==============================================================================
+
+# What the add form does with a submission that matches an existing resource:
+# 'warn' asks for confirmation, 'reject' refuses it, 'off' skips the check
+RESOURCE_DUPLICATES = 'warn'
+RESOURCE_DUPLICATE_SIMILARITY = 0.7 # Estimated Jaccard similarity of the descriptions' word 3-grams
+
+
+# ==============================================================================
+# URL LIVENESS CHECKS (`manage.py check_resource_urls`, see portal/linkcheck.py)
+# ==============================================================================
+
+LINK_CHECK_CONCURRENCY = 20 # URLs checked at the same time
+LINK_CHECK_PER_HOST = 2 # Requests in flight to any one host
+LINK_CHECK_TIMEOUT = 10 # Seconds per URL, redirects included
+LINK_CHECK_MAX_AGE = 24 * 3600 # A rerun rechecks URLs checked longer ago than this
+LINK_CHECK_ALLOW_PRIVATE = False # Refuse hosts on private/loopback addresses (resource URLs are user input)
+
+
+# ==============================================================================
+# BACKGROUND TASKS (Task table, `manage.py run_workers`, see portal/taskqueue.py)
+# ==============================================================================
+
+TASK_WORKER_PROCESSES = 1 # Processes started by run_workers
+TASK_WORKER_THREADS = 4 # Tasks run at the same time per process
+TASK_VISIBILITY_TIMEOUT = 300 # Seconds a claimed task is hidden; a crashed worker's tasks run again after this
+TASK_MAX_ATTEMPTS = 5 # Runs before a task that keeps raising is marked failed
+TASK_RETRY_BACKOFF = 10 # Seconds before the first retry, doubled for each further one (at most an hour)
+TASK_POLL_INTERVAL = 0.5 # Seconds an idle worker waits before looking again (adds up to this to the queue lag)
+
+
+# ==============================================================================
+# METRICS (MetricsMiddleware + /metrics/, see portal/metrics.py)
+# ==============================================================================
+
+# Each worker writes its totals here every METRICS_FLUSH_INTERVAL seconds and
+# /metrics/ adds them up; None keeps every worker's metrics to itself.
+METRICS_DB = RUNTIME_DIR / 'metrics.sqlite3'
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1'] # Scrapers allowed to read /metrics/
+
+
 # ==============================================================================
 # PASSWORD CONFIGURATION
 # ==============================================================================
@@ -116,12 +253,20 @@ AUTH_PASSWORD_VALIDATORS = [
 
 # Password hashers 
 PASSWORD_HASHERS = [
-    'django.contrib.auth.hashers.Argon2PasswordHasher', 
+    'portal.hashers.CalibratedArgon2PasswordHasher', # Argon2id, cost from PASSWORD_ARGON2_PARAMS
     'django.contrib.auth.hashers.PBKDF2PasswordHasher',
     'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
     'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
 ]
 
+# Argon2 cost; re-run `python manage.py calibrate_hashers` on the production host
+# and paste its output here. Stored hashes are upgraded on each user's next login.
+PASSWORD_ARGON2_PARAMS = {'time_cost': 2, 'memory_cost': 102400, 'parallelism': 8}
+
+# >0 runs every Argon2 hash/verify in a pool of this many processes, so a login
+# storm queues behind a fixed number of cores instead of occupying every worker.
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', '0'))
+
 
 # Internationalization
 LANGUAGE_CODE = 'en-us'
@@ -140,6 +285,14 @@ STATICFILES_DIRS = [
 ]
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# collectstatic writes content-hashed names plus .gz/.br variants; myproject/wsgi.py
+# and myproject/asgi.py serve them (see portal/static_assets.py)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'portal.static_assets.CompressedManifestStaticFilesStorage'},
+}
+STATIC_CACHE_MAX_AGE = 60 # Seconds browsers may cache unhashed names; hashed ones are immutable for a year
+
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -149,9 +302,26 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # AUTHENTICATION & SESSIONS
 # ==============================================================================
 
+AUTH_USER_MODEL = 'portal.CustomUser' # Resource.created_by points here, so request.user must be one
+# Databases from before this setting keep their accounts in auth_user: `manage.py migrate`
+# (portal 0003_adopt_auth_users) moves them, their groups and permissions and the admin log over
+
 LOGIN_REDIRECT_URL = 'dashboard' 
 LOGIN_URL = 'login' 
 
+# django_session rows read through the 'default' cache and rewritten only when
+# they change (see portal/session_backend.py)
+SESSION_ENGINE = 'portal.session_backend'
+SESSION_CACHE_ALIAS = 'default' # Must be shared by all workers, so logouts take effect everywhere
+SESSION_EXPIRY_REFRESH = 3600 # With SESSION_SAVE_EVERY_REQUEST, an unchanged session's expiry is written at most this often
+SESSION_CLEANUP_BATCH_SIZE = 500 # clearsessions deletes expired rows this many per transaction
+SESSION_CLEANUP_PAUSE = 0.05 # Seconds between those transactions
+
+# Taken usernames and emails, answered by a per-worker Bloom filter for
+# /register/check/ and the registration form (see portal/availability.py)
+AVAILABILITY_ERROR_RATE = 0.01 # Share of free names that still cost an iexact query
+AVAILABILITY_REBUILD_INTERVAL = 3600 # Seconds; a rebuild forgets deleted and renamed accounts
+
 
 # ==============================================================================
 # SECURITY HEADERS & LOGGING
@@ -182,11 +352,13 @@ LOGGING = {
         },
         'file': {
             'level': 'INFO',
-            'class': 'logging.handlers.RotatingFileHandler',
-            'filename': BASE_DIR / 'portal.log',
+            # Rotating file written by a background thread in batches (see portal/jsonlog.py)
+            'class': 'portal.jsonlog.QueuedRotatingFileHandler',
+            'filename': RUNTIME_DIR / 'portal.log',
             'maxBytes': 1024 * 1024 * 5, 
             'backupCount': 5,
-            'formatter': 'verbose',
+            'formatter': 'json',
+            'queue_size': 10000, # Records waiting beyond this are dropped (portal_log_records_dropped_total)
         },
     },
     'formatters': {
@@ -194,6 +366,9 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {process:d} {thread:d} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'portal.jsonlog.JSONFormatter', # JSON lines with request_id, user_id, view, latency_ms
+        },
     },
     'loggers': {
         'django': {
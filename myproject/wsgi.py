@@ -11,6 +11,10 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from portal.static_assets import StaticFilesWSGI
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+os.environ.setdefault('PORTAL_DB_PROFILE', 'production') # WAL, persistent connections, read routing
 
-application = get_wsgi_application()
+# STATIC_ROOT is answered before Django: precompressed, immutable, via sendfile
+application = StaticFilesWSGI(get_wsgi_application())
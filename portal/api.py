@@ -0,0 +1,102 @@
+# portal/api.py
+#
+# Read-only JSON API over resources for the front-end and mobile clients.
+# Both endpoints are conditional: the ETag is the resource cache generation
+# (bumped on every resource write, see resource_cache.py) and Last-Modified the
+# time of that bump. A client revalidating with If-None-Match or
+# If-Modified-Since gets a 304 after one cache lookup, without any rows being
+# loaded; a full response serves the rows from the cached query layer.
+
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.http import JsonResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_safe
+
+from .models import Resource
+from .pagination import get_page_size, link_params
+from . import resource_cache
+
+
+# --- Validators ---
+
+def _validators(request):
+    # condition() asks for the ETag and Last-Modified separately; look them up once
+    if not hasattr(request, '_resource_validators'):
+        request._resource_validators = resource_cache.get_validators()
+    return request._resource_validators
+
+
+def resources_etag(request, *args, **kwargs):
+    # Weak: equal generations mean equal data, not byte-identical JSON (a creator may be renamed)
+    return f'W/"{_validators(request)[0]}"'
+
+
+def resources_last_modified(request, *args, **kwargs):
+    # HTTP dates have whole seconds: within a second of a write, a second write could
+    # share this timestamp, so none is sent until the second is over (the ETag still is)
+    modified = _validators(request)[1]
+    if time.time() - modified < 1:
+        return None
+    return datetime.fromtimestamp(modified, dt_timezone.utc)
+
+
+def api_login_required(view_func):
+    """Like login_required, but answers 401 JSON instead of redirecting to the login page."""
+    @wraps(view_func)
+    def _wrapped_view(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required.'}, status=401)
+        return view_func(request, *args, **kwargs)
+    return _wrapped_view
+
+
+def resource_api_view(view_func):
+    """GET/HEAD only, logged-in users only, always revalidated, answered conditionally."""
+    view_func = condition(etag_func=resources_etag, last_modified_func=resources_last_modified)(view_func)
+    view_func = cache_control(private=True, no_cache=True)(view_func)
+    return require_safe(api_login_required(view_func))
+
+
+def serialize(row):
+    """A resource row as the cached query layer holds it (see resource_cache._queryset())."""
+    return {
+        'id': row['id'],
+        'title': row['title'],
+        'description': row['description'],
+        'url': row['url'],
+        'resource_type': row['resource_type'],
+        'created_at': row['created_at'].isoformat(),
+        'created_by': row['created_by_username'],
+    }
+
+
+# --- Endpoints ---
+
+@resource_api_view
+def resource_list_api(request):
+    """
+    Newest-first, keyset-paginated resources: ?type=PROJECT|PROGRAM (default both),
+    ?page_size=, ?cursor= (the next/previous value of an earlier response).
+    """
+    resource_type = request.GET.get('type') or None
+    if resource_type is not None and resource_type not in dict(Resource.RESOURCE_CHOICES):
+        return JsonResponse({'error': f"type must be one of {', '.join(dict(Resource.RESOURCE_CHOICES))}."}, status=400)
+    generation = _validators(request)[0]
+    page = resource_cache.get_page(link_params(request, ['cursor']), resource_type, 'cursor', get_page_size(request), generation)
+    return JsonResponse({
+        'results': [serialize(row) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+@resource_api_view
+def resource_detail_api(request, pk):
+    """One resource by id."""
+    row = resource_cache.get_row(pk)
+    if row is None:
+        return JsonResponse({'error': 'Not found.'}, status=404)
+    return JsonResponse(serialize(row))
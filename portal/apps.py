@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PortalConfig(AppConfig):
     name = 'portal'
+
+    def ready(self):
+        # Registers the signal receivers (cache invalidation etc.)
+        from . import signals  # noqa: F401
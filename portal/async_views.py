@@ -0,0 +1,126 @@
+# portal/async_views.py
+#
+# Native async versions of the hot portal views, routed by portal/urls.py when
+# settings.PORTAL_ASYNC_VIEWS is on (myproject/asgi.py turns it on). Under ASGI
+# a sync view costs a sync_to_async thread hop per request; these views await
+# the async ORM / auth / cache APIs instead. views.py stays the WSGI path.
+
+import logging
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth import alogin
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render, redirect
+
+from .forms import ResourceForm, LoginForm
+from .lockout import get_store as get_lockout_store
+from .pagination import get_page_size
+from .ratelimit import rate_limit
+from .views import MAX_LOGIN_ATTEMPTS, LOCKOUT_TIME
+from . import resource_cache, summary
+
+logger = logging.getLogger('portal')
+
+
+async def _resolve_user(request):
+    # Templates read request.user (a lazy, sync-loading object); swap in the
+    # user fetched through the async session/ORM path before rendering.
+    request.user = await request.auser()
+    return request.user
+
+
+# --- Authentication Views ---
+
+async def login_view(request):
+    """
+    Async twin of views.login_view (same lockout rules, messages and form errors).
+    The attempt is reserved in the LockoutStore before the password is checked.
+    """
+    form = LoginForm()
+    is_locked_out = False
+    lockout_time_remaining = 0
+
+    if request.method == 'POST':
+        form = LoginForm(request, data=request.POST)
+        username = request.POST.get('username')
+        cache_key = f"login_failed:{username}"
+        store = get_lockout_store()
+
+        # 1. Reserve an attempt (atomic count + expiry), refused once the limit is reached
+        attempt = await store.aattempt(cache_key, MAX_LOGIN_ATTEMPTS, LOCKOUT_TIME)
+
+        if not attempt.admitted:
+            is_locked_out = True
+            lockout_time_remaining = attempt.ttl
+            messages.error(request, f"Access denied. Too many failed login attempts. Account locked.")
+            logger.warning(f"Access denied for user {username}: Locked out for {LOCKOUT_TIME} seconds.")
+
+        # 2. Validate the form as the sync view does: AuthenticationForm.clean()
+        # authenticates (ORM + password hash), so it runs in a worker thread
+        elif await sync_to_async(form.is_valid)():
+            user = form.get_user()
+            await alogin(request, user)
+            logger.info(f"User login successful: {user.username}")
+            messages.success(request, f"Welcome back, {user.username}!")
+            await store.areset(cache_key)
+            return redirect('dashboard')
+
+        # 3. The reserved attempt failed (wrong credentials); it stays counted
+        else:
+            logger.warning(f"Failed login attempt for user: {username}.")
+            if attempt.count >= MAX_LOGIN_ATTEMPTS:
+                is_locked_out = True
+                lockout_time_remaining = LOCKOUT_TIME
+                messages.error(request, f"Access denied. Too many failed login attempts. Account locked.")
+            else:
+                remaining = MAX_LOGIN_ATTEMPTS - attempt.count
+                messages.error(request, f"Authentication failed. Check your credentials. You have {remaining} attempts remaining.")
+
+    context = {
+        'form': form,
+        'is_locked_out': is_locked_out,
+        'lockout_time_remaining': lockout_time_remaining
+    }
+    return render(request, 'login.html', context)
+
+
+# --- Core Application Views ---
+
+@login_required
+@rate_limit(limit=10, period=60)
+async def dashboard_view(request):
+    """Async twin of views.dashboard_view."""
+    user = await _resolve_user(request)
+    mine, site = await summary.afor_dashboard(user)
+    return render(request, 'dashboard.html', {'summary': mine, 'site_summary': site})
+
+
+@login_required
+async def resources_view(request):
+    """Async twin of views.resources_view (async cache fragments, async ORM on a miss)."""
+    user = await _resolve_user(request)
+    if request.method == 'POST':
+        form = ResourceForm(request.POST)
+        if form.is_valid() and await sync_to_async(form.check_duplicates)():
+            new_resource = form.save(commit=False)
+            new_resource.created_by = user
+            await new_resource.asave()
+            logger.info(f"Resource added by {user.username}: {new_resource.title} ({new_resource.resource_type})")
+            messages.success(request, f"{new_resource.resource_type} '{new_resource.title}' added successfully!")
+            return redirect('resources')
+        else:
+            messages.error(request, "Failed to add resource. Please check the form.")
+    else:
+        form = ResourceForm()
+
+    page_size = get_page_size(request)
+    projects_html = await resource_cache.arender_list(request, 'resources_projects.html', 'PROJECT', 'projects_cursor', page_size)
+    programs_html = await resource_cache.arender_list(request, 'resources_programs.html', 'PROGRAM', 'programs_cursor', page_size)
+
+    context = {
+        'projects_html': projects_html,
+        'programs_html': programs_html,
+        'form': form
+    }
+    return render(request, 'resources.html', context)
@@ -0,0 +1,164 @@
+# portal/availability.py
+#
+# "Is this username / email already taken?" without asking the CustomUser table
+# every time. The registration page asks on every keystroke (/register/check/),
+# and a case-insensitive match (username__iexact) is a LIKE that SQLite answers
+# by scanning the whole table.
+# Each worker keeps a Bloom filter of the taken usernames and emails, casefolded:
+# - built on the first check, and rebuilt every AVAILABILITY_REBUILD_INTERVAL
+#   seconds (or when it outgrows its capacity) to forget deleted and renamed
+#   accounts;
+# - users saved in this worker are added by a post_save receiver
+#   (portal/signals.py), and users other workers created are picked up before
+#   every check by one primary key range query (pk > the highest pk seen);
+# - "not in the filter" means free, no further query. "In the filter" may be a
+#   false positive (AVAILABILITY_ERROR_RATE of free names), so only then does
+#   the iexact query decide.
+# A user renamed (or an email changed) in another worker reads as free until the
+# next rebuild, so the filter only answers the live check: the registration form
+# runs the exact queries on submit (portal/forms.py).
+
+import hashlib
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .models import CustomUser
+
+logger = logging.getLogger('portal')
+
+# --- Defaults ---
+ERROR_RATE = 0.01 # Share of free names the filter reports as possibly taken
+REBUILD_INTERVAL = 3600 # Seconds between full rebuilds from the table
+MIN_CAPACITY = 10000 # Items a new filter is sized for, at least
+HEADROOM = 2 # A rebuilt filter has room for this many times the current items
+BUILD_CHUNK_SIZE = 5000 # Rows fetched per round trip while building
+# ----------------
+
+
+class BloomFilter:
+    """
+    Set of strings in a bit array, with `hashes` bit positions per item (double
+    hashing of one BLAKE2b digest). Never misses an added item; up to `capacity`
+    items, reports about `error_rate` of the others as present too.
+    """
+
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        self.capacity = max(int(capacity), 1)
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        step = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+def _keys(username, email):
+    # One filter for both kinds; casefold() matches at least what iexact matches
+    if username:
+        yield 'u:' + username.casefold()
+    if email:
+        yield 'e:' + email.casefold()
+
+
+class AvailabilityIndex:
+    """The taken usernames and emails of one worker (see the module comment)."""
+
+    def __init__(self, error_rate=ERROR_RATE, rebuild_interval=REBUILD_INTERVAL):
+        self.error_rate = error_rate
+        self.rebuild_interval = rebuild_interval
+        self.lock = threading.Lock() # Bit updates are read-modify-write
+        self.filter = None
+        self.last_pk = 0
+        self.built_at = 0.0
+
+    def rebuild(self):
+        """Builds a new filter from the whole table and swaps it in."""
+        start = time.monotonic()
+        users = CustomUser.objects.order_by().values_list('pk', 'username', 'email')
+        bloom = BloomFilter(max(users.count() * 2 * HEADROOM, MIN_CAPACITY), self.error_rate)
+        last_pk = 0
+        for pk, username, email in users.iterator(chunk_size=BUILD_CHUNK_SIZE):
+            for key in _keys(username, email):
+                bloom.add(key)
+            last_pk = max(last_pk, pk)
+        with self.lock:
+            self.filter, self.last_pk, self.built_at = bloom, last_pk, time.monotonic()
+        logger.info(f"Availability filter rebuilt: {bloom.count} names, {len(bloom.bits):,} bytes, "
+                    f"{(time.monotonic() - start) * 1000:.1f} ms")
+
+    def add(self, username, email):
+        """Marks a saved user's names as taken (post_save); nothing before the first build."""
+        with self.lock:
+            if self.filter is not None:
+                for key in _keys(username, email):
+                    self.filter.add(key)
+
+    def _refresh(self):
+        bloom = self.filter
+        if (bloom is None or bloom.count > bloom.capacity
+                or time.monotonic() - self.built_at > self.rebuild_interval):
+            self.rebuild()
+            return
+        # Users other workers created since the last look (an index range, usually empty)
+        new = list(CustomUser.objects.filter(pk__gt=self.last_pk).order_by('pk')
+                   .values_list('pk', 'username', 'email'))
+        if new:
+            with self.lock:
+                for pk, username, email in new:
+                    for key in _keys(username, email):
+                        self.filter.add(key)
+                self.last_pk = max(self.last_pk, new[-1][0])
+
+    def might_be_taken(self, username=None, email=None):
+        """False when the name is certainly free; True when the database has to decide."""
+        self._refresh()
+        return any(key in self.filter for key in _keys(username, email))
+
+    def username_taken(self, username):
+        return (self.might_be_taken(username=username)
+                and CustomUser.objects.filter(username__iexact=username).exists())
+
+    def email_taken(self, email):
+        return (self.might_be_taken(email=email)
+                and CustomUser.objects.filter(email__iexact=email).exists())
+
+
+# --- Index Selection ---
+
+_index = None
+
+
+def get_index():
+    """Returns this worker's index, configured by the AVAILABILITY_* settings."""
+    global _index
+    if _index is None:
+        _index = AvailabilityIndex(
+            error_rate=getattr(settings, 'AVAILABILITY_ERROR_RATE', ERROR_RATE),
+            rebuild_interval=getattr(settings, 'AVAILABILITY_REBUILD_INTERVAL', REBUILD_INTERVAL),
+        )
+    return _index
+
+
+@receiver(setting_changed)
+def _reset_index(setting, **kwargs):
+    global _index
+    if setting.startswith('AVAILABILITY_'):
+        _index = None
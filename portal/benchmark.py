@@ -0,0 +1,291 @@
+# portal/benchmark.py
+#
+# Load driver behind `manage.py benchmark` (portal/management/commands/benchmark.py).
+# The throwaway-database / runtime-state helpers are shared with scripts/benchutils.py.
+
+import http.cookiejar
+import json
+import statistics
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.urls import reverse
+
+# --- Scenario ---
+
+BENCH_USERNAME = 'bench'
+BENCH_PASSWORD = 'bench-Password-1'
+
+# Endpoint name: (method, URL name in portal/urls.py, query string, expected status)
+ENDPOINTS = {
+    'login_page': ('GET', 'login', '', 200), # Anonymous login form
+    'login': ('POST', 'login', '', 302), # Full credential check (password hash) + session rotation
+    'dashboard': ('GET', 'dashboard', '', 200),
+    'resources': ('GET', 'resources', '', 200),
+    'search': ('GET', 'search', '?q=resource', 200),
+}
+
+
+class BenchmarkError(Exception):
+    """Raised when the scenario cannot run (login refused, server not reachable, ...)."""
+
+
+# --- Throwaway State ---
+
+@contextmanager
+def throwaway_database(path=None):
+    """
+    Creates (and afterwards destroys) a migrated test database, so db.sqlite3 is
+    never touched. Pass a file path when several threads or processes need real
+    concurrent access (the default SQLite test database is in-memory).
+    Aliases with TEST MIRROR = 'default' (the read-only 'replica' of the
+    production profile) are pointed at it too, keeping mode=ro for a file.
+    """
+    from django.db import connection, connections
+    old_name = connection.settings_dict['NAME']
+    if path is not None:
+        connection.settings_dict['TEST']['NAME'] = str(path)
+    test_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    mirrors = {}
+    for alias in connections:
+        mirror = connections[alias]
+        if mirror.settings_dict['TEST'].get('MIRROR') == connection.alias:
+            mirrors[alias] = mirror.settings_dict['NAME']
+            mirror.close()
+            read_only = path is not None and 'mode=ro' in str(mirrors[alias])
+            mirror.settings_dict['NAME'] = f"file:{test_name}?mode=ro" if read_only else connection.settings_dict['NAME']
+    try:
+        yield connection
+    finally:
+        for alias, name in mirrors.items():
+            connections[alias].close()
+            connections[alias].settings_dict['NAME'] = name
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+@contextmanager
+def isolated_runtime_state(path=None):
+    """
+    Points the cache, rate-limit, lockout and metrics stores at a temporary
+    directory (or `path`) and lifts the per-view rate limits, so a benchmark
+    neither pollutes nor trips them.
+    """
+    from django.test import override_settings
+    with tempfile.TemporaryDirectory() as tmp:
+        state = path or tmp
+        with override_settings(
+            CACHES={'default': {'BACKEND': 'portal.cache_backends.SQLiteCache', 'LOCATION': f"{state}/cache.sqlite3"}},
+            RATE_LIMIT_OPTIONS={'path': f"{state}/ratelimit.sqlite3"},
+            RATE_LIMITS={view: {'limit': 10 ** 9, 'period': 60} for view in ('dashboard_view', 'register_check_view')},
+            LOGIN_LOCKOUT_DB=f"{state}/lockout.sqlite3",
+            METRICS_DB=f"{state}/metrics.sqlite3",
+        ):
+            yield state
+
+
+def seed(resources=500, users=1):
+    """
+    Creates `users` benchmark accounts and `resources` rows split between both
+    types. Returns the accounts as (username, password) pairs; each session logs
+    in as its own account, as parallel logins for one username trip the lockout.
+    """
+    from .models import CustomUser, Resource
+    accounts = [(f"{BENCH_USERNAME}{i}", BENCH_PASSWORD) for i in range(users)]
+    owners = [CustomUser.objects.create_user(username=username, password=password) for username, password in accounts]
+    Resource.objects.bulk_create(
+        Resource(title=f"Resource {i}", description=f"Benchmark resource number {i} " * 5,
+                 resource_type='PROJECT' if i % 2 else 'PROGRAM', created_by=owners[i % users])
+        for i in range(resources)
+    )
+    return accounts
+
+
+# --- Sessions ---
+#
+# A session is one browser: it keeps cookies (session + CSRF) between requests.
+# request() returns (status, queries); queries is None when it cannot be observed.
+
+class InProcessSession:
+    """Django test client with CSRF enforced; counts DB queries per request."""
+
+    def __init__(self):
+        from django.test import Client
+        self.client = Client(enforce_csrf_checks=True)
+
+    def csrf_token(self):
+        cookie = self.client.cookies.get(settings.CSRF_COOKIE_NAME)
+        return cookie.value if cookie else ''
+
+    def request(self, method, path, data=None):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as queries:
+            if method == 'POST':
+                response = self.client.post(path, data)
+            else:
+                response = self.client.get(path)
+        return response.status_code, len(queries)
+
+    def close(self):
+        # Worker threads each opened their own connection to the database file
+        from django.db import connections
+        connections.close_all()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    # Measure the request itself; a 302 surfaces as an HTTPError with its status code.
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HTTPSession:
+    """Cookie-keeping urllib client for a running server (queries are not observable)."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect)
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == settings.CSRF_COOKIE_NAME:
+                return cookie.value
+        return ''
+
+    def request(self, method, path, data=None):
+        url = self.base_url + path
+        body = urlencode(data).encode() if data is not None else None
+        # CsrfViewMiddleware checks the Referer against the host on HTTPS
+        request = urllib.request.Request(url, data=body, method=method, headers={'Referer': url})
+        try:
+            with self.opener.open(request, timeout=30) as response:
+                response.read()
+                return response.status, None
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code, None
+
+    def close(self):
+        pass
+
+
+def login(session, username, password):
+    """Fetches the login form (CSRF cookie) and posts the credentials."""
+    path = reverse('login')
+    session.request('GET', path)
+    status, _ = session.request('POST', path, {
+        'username': username, 'password': password, 'csrfmiddlewaretoken': session.csrf_token(),
+    })
+    if status != 302:
+        raise BenchmarkError(f"Login as '{username}' returned {status}, expected a redirect to the dashboard.")
+
+
+# --- Runner ---
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summarize(timings, queries, errors, elapsed):
+    """Collapses one endpoint's raw samples into the numbers that get reported and compared."""
+    ordered = sorted(timings)
+    counted = [count for count in queries if count is not None]
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 1),
+        'p50': round(percentile(ordered, 0.50), 2),
+        'p95': round(percentile(ordered, 0.95), 2),
+        'p99': round(percentile(ordered, 0.99), 2),
+        # Median, so the cold-cache first requests do not blur a steady-state count
+        'queries': statistics.median(counted) if counted else None,
+    }
+
+
+def run(session_factory, endpoints, requests, concurrency, accounts):
+    """
+    Logs `concurrency` sessions in (round-robin over the (username, password)
+    `accounts`), then drives each endpoint in turn with all of them at once,
+    `requests` requests in total per endpoint. Returns {endpoint: summary}; see
+    summarize().
+    """
+    sessions = [session_factory() for _ in range(concurrency)]
+    credentials = dict(zip(sessions, (accounts[i % len(accounts)] for i in range(concurrency))))
+    for session, (username, password) in credentials.items():
+        login(session, username, password)
+    anonymous = [session_factory() for _ in range(concurrency)]
+    per_worker = max(1, requests // concurrency)
+
+    results = {}
+    for name in endpoints:
+        method, url_name, query, expected = ENDPOINTS[name]
+        path = reverse(url_name) + query
+        pool_sessions = anonymous if name == 'login_page' else sessions
+
+        def worker(session):
+            username, password = credentials.get(session, (None, None))
+            timings, queries, errors = [], [], 0
+            try:
+                for _ in range(per_worker):
+                    data = None
+                    if method == 'POST':
+                        data = {'username': username, 'password': password, 'csrfmiddlewaretoken': session.csrf_token()}
+                    start = time.perf_counter()
+                    status, count = session.request(method, path, data)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    queries.append(count)
+                    errors += status != expected
+            finally:
+                session.close()
+            return timings, queries, errors
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(worker, pool_sessions))
+        elapsed = time.perf_counter() - start
+        results[name] = summarize(
+            [t for timings, _, _ in samples for t in timings],
+            [q for _, queries, _ in samples for q in queries],
+            sum(errors for _, _, errors in samples),
+            elapsed,
+        )
+    return results
+
+
+# --- Baselines ---
+
+def save_baseline(path, results, meta):
+    with open(path, 'w') as f:
+        json.dump({'meta': meta, 'endpoints': results}, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns one message per regression against a saved baseline: p95 latency up
+    or throughput down by more than `tolerance` (a fraction), or more DB queries
+    per request than before. Endpoints missing from the baseline are skipped.
+    """
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get('endpoints', {}).get(name)
+        if base is None:
+            continue
+        if current['p95'] > base['p95'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {current['p95']} ms vs baseline {base['p95']} ms")
+        if current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: {current['rps']} req/s vs baseline {base['rps']} req/s")
+        if None not in (current['queries'], base.get('queries')) and current['queries'] > base['queries']:
+            regressions.append(f"{name}: {current['queries']} queries/request vs baseline {base['queries']}")
+    return regressions
@@ -0,0 +1,256 @@
+# portal/cache_backends.py
+
+import math
+import pickle
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .sqlite_state import SQLiteStateFile
+
+_INT64_MIN, _INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+
+def _encode(value):
+    # Plain integers are stored as native SQLite INTEGERs so incr()/decr() can be
+    # a single UPDATE; everything else (bools included, to keep their type) is pickled.
+    if type(value) is int and _INT64_MIN <= value <= _INT64_MAX:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def _decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+def _offload(method):
+    return sync_to_async(method, thread_sensitive=False)
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache backend storing every entry in one WAL-mode SQLite file.
+
+    CACHES = {'default': {
+        'BACKEND': 'portal.cache_backends.SQLiteCache',
+        'LOCATION': BASE_DIR / 'django_cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_FREQUENCY': 3, 'CULL_EVERY': 100, 'BUSY_TIMEOUT': 5},
+    }}
+
+    Compared with FileBasedCache (one pickled file per key, culling by listing
+    the whole directory):
+    - lookups are a primary-key probe, get_many/set_many are one statement/transaction;
+    - expired entries are culled by a range delete on the expires index;
+    - incr()/decr() are atomic across processes (one UPDATE ... RETURNING);
+    - ttl() reports the remaining lifetime of a key;
+    - the async API (aget(), aincr(), ...) runs each call in a worker thread, see below.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS cache_entry (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            expires REAL
+        );
+        CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires);
+    """
+    # Parameter batches for IN (...) lists, below SQLite's host-parameter limit
+    BATCH_SIZE = 500
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._writes = 0
+        self.db = SQLiteStateFile(location, self.SCHEMA, float(options.get('BUSY_TIMEOUT', 5.0)))
+
+    # --- Reads ---
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self.db.execute(
+            'SELECT value FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            [key, time.time()],
+        ).fetchone()
+        return default if row is None else _decode(row[0])
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = {}
+        now = time.time()
+        made = list(key_map)
+        for start in range(0, len(made), self.BATCH_SIZE):
+            batch = made[start:start + self.BATCH_SIZE]
+            rows = self.db.execute(
+                f"SELECT key, value FROM cache_entry WHERE key IN ({','.join('?' * len(batch))})"
+                " AND (expires IS NULL OR expires > ?)",
+                [*batch, now],
+            )
+            for made_key, value in rows:
+                found[key_map[made_key]] = _decode(value)
+        return found
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.db.execute(
+            'SELECT 1 FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            [key, time.time()],
+        ).fetchone() is not None
+
+    def ttl(self, key, version=None):
+        """
+        Returns the seconds left before `key` expires, None for a key without expiry,
+        and 0 when the key is missing or already expired.
+        """
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        row = self.db.execute(
+            'SELECT expires FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            [key, now],
+        ).fetchone()
+        if row is None:
+            return 0
+        return None if row[0] is None else math.ceil(row[0] - now)
+
+    # --- Writes ---
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self.db.execute(
+            'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?)'
+            ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires',
+            [key, _encode(value), self.get_backend_timeout(timeout)],
+        )
+        self._wrote()
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        # Only an expired row may be overwritten; a live one makes the upsert a no-op.
+        cursor = self.db.execute(
+            'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?)'
+            ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires'
+            ' WHERE cache_entry.expires IS NOT NULL AND cache_entry.expires <= ?',
+            [key, _encode(value), self.get_backend_timeout(timeout), now],
+        )
+        self._wrote()
+        return cursor.rowcount == 1
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        rows = [(self.make_and_validate_key(key, version=version), _encode(value), expires) for key, value in data.items()]
+        conn = self.db.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT INTO cache_entry (key, value, expires) VALUES (?, ?, ?)'
+                ' ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires = excluded.expires',
+                rows,
+            )
+        self._wrote(len(rows))
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self.db.execute(
+            'UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            [self.get_backend_timeout(timeout), key, time.time()],
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self.db.execute(
+            "UPDATE cache_entry SET value = value + ? WHERE key = ? AND typeof(value) = 'integer'"
+            ' AND (expires IS NULL OR expires > ?) RETURNING value',
+            [delta, key, time.time()],
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"Key '{key}' not found")
+        return row[0]
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.db.execute('DELETE FROM cache_entry WHERE key = ?', [key]).rowcount == 1
+
+    def delete_many(self, keys, version=None):
+        made = [self.make_and_validate_key(key, version=version) for key in keys]
+        for start in range(0, len(made), self.BATCH_SIZE):
+            batch = made[start:start + self.BATCH_SIZE]
+            self.db.execute(f"DELETE FROM cache_entry WHERE key IN ({','.join('?' * len(batch))})", batch)
+
+    def clear(self):
+        self.db.execute('DELETE FROM cache_entry')
+
+    # --- Culling ---
+
+    def _wrote(self, count=1):
+        self._writes += count
+        if self._writes >= self._cull_every:
+            self._writes = 0
+            self.cull()
+
+    def cull(self):
+        """
+        Range-deletes expired entries via the expires index, then, if the table is
+        still over MAX_ENTRIES, drops the 1/CULL_FREQUENCY entries closest to expiry
+        (CULL_FREQUENCY = 0 empties the cache, as with Django's own backends).
+        """
+        conn = self.db.connection()
+        conn.execute('DELETE FROM cache_entry WHERE expires <= ?', [time.time()])
+        (count,) = conn.execute('SELECT COUNT(*) FROM cache_entry').fetchone()
+        if count > self._max_entries:
+            if self._cull_frequency == 0:
+                return self.clear()
+            conn.execute(
+                'DELETE FROM cache_entry WHERE key IN ('
+                ' SELECT key FROM cache_entry WHERE expires IS NOT NULL ORDER BY expires LIMIT ?)',
+                [count // self._cull_frequency],
+            )
+
+    # --- Async API ---
+    #
+    # Every operation can wait up to BUSY_TIMEOUT on a write lock, so none runs on
+    # the event loop. Unlike BaseCache's defaults, the calls go to the shared
+    # executor (thread_sensitive=False: connections are per thread) instead of
+    # queueing on the one thread-sensitive thread, and aget_many()/aset_many()
+    # stay one statement instead of one hop per key.
+
+    async def aget(self, key, default=None, version=None):
+        return await _offload(self.get)(key, default, version)
+
+    async def aget_many(self, keys, version=None):
+        return await _offload(self.get_many)(keys, version)
+
+    async def ahas_key(self, key, version=None):
+        return await _offload(self.has_key)(key, version)
+
+    async def attl(self, key, version=None):
+        return await _offload(self.ttl)(key, version)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return await _offload(self.set)(key, value, timeout, version)
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return await _offload(self.add)(key, value, timeout, version)
+
+    async def aset_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return await _offload(self.set_many)(data, timeout, version)
+
+    async def atouch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return await _offload(self.touch)(key, timeout, version)
+
+    async def aincr(self, key, delta=1, version=None):
+        return await _offload(self.incr)(key, delta, version)
+
+    async def adecr(self, key, delta=1, version=None):
+        return await _offload(self.incr)(key, -delta, version)
+
+    async def adelete(self, key, version=None):
+        return await _offload(self.delete)(key, version)
+
+    async def adelete_many(self, keys, version=None):
+        return await _offload(self.delete_many)(keys, version)
+
+    async def aclear(self):
+        return await _offload(self.clear)()
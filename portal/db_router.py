@@ -0,0 +1,50 @@
+# portal/db_router.py
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+READ_ALIAS = 'replica'
+
+
+class ReadReplicaRouter:
+    """
+    Sends reads to the read-only 'replica' connection (the same SQLite file,
+    opened with mode=ro, see the production profile in settings.py) and writes
+    to 'default'. Under WAL the two never block each other: a read holds no
+    lock a writer has to wait for.
+
+    Reads made while 'default' is inside a transaction stay on 'default', so
+    they see that transaction's own uncommitted writes and get-then-update code
+    (session saves, registrations) reads and writes one consistent snapshot.
+    """
+    def db_for_read(self, model, **hints):
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return READ_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True # One database behind both aliases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+@receiver(connection_created)
+def switch_to_wal(sender, connection, **kwargs):
+    """
+    A new replica connection may be the first one of the process, on a file that
+    is not in WAL yet (fresh from `manage.py migrate`, which keeps the plain
+    profile). It cannot switch the file itself (mode=ro): opening 'default' does,
+    through its init_command, and WAL stays set in the file from then on.
+    """
+    if connection.alias != READ_ALIAS:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        mode = cursor.fetchone()[0]
+    if mode != 'wal':
+        connections[DEFAULT_DB_ALIAS].ensure_connection()
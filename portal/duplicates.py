@@ -0,0 +1,304 @@
+# portal/duplicates.py
+#
+# Near-duplicate detection for resources: the same program posted again with a
+# slightly different URL (tracking parameters, trailing slash, http/https, www.)
+# and a copy-pasted description.
+# - URLs: normalize_url() reduces a URL to what identifies the page, stored in
+#   Resource.normalized_url under a UNIQUE index. The first resource with a URL
+#   holds it; duplicates kept on purpose (confirmed under 'warn', the admin,
+#   imports) store NULL, so the column stays unique and still finds the original.
+# - Descriptions: a MinHash signature in Resource.description_minhash: NUM_PERM
+#   minima over the word 3-grams, each 3-gram hashed NUM_PERM ways at once (the
+#   32-bit words of one SHAKE-128 output), cut into BANDS bands of ROWS
+#   values. Each band hashes to one ResourceBand.bucket; resources sharing a
+#   bucket are candidates, and the signatures' agreement estimates the Jaccard
+#   similarity of their 3-gram sets. With 16 bands of 4, pairs at 0.7 similarity
+#   share a bucket with probability 0.988, pairs at 0.3 with 0.12. (One changed
+#   word in a 25-word description already takes 3 of its 23 3-grams: ~0.77.)
+# find() answers the add form (ResourceForm.check_duplicates, under
+# settings.RESOURCE_DUPLICATES) with a few index seeks. The Resource signals
+# keep the fingerprints current on save() (portal/signals.py), import_resources
+# calls in for bulk_create(). cluster() groups the duplicates across the whole
+# table (`manage.py find_duplicate_resources`); reindex() recomputes everything,
+# e.g. after QuerySet.update() wrote descriptions or URLs.
+
+import hashlib
+import re
+import struct
+import time
+from collections import defaultdict, namedtuple
+from itertools import groupby
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+from .models import Resource, ResourceBand
+
+# --- Defaults ---
+SIMILARITY = 0.7 # Estimated Jaccard similarity from which descriptions count as duplicates
+MAX_CANDIDATES = 50 # Bucket matches compared at submit time
+REINDEX_BATCH_SIZE = 1000 # Resources per transaction in reindex()
+REINDEX_PAUSE = 0.05 # Seconds between those transactions, so other writers get the lock
+# ----------------
+
+# Changing any of these makes the stored signatures incomparable: run reindex()
+SHINGLE_SIZE = 3 # Words per shingle
+MIN_SHINGLES = 5 # Shorter descriptions get no signature (too few words to compare)
+NUM_PERM = 64 # Hash functions, i.e. signature values
+BANDS, ROWS = 16, 4 # BANDS * ROWS == NUM_PERM
+SIGNATURE = struct.Struct(f'<{NUM_PERM}I')
+
+# Query parameters that only say where a visitor came from
+TRACKING_PREFIXES = ('utm_', 'mc_', '_hs', 'pk_')
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'ref', 'ref_src', 'source', 'si'}
+
+Duplicate = namedtuple('Duplicate', 'resource reason similarity') # reason: 'url' or 'description'
+
+
+# --- Fingerprints ---
+
+def normalize_url(url):
+    """
+    Host (lowercase, without www. and default ports), path (without repeated and
+    trailing slashes) and the sorted non-tracking query parameters; the scheme
+    and fragment are dropped. None for an empty or unparsable URL.
+    """
+    if not url:
+        return None
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    host = (parts.hostname or '').removeprefix('www.')
+    if not host:
+        return None
+    if port and port not in (80, 443):
+        host += f':{port}'
+    path = re.sub(r'/{2,}', '/', parts.path).rstrip('/')
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not (key.lower() in TRACKING_PARAMS or key.lower().startswith(TRACKING_PREFIXES))
+    )
+    return host + path + ('?' + urlencode(query) if query else '')
+
+
+def shingles(text):
+    words = re.findall(r'\w+', (text or '').casefold())
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    """The MinHash signature of a description (NUM_PERM ints), or None if it is too short."""
+    grams = shingles(text)
+    if len(grams) < MIN_SHINGLES:
+        return None
+    # Per position, the minimum over the 3-grams (zip/min run in C, not per value in Python)
+    return list(map(min, zip(*(SIGNATURE.unpack(hashlib.shake_128(gram.encode()).digest(SIGNATURE.size))
+                               for gram in grams))))
+
+
+def pack(values):
+    return SIGNATURE.pack(*values) if values is not None else None
+
+
+def unpack(data):
+    return SIGNATURE.unpack(bytes(data)) if data else None
+
+
+def buckets(values):
+    """One signed 64-bit bucket per band (the band number is part of the hash)."""
+    return [
+        int.from_bytes(hashlib.blake2b(struct.pack(f'<B{ROWS}I', band, *values[band * ROWS:(band + 1) * ROWS]),
+                                       digest_size=8).digest(), 'little', signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second):
+    """Estimated Jaccard similarity: the share of signature positions that agree."""
+    return sum(a == b for a, b in zip(first, second)) / NUM_PERM
+
+
+# --- Keeping Resource In Sync ---
+
+def _claimable(normalized, resource_pk=None):
+    held = Resource.objects.filter(normalized_url=normalized)
+    if resource_pk is not None:
+        held = held.exclude(pk=resource_pk)
+    return not held.exists()
+
+
+def fingerprint(resource):
+    """
+    pre_save: refreshes description_minhash and claims the normalized URL, unless
+    another resource holds it (NULL then). Marks the resource for index_bands().
+    """
+    minhash = pack(signature(resource.description))
+    resource._bands_stale = resource._state.adding or minhash != resource.description_minhash
+    resource.description_minhash = minhash
+    normalized = normalize_url(resource.url)
+    if normalized != resource.normalized_url:
+        resource.normalized_url = normalized if normalized and _claimable(normalized, resource.pk) else None
+
+
+def fingerprint_batch(resources):
+    """fingerprint() for new resources about to be bulk_create()d; one query for the URLs."""
+    normalized = [(resource, normalize_url(resource.url)) for resource in resources] # Unsaved: unhashable
+    held = set(Resource.objects.filter(normalized_url__in={url for _, url in normalized if url})
+               .values_list('normalized_url', flat=True))
+    for resource, url in normalized:
+        resource.description_minhash = pack(signature(resource.description))
+        resource.normalized_url = url if url and url not in held else None
+        held.add(url)
+
+
+def _executemany(model, sql, rows):
+    # BANDS rows per resource: plain executemany() instead of a model instance per row
+    using = router.db_for_write(model)
+    table = connections[using].ops.quote_name(model._meta.db_table)
+    with connections[using].cursor() as cursor:
+        cursor.executemany(sql.format(table=table), rows)
+
+
+def index_bands(resources, replace=True):
+    """Writes the ResourceBand rows of saved resources (replacing their old ones)."""
+    rows = [(resource.pk, bucket) for resource in resources if resource.description_minhash
+            for bucket in buckets(unpack(resource.description_minhash))]
+    with transaction.atomic(savepoint=False):
+        if replace:
+            ResourceBand.objects.filter(resource__in=[resource.pk for resource in resources]).delete()
+        if rows:
+            _executemany(ResourceBand, 'INSERT INTO {table} (resource_id, bucket) VALUES (%s, %s)', rows)
+
+
+# --- Lookup ---
+
+def find(url, description, exclude_pk=None, threshold=None):
+    """
+    Existing resources a submission duplicates: same normalized URL, or a
+    description at `threshold` (settings.RESOURCE_DUPLICATE_SIMILARITY) or more.
+    Most similar first; at most three queries, all index seeks.
+    """
+    threshold = threshold if threshold is not None else getattr(settings, 'RESOURCE_DUPLICATE_SIMILARITY', SIMILARITY)
+    matches = {}
+    normalized = normalize_url(url)
+    if normalized:
+        for resource in Resource.objects.filter(normalized_url=normalized):
+            if resource.pk != exclude_pk:
+                matches[resource.pk] = Duplicate(resource, 'url', 1.0)
+    values = signature(description)
+    if values is not None:
+        # Bucket rows, deduplicated here (DISTINCT would sort them in a temporary B-tree)
+        rows = ResourceBand.objects.filter(bucket__in=buckets(values)).values_list('resource_id', flat=True)
+        candidates = list(dict.fromkeys(pk for pk in rows[:MAX_CANDIDATES * BANDS] if pk != exclude_pk))[:MAX_CANDIDATES]
+        for resource in Resource.objects.filter(pk__in=candidates):
+            score = similarity(values, unpack(resource.description_minhash))
+            if score >= threshold and resource.pk not in matches:
+                matches[resource.pk] = Duplicate(resource, 'description', score)
+    return sorted(matches.values(), key=lambda match: (-match.similarity, match.resource.pk))
+
+
+# --- Whole Table ---
+
+def reindex(batch_size=REINDEX_BATCH_SIZE, pause=REINDEX_PAUSE):
+    """
+    Recomputes every resource's fingerprints and bands, batch_size resources (in
+    primary key order, so the oldest copy keeps its URL) per transaction.
+    Returns the number of resources.
+    """
+    claimed, last, total = set(), 0, 0
+    while True:
+        with transaction.atomic():
+            batch = list(Resource.objects.filter(pk__gt=last).order_by('pk')
+                         .only('pk', 'url', 'description', 'normalized_url', 'description_minhash')[:batch_size])
+            if not batch:
+                break
+            assigned = []
+            for resource in batch:
+                normalized = normalize_url(resource.url)
+                resource.normalized_url = None
+                if normalized and normalized not in claimed:
+                    resource.normalized_url = normalized
+                    claimed.add(normalized)
+                    assigned.append(normalized)
+                resource.description_minhash = pack(signature(resource.description))
+            # Release these URLs first (from this batch and from later resources still
+            # holding them), so the UNIQUE index never sees two holders
+            Resource.objects.filter(Q(pk__in=[resource.pk for resource in batch]) | Q(normalized_url__in=assigned)) \
+                .update(normalized_url=None)
+            _executemany(Resource, 'UPDATE {table} SET normalized_url = %s, description_minhash = %s WHERE id = %s',
+                         [(resource.normalized_url, resource.description_minhash, resource.pk) for resource in batch])
+            index_bands(batch)
+        last, total = batch[-1].pk, total + len(batch)
+        if len(batch) < batch_size:
+            break
+        time.sleep(pause)
+    return total
+
+
+def _root(parents, pk):
+    while parents[pk] != pk:
+        parents[pk] = parents[parents[pk]]
+        pk = parents[pk]
+    return pk
+
+
+def _union(parents, first, second):
+    parents.setdefault(first, first)
+    parents.setdefault(second, second)
+    first, second = _root(parents, first), _root(parents, second)
+    if first != second:
+        parents[max(first, second)] = min(first, second)
+
+
+def cluster(threshold=None):
+    """
+    Groups of duplicate resources across the table: same normalized URL (from
+    Resource.url, so kept duplicates count too), or descriptions that share an
+    LSH bucket and reach `threshold`. Returns lists of primary keys, oldest first,
+    largest groups first.
+    """
+    threshold = threshold if threshold is not None else getattr(settings, 'RESOURCE_DUPLICATE_SIMILARITY', SIMILARITY)
+    parents = {}
+    by_url = {}
+    for pk, url in Resource.objects.exclude(url__isnull=True).exclude(url='').order_by('pk').values_list('pk', 'url').iterator():
+        normalized = normalize_url(url)
+        if normalized:
+            _union(parents, by_url.setdefault(normalized, pk), pk)
+
+    # Buckets with more than one resource (streamed in bucket order, so only those
+    # are held), then the signatures of their members only
+    rows = ResourceBand.objects.order_by('bucket', 'resource_id').values_list('bucket', 'resource_id')
+    groups = []
+    for _, members in groupby(rows.iterator(chunk_size=10000), key=lambda row: row[0]):
+        members = [pk for _, pk in members]
+        if len(members) > 1:
+            groups.append(members)
+    wanted = sorted({pk for members in groups for pk in members})
+    signatures = {}
+    for start in range(0, len(wanted), 500):
+        for pk, data in Resource.objects.filter(pk__in=wanted[start:start + 500]).values_list('pk', 'description_minhash'):
+            signatures[pk] = unpack(data)
+    for members in groups:
+        # Each member joins the first earlier member it is similar to; a bucket of
+        # near-identical copies costs one comparison per copy
+        anchors = []
+        for pk in members:
+            values = signatures.get(pk)
+            if values is None:
+                continue
+            for anchor in anchors:
+                if similarity(values, signatures[anchor]) >= threshold:
+                    _union(parents, anchor, pk)
+                    break
+            else:
+                anchors.append(pk)
+
+    clusters = defaultdict(list)
+    for pk in parents:
+        clusters[_root(parents, pk)].append(pk)
+    return sorted((sorted(members) for members in clusters.values() if len(members) > 1),
+                  key=lambda members: (-len(members), members[0]))
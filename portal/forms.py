@@ -1,11 +1,14 @@
 # portal/forms.py
 
 from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.contrib.auth.forms import AuthenticationForm
 from django.contrib.auth.forms import UserCreationForm as DjangoUserCreationForm 
 
 # --- Import your project models ---
 from .models import Resource, CustomUser 
+from . import duplicates
 
 
 # --- Custom Registration Form (Fixed for CustomUser) ---
@@ -18,6 +21,22 @@ class CustomUserCreationForm(DjangoUserCreationForm):
         model = CustomUser
         fields = ('username', 'email') 
 
+    # Usernames (in any case) and emails already registered are refused, always by
+    # the exact query: the availability filter (portal/availability.py) only learns
+    # of other workers' new users, not of renames, so it answers /register/check/ only
+    def _reject_taken(self, field):
+        value = self.cleaned_data.get(field)
+        if value and CustomUser.objects.filter(**{f'{field}__iexact': value}).exists():
+            self._update_errors(ValidationError({field: self.instance.unique_error_message(CustomUser, [field])}))
+            return None
+        return value
+
+    def clean_username(self):
+        return self._reject_taken('username')
+
+    def clean_email(self):
+        return self._reject_taken('email')
+
 
 # --- LoginForm (Cleaned: Standard AuthenticationForm) ---
 
@@ -37,6 +56,9 @@ class ResourceForm(forms.ModelForm):
     """
     Form for adding Resources (Projects or Programs).
     """
+    # Shown (as a checkbox) once the submission was found to duplicate a resource
+    confirm_duplicate = forms.BooleanField(required=False, widget=forms.HiddenInput, label="Post it anyway")
+
     class Meta:
         model = Resource
         # >>> FINAL FIX: 'url' field is added back here.
@@ -46,4 +68,28 @@ class ResourceForm(forms.ModelForm):
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'url': forms.URLInput(attrs={'class': 'form-control'}), # This widget is now active
             'resource_type': forms.Select(attrs={'class': 'form-control'}),
-        }
\ No newline at end of file
+        }
+
+    def check_duplicates(self):
+        """
+        Run after is_valid(): looks the submission up among the existing resources
+        (portal/duplicates.py) and keeps the matches in self.duplicates. Returns
+        False, with a form error, if it must not be saved: any match under
+        RESOURCE_DUPLICATES = 'reject', a match not yet confirmed under 'warn'.
+        """
+        self.duplicates = []
+        mode = getattr(settings, 'RESOURCE_DUPLICATES', 'warn')
+        if mode == 'off':
+            return True
+        self.duplicates = duplicates.find(self.cleaned_data.get('url'), self.cleaned_data['description'],
+                                          exclude_pk=self.instance.pk)
+        if not self.duplicates or (mode == 'warn' and self.cleaned_data.get('confirm_duplicate')):
+            return True
+        titles = ', '.join(f"'{match.resource.title}'" for match in self.duplicates[:3])
+        if mode == 'reject':
+            self.add_error(None, f"This looks like a resource that is already listed: {titles}.")
+        else:
+            self.add_error(None, f"This looks like a resource that is already listed: {titles}. "
+                                 f"Tick \"Post it anyway\" to add it regardless.")
+            self.fields['confirm_duplicate'].widget = forms.CheckboxInput()
+        return False
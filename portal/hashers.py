@@ -0,0 +1,131 @@
+# portal/hashers.py
+
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger('portal')
+
+# --- Defaults (override in settings.py) ---
+DEFAULT_ARGON2_PARAMS = {'time_cost': 2, 'memory_cost': 102400, 'parallelism': 8} # Django's own defaults
+DEFAULT_HASHING_WORKERS = 0 # Processes in the hashing pool; 0 hashes on the request thread
+# ------------------------------------------
+
+
+class CalibratedArgon2PasswordHasher(Argon2PasswordHasher):
+    """
+    Argon2id with its cost taken from settings.PASSWORD_ARGON2_PARAMS (see
+    `manage.py calibrate_hashers`). The algorithm name stays 'argon2', so
+    existing hashes keep verifying; must_update() compares each stored hash
+    with the configured cost, and Django re-hashes it on the next successful
+    login once the parameters change.
+
+    By default the hash runs on the calling thread (argon2-cffi releases the
+    GIL). With settings.PASSWORD_HASHING_WORKERS > 0 it runs in a process pool
+    of that size, shared by every thread of the web worker: at most that many
+    hashes burn CPU at once, later ones queue instead of starving the requests
+    that do not hash.
+    """
+
+    def _param(self, name):
+        return getattr(settings, 'PASSWORD_ARGON2_PARAMS', {}).get(name, DEFAULT_ARGON2_PARAMS[name])
+
+    @property
+    def time_cost(self):
+        return self._param('time_cost')
+
+    @property
+    def memory_cost(self):
+        return self._param('memory_cost')
+
+    @property
+    def parallelism(self):
+        return self._param('parallelism')
+
+    def encode(self, password, salt):
+        params = self.params()
+        kwargs = {
+            'time_cost': params.time_cost, 'memory_cost': params.memory_cost,
+            'parallelism': params.parallelism, 'hash_len': params.hash_len,
+        }
+        return self.algorithm + run_hashing(hash_argon2, password, salt, kwargs)
+
+    def verify(self, password, encoded):
+        algorithm, rest = encoded.split('$', 1)
+        assert algorithm == self.algorithm
+        return run_hashing(verify_argon2, password, '$' + rest)
+
+
+# --- Pool workers ---
+#
+# Plain module-level functions over argon2-cffi, so a spawned worker only has to
+# import this module (no Django setup) to run them.
+
+def hash_argon2(password, salt, kwargs):
+    """One raw Argon2id hash with explicit parameters (also timed by calibrate_hashers)."""
+    import argon2
+    return argon2.low_level.hash_secret(
+        password.encode(), salt.encode(), type=argon2.low_level.Type.ID, **kwargs,
+    ).decode('ascii')
+
+
+def verify_argon2(password, encoded):
+    import argon2
+    try:
+        return argon2.PasswordHasher().verify(encoded, password)
+    except argon2.exceptions.VerificationError:
+        return False
+
+
+# --- Hashing Pool ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Returns the shared hashing pool, or None when hashing runs inline."""
+    global _pool
+    workers = getattr(settings, 'PASSWORD_HASHING_WORKERS', DEFAULT_HASHING_WORKERS)
+    if not workers:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the web worker is multi-threaded by the time the first login arrives
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def run_hashing(func, *args):
+    """Runs func(*args) in the hashing pool when one is configured, otherwise inline."""
+    pool = get_pool()
+    if pool is None:
+        return func(*args)
+    try:
+        return pool.submit(func, *args).result()
+    except BrokenProcessPool:
+        # A worker died (OOM kill, ...): answer this request inline and start a fresh pool next time
+        logger.warning("Password hashing pool is broken; hashing on the request thread.")
+        shutdown_pool()
+        return func(*args)
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+@receiver(setting_changed)
+def _reset_pool(setting, **kwargs):
+    if setting == 'PASSWORD_HASHING_WORKERS':
+        shutdown_pool()
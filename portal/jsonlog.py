@@ -0,0 +1,288 @@
+# portal/jsonlog.py
+#
+# Non-blocking, structured logging for the `portal` logger (wired up in
+# settings.LOGGING):
+# - RequestLogContextMiddleware remembers the current request in a ContextVar;
+# - QueuedRotatingFileHandler.emit() only stamps a copy of the record with the
+#   request fields and puts it on a bounded queue (dropping it when the queue is full);
+# - a background thread formats queued records with JSONFormatter and writes
+#   them in batches, one write + flush per batch.
+
+import copy
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+import weakref
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import LazyObject, empty
+
+# --- Defaults ---
+DEFAULT_QUEUE_SIZE = 10000 # Records buffered before new ones are dropped
+DEFAULT_BATCH_SIZE = 500 # Most records written per batch
+FLUSH_TIMEOUT = 5 # Seconds flush()/close() wait for the writer thread
+# ----------------
+
+REQUEST_ID_HEADER = 'HTTP_X_REQUEST_ID'
+
+
+# --- Request Context ---
+
+_current = ContextVar('portal_log_request', default=None)
+
+
+class RequestLogContextMiddleware:
+    """
+    Makes the current request available to log records (request id, user id,
+    view name, elapsed time). Reuses an incoming X-Request-ID header, otherwise
+    generates one, and echoes it on the response.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        response['X-Request-ID'] = request.request_id
+        return response
+
+    def _start(self, request):
+        # Accept a client/proxy supplied id only if it is short and printable
+        incoming = request.META.get(REQUEST_ID_HEADER, '')
+        request.request_id = incoming if 0 < len(incoming) <= 64 and incoming.isprintable() else uuid.uuid4().hex
+        return _current.set((request, time.perf_counter()))
+
+
+def _request_fields():
+    current = _current.get()
+    if current is None:
+        return None, None, None, None
+    request, started = current
+    match = getattr(request, 'resolver_match', None)
+    # Only a user that is already loaded: resolving the lazy request.user here could run queries
+    user = getattr(request, 'user', None)
+    if isinstance(user, LazyObject):
+        user = None if user._wrapped is empty else user._wrapped
+    return (
+        request.request_id,
+        user.pk if user is not None and user.is_authenticated else None,
+        match.view_name if match is not None else None,
+        round((time.perf_counter() - started) * 1000, 2),
+    )
+
+
+# --- JSON Lines Formatter ---
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, module, process, thread, message,
+    request_id, user_id, view, latency_ms (ms since the request started) and exc."""
+
+    _second = (None, '') # (epoch second, its formatted date/time), replaced as one tuple
+
+    def _timestamp(self, created):
+        # The date/time part only changes once per second; building it is most of the cost
+        second, text = self._second
+        if int(created) != second:
+            second = int(created)
+            text = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+            self._second = (second, text)
+        return f"{text}.{int((created - second) * 1000):03d}Z"
+
+    def format(self, record):
+        entry = {
+            'ts': self._timestamp(record.created),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'process': record.process,
+            'thread': record.thread,
+            'message': record.getMessage(),
+        }
+        if not hasattr(record, 'request_id'):
+            record.request_id, record.user_id, record.view, record.latency_ms = _request_fields()
+        for field in ('request_id', 'user_id', 'view', 'latency_ms'):
+            value = getattr(record, field)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+# --- Queued File Handler ---
+
+_handlers = weakref.WeakSet()
+
+
+def dropped_total():
+    """Records dropped by every QueuedRotatingFileHandler of this process (exported by /metrics/)."""
+    return sum(handler.dropped for handler in list(_handlers))
+
+
+def _restart_queues():
+    # One hook for the process, however many handlers logging.config creates and closes
+    for handler in list(_handlers):
+        handler._start_queue()
+
+
+os.register_at_fork(after_in_child=_restart_queues)
+
+
+class QueuedRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler whose file I/O happens on a background thread.
+
+    emit() never blocks: it captures the message and request fields on a copy
+    of the record, then put_nowait()s that; when `queue_size` records are already waiting the
+    record is dropped and counted in `dropped`. The writer thread drains up to
+    `batch_size` records at a time and writes them with one write() and one
+    flush() per batch (one write per file when the batch spans a rollover).
+    """
+    def __init__(self, filename, mode='a', maxBytes=0, backupCount=0, encoding=None, delay=True,
+                 queue_size=DEFAULT_QUEUE_SIZE, batch_size=DEFAULT_BATCH_SIZE):
+        super().__init__(filename, mode, maxBytes, backupCount, encoding, delay)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._start_queue()
+        _handlers.add(self)
+
+    def _start_queue(self):
+        # Fresh queue and (lazily started) writer in a forked child: the parent's
+        # thread does not exist there, and its queued records are the parent's to write.
+        self.queue = queue.Queue(self.queue_size)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def _ensure_writer(self):
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._run, name='portal-log-writer', daemon=True)
+                    self._writer.start()
+
+    # --- Request thread side ---
+
+    def emit(self, record):
+        try:
+            self._ensure_writer()
+            # Freeze the message now (args may change before the writer runs) on a copy:
+            # the record itself goes on to the other handlers as the logger made it,
+            # traceback included. exc_text is the cache Formatter.format() itself uses.
+            queued = copy.copy(record)
+            queued.message = record.getMessage()
+            queued.msg, queued.args = queued.message, None
+            if record.exc_info:
+                queued.exc_text = (self.formatter or logging.Formatter()).formatException(record.exc_info)
+                queued.exc_info = None
+            if not hasattr(record, 'request_id'):
+                queued.request_id, queued.user_id, queued.view, queued.latency_ms = _request_fields()
+            self.queue.put_nowait(queued)
+        except queue.Full:
+            self.dropped += 1 # emit() runs under the handler lock
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        """Blocks until every record queued so far has been written (at most FLUSH_TIMEOUT)."""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=FLUSH_TIMEOUT)
+        except queue.Full:
+            return
+        done.wait(FLUSH_TIMEOUT)
+
+    def close(self):
+        self.flush()
+        if self._writer is not None and self._writer.is_alive():
+            try:
+                self.queue.put(None, timeout=FLUSH_TIMEOUT)
+                self._writer.join(FLUSH_TIMEOUT)
+            except queue.Full:
+                pass
+        super().close()
+
+    # --- Writer thread side ---
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            batch, markers, stop = [], [], False
+            while True:
+                if item is None:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+                if stop or len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+            for marker in markers:
+                marker.set()
+            if stop:
+                return
+
+    def _write_batch(self, records):
+        try:
+            lines = [self.format(record) + self.terminator for record in records]
+        except Exception:
+            for record in records:
+                self.handleError(record)
+            return
+        # Only this thread writes to the stream, so the handler lock (which emit()
+        # runs under) is deliberately not taken here.
+        try:
+            if self.stream is None:
+                self.stream = self._open()
+            size = self.stream.tell()
+            pending = []
+            for line in lines:
+                if self.maxBytes > 0 and size and size + len(line) >= self.maxBytes:
+                    # One write per file: flush what belongs in this one, then roll over
+                    self.stream.write(''.join(pending))
+                    self.doRollover()
+                    if self.stream is None: # delay=True leaves reopening to the next write
+                        self.stream = self._open()
+                    pending, size = [], 0
+                pending.append(line)
+                size += len(line)
+            self.stream.write(''.join(pending))
+            self.stream.flush()
+        except Exception:
+            self.handleError(records[-1])
@@ -0,0 +1,307 @@
+# portal/linkcheck.py
+#
+# Liveness checks of Resource.url (`manage.py check_resource_urls`), so closed
+# programs and deleted repositories show up without anyone clicking through.
+# - Every distinct URL is checked once per run, with asyncio: at most
+#   `concurrency` checks at a time and `per_host` requests to any one host.
+#   URLs queue per host, so one host with many URLs never holds the slots
+#   the others could use.
+# - A check sends HEAD and falls back to GET (headers only, the body is never
+#   read) when the server refuses or mishandles HEAD; redirects are followed.
+#   The ETag / Last-Modified of the last 200 go out as If-None-Match /
+#   If-Modified-Since, so an unchanged page answers 304 with no body.
+# - Results are stored in LinkCheck with their time: a rerun only checks URLs
+#   never checked or checked more than `max_age` seconds ago.
+# - Hosts resolving to private, loopback or link-local addresses are refused
+#   (the URLs are user input; LINK_CHECK_ALLOW_PRIVATE lifts this for tests and
+#   intranet deployments), and the connection goes to the address that was vetted.
+# The HTTP/1.1 client below is deliberately small (asyncio streams, no
+# dependency): status line and headers only, one request per connection.
+# The database is only touched between chunks of URLs, from the calling thread;
+# each chunk runs in its own event loop.
+
+import asyncio
+import ipaddress
+import logging
+import socket
+import ssl
+import time
+from collections import deque, namedtuple
+from datetime import timedelta
+from functools import lru_cache
+from urllib.parse import quote, urljoin, urlsplit
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import LinkCheck, Resource
+
+logger = logging.getLogger('portal')
+
+# --- Defaults ---
+CONCURRENCY = 20 # URLs checked at the same time
+PER_HOST = 2 # Requests in flight to one host (host:port)
+TIMEOUT = 10 # Seconds per URL, redirects included
+MAX_AGE = 24 * 3600 # Seconds before a checked URL is due again
+CHUNK_SIZE = 500 # URLs per event loop run (and per results write)
+MAX_REDIRECTS = 5
+BROKEN_AFTER = 2 # Consecutive failed checks before a URL is reported broken
+MAX_HEADER_LINES = 100
+# ----------------
+
+USER_AGENT = 'NextBytePortal-LinkChecker/1.0'
+REDIRECTS = (301, 302, 303, 307, 308)
+SAFE_URL_CHARS = "/?&=%:@!$'()*+,;~-._"
+
+Result = namedtuple('Result', 'url ok status error final_url etag last_modified')
+RunStats = namedtuple('RunStats', 'checked ok failed broken elapsed')
+
+
+class LinkError(Exception):
+    """A URL that cannot be checked (scheme, refused address, malformed response, redirects)."""
+
+
+def _option(name, default):
+    return getattr(settings, f'LINK_CHECK_{name}', default)
+
+
+# --- HTTP ---
+
+@lru_cache(maxsize=None)
+def _tls_context():
+    return ssl.create_default_context() # Loading the CA bundle takes milliseconds: once per process
+
+
+async def _resolve(host, port, allow_private):
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    addresses = [info[4][0] for info in infos]
+    if not addresses:
+        raise LinkError(f"{host} does not resolve")
+    if not allow_private:
+        for address in addresses:
+            if not ipaddress.ip_address(address.split('%')[0]).is_global:
+                raise LinkError(f"{host} resolves to a non-public address ({address})")
+    return addresses[0]
+
+
+async def request(method, url, headers=(), allow_private=False, host_limits=None):
+    """
+    Sends one request; returns (status, {lowercase header name: value}) once the
+    headers are in, without reading the body. `host_limits` maps host:port to the
+    semaphore that caps the requests in flight to it.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise LinkError(f"cannot check {parts.scheme or 'relative'} URL")
+    secure = parts.scheme == 'https'
+    host = parts.hostname.encode('idna').decode('ascii')
+    port = parts.port or (443 if secure else 80)
+    limit = host_limits[f'{host}:{port}'] if host_limits is not None else None
+    if limit is not None:
+        await limit.acquire()
+    try:
+        address = await _resolve(host, port, allow_private)
+        reader, writer = await asyncio.open_connection(
+            address, port, ssl=_tls_context() if secure else None,
+            server_hostname=host if secure else None,
+        )
+        try:
+            target = quote(parts.path or '/', safe=SAFE_URL_CHARS) + (f'?{quote(parts.query, safe=SAFE_URL_CHARS)}' if parts.query else '')
+            lines = [f'{method} {target} HTTP/1.1', f'Host: {host}' + (f':{parts.port}' if parts.port else ''),
+                     f'User-Agent: {USER_AGENT}', 'Accept: */*', 'Connection: close']
+            lines += [f'{name}: {value}' for name, value in headers]
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+            await writer.drain()
+            status_line = (await reader.readline()).decode('latin-1').split()
+            if len(status_line) < 2 or not status_line[0].startswith('HTTP/') or not status_line[1].isdigit():
+                raise LinkError("not an HTTP response")
+            response = {}
+            for _ in range(MAX_HEADER_LINES):
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                response[name.strip().lower()] = value.strip()
+            return int(status_line[1]), response
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+    finally:
+        if limit is not None:
+            limit.release()
+
+
+async def _follow(method, url, headers, allow_private, host_limits):
+    """request() along redirects; returns (status, response headers, final URL)."""
+    for _ in range(MAX_REDIRECTS + 1):
+        status, response = await request(method, url, headers, allow_private, host_limits)
+        if status not in REDIRECTS or 'location' not in response:
+            return status, response, url
+        url = urljoin(url, response['location'])
+        if status == 303:
+            method = 'GET'
+        # The validators go along: they are stored from wherever the chain ended
+    raise LinkError(f"more than {MAX_REDIRECTS} redirects")
+
+
+async def check(url, previous=None, timeout=TIMEOUT, allow_private=False, host_limits=None):
+    """Checks one URL; `previous` is its LinkCheck (for the validators) or None."""
+    headers = []
+    if previous is not None and previous.etag:
+        headers.append(('If-None-Match', previous.etag))
+    if previous is not None and previous.last_modified:
+        headers.append(('If-Modified-Since', previous.last_modified))
+    etag, last_modified = (previous.etag, previous.last_modified) if previous is not None else ('', '')
+    try:
+        async with asyncio.timeout(timeout):
+            status, response, final_url = await _follow('HEAD', url, headers, allow_private, host_limits)
+            if status >= 400:
+                # 405/501 and many a 403/404 only mean "no HEAD here"
+                status, response, final_url = await _follow('GET', url, headers, allow_private, host_limits)
+    except TimeoutError:
+        return Result(url, False, None, f"no answer within {timeout} s", '', etag, last_modified)
+    except (LinkError, OSError, ssl.SSLError, UnicodeError, ValueError) as exc:
+        return Result(url, False, None, f"{type(exc).__name__}: {exc}"[:200], '', etag, last_modified)
+    if status == 200:
+        etag, last_modified = response.get('etag', '')[:200], response.get('last-modified', '')[:64]
+    return Result(url, status < 400, status, '', final_url if final_url != url else '', etag, last_modified)
+
+
+async def check_all(items, concurrency=CONCURRENCY, per_host=PER_HOST, timeout=TIMEOUT, allow_private=False):
+    """
+    Checks [(url, previous LinkCheck or None)] concurrently; returns the Results
+    in order. Each host's URLs wait in its own queue, drained by `per_host`
+    workers, and a worker takes one of the `concurrency` slots only for the URL
+    it is about to check: a URL never holds a slot while it waits for its host.
+    (host_limits still caps redirects into a host, which are rare.)
+    """
+    slots = asyncio.Semaphore(concurrency)
+    host_limits = _HostLimits(per_host)
+    results = [None] * len(items)
+    queues = {}
+    for index, (url, _) in enumerate(items):
+        queues.setdefault(_origin(url), deque()).append(index)
+
+    async def worker(queue):
+        while queue:
+            index = queue.popleft()
+            url, previous = items[index]
+            async with slots:
+                results[index] = await check(url, previous, timeout, allow_private, host_limits)
+
+    await asyncio.gather(*(worker(queue) for queue in queues.values() for _ in range(min(per_host, len(queue)))))
+    return results
+
+
+def _origin(url):
+    """The host:port request() sends the first request for `url` to ('' when it cannot)."""
+    try:
+        parts = urlsplit(url)
+        return f"{parts.hostname.encode('idna').decode('ascii')}:{parts.port or (443 if parts.scheme == 'https' else 80)}"
+    except (AttributeError, UnicodeError, ValueError):
+        return ''
+
+
+class _HostLimits(dict):
+    def __init__(self, per_host):
+        super().__init__()
+        self.per_host = per_host
+
+    def __missing__(self, key):
+        self[key] = asyncio.Semaphore(self.per_host)
+        return self[key]
+
+
+# --- Runs ---
+
+def due(max_age=MAX_AGE, limit=None):
+    """[(url, previous LinkCheck or None)] to check: never checked first, then the oldest."""
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    used = (Resource.objects.exclude(Q(url__isnull=True) | Q(url='')).order_by()
+            .values_list('url', flat=True).distinct())
+    checks = {check.url: check for check in LinkCheck.objects.filter(checked_at__lt=cutoff)}
+    fresh = set(LinkCheck.objects.filter(checked_at__gte=cutoff).values_list('url', flat=True))
+    items = [(url, checks.get(url)) for url in used if url not in fresh]
+    items.sort(key=lambda item: (item[1] is not None, item[1].checked_at if item[1] else None))
+    return items[:limit] if limit is not None else items
+
+
+def store(items, results):
+    """Upserts the Results of one chunk (one INSERT ... ON CONFLICT DO UPDATE)."""
+    now = timezone.now()
+    rows = []
+    for (url, previous), result in zip(items, results):
+        failures = 0 if result.ok else (previous.failures if previous is not None else 0) + 1
+        rows.append(LinkCheck(
+            url=url, checked_at=now, ok=result.ok, status=result.status, error=result.error, failures=failures,
+            final_url=result.final_url, etag=result.etag, last_modified=result.last_modified,
+        ))
+    LinkCheck.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['url'],
+        update_fields=['checked_at', 'ok', 'status', 'error', 'failures', 'final_url', 'etag', 'last_modified'],
+    )
+    return rows
+
+
+def run(concurrency=None, per_host=None, timeout=None, max_age=None, limit=None, chunk_size=CHUNK_SIZE,
+        allow_private=None, progress=None):
+    """
+    Checks the due URLs chunk by chunk and stores the results; `progress` is
+    called with (checked so far, total) after each chunk. Prunes the checks of
+    URLs no resource uses any more. Returns RunStats.
+    """
+    concurrency = concurrency or _option('CONCURRENCY', CONCURRENCY)
+    per_host = per_host or _option('PER_HOST', PER_HOST)
+    timeout = timeout or _option('TIMEOUT', TIMEOUT)
+    max_age = max_age if max_age is not None else _option('MAX_AGE', MAX_AGE)
+    allow_private = allow_private if allow_private is not None else _option('ALLOW_PRIVATE', False)
+    items = due(max_age, limit)
+    start = time.monotonic()
+    ok = failed = broken = 0
+    for first in range(0, len(items), chunk_size):
+        chunk = items[first:first + chunk_size]
+        results = asyncio.run(check_all(chunk, concurrency, per_host, timeout, allow_private))
+        for row in store(chunk, results):
+            ok += row.ok
+            failed += not row.ok
+            broken += row.failures >= BROKEN_AFTER
+        if progress is not None:
+            progress(first + len(chunk), len(items))
+    elapsed = time.monotonic() - start
+    LinkCheck.objects.exclude(url__in=Resource.objects.exclude(url__isnull=True).values('url')).delete()
+    if items:
+        logger.info(f"Checked {len(items)} resource URLs in {elapsed:.1f} s: {ok} ok, {failed} failed, {broken} broken")
+    return RunStats(len(items), ok, failed, broken, elapsed)
+
+
+def check_urls(urls, max_age=None):
+    """
+    Checks `urls` now (in one event loop) and stores the results, skipping those
+    checked within `max_age` seconds (default LINK_CHECK_MAX_AGE). For single
+    resources (the check_resource_url task); returns the stored LinkChecks.
+    """
+    max_age = max_age if max_age is not None else _option('MAX_AGE', MAX_AGE)
+    cutoff = timezone.now() - timedelta(seconds=max_age)
+    checks = {check.url: check for check in LinkCheck.objects.filter(url__in=urls)}
+    items = [(url, checks.get(url)) for url in dict.fromkeys(urls)
+             if url not in checks or checks[url].checked_at < cutoff]
+    if not items:
+        return []
+    results = asyncio.run(check_all(
+        items, _option('CONCURRENCY', CONCURRENCY), _option('PER_HOST', PER_HOST), _option('TIMEOUT', TIMEOUT),
+        _option('ALLOW_PRIVATE', False),
+    ))
+    return store(items, results)
+
+
+def broken_links():
+    """LinkChecks failed BROKEN_AFTER times in a row, with the resources using each URL."""
+    checks = list(LinkCheck.objects.filter(failures__gte=BROKEN_AFTER).order_by('url'))
+    resources = {}
+    for resource in Resource.objects.filter(url__in=[check.url for check in checks]).order_by('pk'):
+        resources.setdefault(resource.url, []).append(resource)
+    return [(check, resources.get(check.url, [])) for check in checks]
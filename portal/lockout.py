@@ -0,0 +1,126 @@
+# portal/lockout.py
+
+import math
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .sqlite_state import SQLiteStateFile
+
+# --- Defaults (override in settings.py) ---
+PURGE_EVERY = 500 # Attempts between bulk deletes of expired entries
+# ------------------------------------------
+
+
+class AttemptResult:
+    """Outcome of LockoutStore.attempt()."""
+    __slots__ = ('admitted', 'count', 'ttl')
+
+    def __init__(self, admitted, count, ttl):
+        self.admitted = admitted # False when the key was already locked out
+        self.count = count # Attempts used in the current window, this one included
+        self.ttl = ttl # Whole seconds until the window (or lockout) expires
+
+
+class LockoutStore:
+    """
+    Failed-login counters with expiry, shared by every worker on the host.
+
+    attempt() reserves an attempt *before* the password is checked: a single
+    UPSERT either admits it (count < limit, or the window expired) or refuses it,
+    so N parallel logins for one username can never run more than `limit`
+    password checks per window. A successful login calls reset().
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS login_lockout (
+            key TEXT PRIMARY KEY,
+            count INTEGER NOT NULL,
+            expires REAL NOT NULL,
+            admitted INTEGER NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS login_lockout_expires ON login_lockout (expires);
+    """
+    # Every SET expression sees the pre-update row. An expired row restarts at 1;
+    # a live row below the limit counts up and restarts its expiry; a row at the
+    # limit is left untouched (the lockout does not extend itself).
+    ATTEMPT_SQL = """
+        INSERT INTO login_lockout (key, count, expires, admitted)
+        VALUES (:key, 1, :now + :window, 1)
+        ON CONFLICT (key) DO UPDATE SET
+            count = CASE WHEN expires <= :now THEN 1
+                         WHEN count < :limit THEN count + 1
+                         ELSE count END,
+            expires = CASE WHEN expires <= :now OR count < :limit THEN :now + :window
+                           ELSE expires END,
+            admitted = (expires <= :now OR count < :limit)
+        RETURNING admitted, count, expires
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.db = SQLiteStateFile(path, self.SCHEMA, timeout)
+        self._attempts = 0
+
+    def attempt(self, key, limit, window, now=None):
+        now = time.time() if now is None else now
+        admitted, count, expires = self.db.execute(
+            self.ATTEMPT_SQL, {'key': key, 'limit': limit, 'window': window, 'now': now},
+        ).fetchone()
+        self._attempts += 1
+        if self._attempts % PURGE_EVERY == 0:
+            self.purge(now)
+        return AttemptResult(bool(admitted), count, _ttl(expires, now))
+
+    def status(self, key, now=None):
+        """Returns (count, ttl) for a live key, or (0, 0). One primary-key lookup."""
+        now = time.time() if now is None else now
+        row = self.db.execute(
+            'SELECT count, expires FROM login_lockout WHERE key = ? AND expires > ?', [key, now],
+        ).fetchone()
+        if row is None:
+            return 0, 0
+        return row[0], _ttl(row[1], now)
+
+    def reset(self, key):
+        self.db.execute('DELETE FROM login_lockout WHERE key = ?', [key])
+
+    def purge(self, now=None):
+        """Deletes every expired entry in one range delete on the expires index."""
+        now = time.time() if now is None else now
+        return self.db.execute('DELETE FROM login_lockout WHERE expires <= ?', [now]).rowcount
+
+    # --- Async API (async_views.login_view) ---
+    # The writes can wait up to the busy timeout on a contended file: they run in
+    # a worker thread (connections are per thread) so the event loop never does.
+
+    async def aattempt(self, key, limit, window, now=None):
+        return await sync_to_async(self.attempt, thread_sensitive=False)(key, limit, window, now)
+
+    async def areset(self, key):
+        return await sync_to_async(self.reset, thread_sensitive=False)(key)
+
+
+def _ttl(expires, now):
+    return max(0, math.ceil(expires - now))
+
+
+# --- Store Selection ---
+
+_store = None
+
+
+def get_store():
+    """Returns the store configured by settings.LOGIN_LOCKOUT_DB."""
+    global _store
+    if _store is None:
+        _store = LockoutStore(settings.LOGIN_LOCKOUT_DB)
+    return _store
+
+
+@receiver(setting_changed)
+def _reset_store(setting, **kwargs):
+    global _store
+    if setting == 'LOGIN_LOCKOUT_DB':
+        _store = None
@@ -0,0 +1,284 @@
+# portal/loganalytics.py
+#
+# Streaming aggregation of the security events in portal.log / security.log,
+# used by `manage.py analyze_logs`. Files are read line by line (every table
+# keeps only its largest entries, so memory is bounded by `top`, never by file
+# size or distinct usernames), rotated siblings (.1-.5, optionally .gz)
+# included, and a state file lets a cron job resume each file from the byte it
+# stopped at, with the failed-login windows still open carried over.
+
+import gzip
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+
+ROTATED_COPIES = 5 # backupCount of the file handler in settings.LOGGING
+
+# --- Line Formats ---
+
+# Text lines of the 'verbose' formatter: LEVEL 2025-12-14 14:52:26,322 module pid thread message
+TEXT_LINE = re.compile(r'^(?P<level>[A-Z]+) (?P<ts>\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(?P<ms>\d{3}) \S+ \d+ \d+ (?P<message>.*)$')
+
+# Messages written by portal/views.py, portal/async_views.py and portal/ratelimit.py
+EVENTS = (
+    ('failed_login', re.compile(r'^Failed login attempt for user: (?P<user>.*)\.$')),
+    ('failed_login', re.compile(r'^Failed login attempt for username: (?P<user>.*)$')), # Older wording
+    ('lockout', re.compile(r'^Access denied for user (?P<user>.*): Locked out for \d+ seconds\.$')),
+    # The client is a username, or an IP address for views limited per address
+    ('rate_limit', re.compile(r'^Rate limit exceeded for (?:user|address): (?P<user>.*) on view: (?P<view>\S+)$')),
+    ('login', re.compile(r'^User login successful: (?P<user>.*)$')),
+)
+# Cheap substring test run on every line before any parsing
+MARKERS = ('Failed login attempt for user', 'Access denied for user', 'Rate limit exceeded', 'User login successful')
+
+
+def parse_line(line):
+    """
+    Returns (kind, datetime, fields) for a security event line, or None.
+    Understands both the text format and the JSON lines of portal/jsonlog.py.
+    """
+    if not any(marker in line for marker in MARKERS):
+        return None
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+            message = entry['message']
+            when = datetime.fromisoformat(entry['ts'].replace('Z', '+00:00'))
+        except (ValueError, KeyError, TypeError):
+            return None
+    else:
+        match = TEXT_LINE.match(line)
+        if match is None:
+            return None
+        message = match['message']
+        # The text format logs naive local time (settings.TIME_ZONE)
+        when = timezone.make_aware(datetime.strptime(f"{match['ts']}.{match['ms']}", '%Y-%m-%d %H:%M:%S.%f'))
+    for kind, pattern in EVENTS:
+        event = pattern.match(message)
+        if event is not None:
+            return kind, when, event.groupdict()
+    return None
+
+
+# --- Aggregation ---
+
+class Report:
+    """
+    Counters filled by add(); failed logins are bucketed into `window`-second windows.
+
+    A window stays open (one Counter of usernames) until the stream is a whole
+    window past its end, then only its `top` largest (username, window) pairs
+    are kept: a pair outside its window's top `top` cannot make the report's.
+    Input is expected in time order per file; a line later than that slack
+    adds to its window's kept pair, if any.
+
+    Windows still open when a run ends are carried to the next one
+    (open_windows() / resume()), so a run every minute counts whole windows;
+    the report lists the windows this run added failures to. The other tables
+    keep their `top` largest entries once they reach twice that, like the
+    closed windows: memory does not grow with the number of usernames.
+    """
+
+    def __init__(self, window=300, top=20):
+        self.window = window
+        self.top = top
+        self.failed = Counter() # (username, window start as epoch seconds) -> failures, closed windows' top pairs
+        self.failed_total = 0
+        self._open = {} # window start -> Counter(username -> failures)
+        self._fresh = set() # Starts of the windows this run added failures to
+        self._newest = None # Start of the latest window seen
+        self.lockouts = Counter() # username -> refused attempts while locked out
+        self.rate_limits = Counter() # view -> 429 responses
+        self.rate_limited_users = Counter() # (view, username) -> 429 responses
+        self.logins_total = 0
+        self.lines = 0
+        self.bytes = 0
+        self.first = None
+        self.last = None
+
+    def add(self, kind, when, fields):
+        if self.first is None or when < self.first:
+            self.first = when
+        if self.last is None or when > self.last:
+            self.last = when
+        user = fields['user']
+        if kind == 'failed_login':
+            epoch = int(when.timestamp())
+            start = epoch - epoch % self.window
+            self._open.setdefault(start, Counter())[user] += 1
+            self._fresh.add(start)
+            self.failed_total += 1
+            if self._newest is None or start > self._newest:
+                self._newest = start
+                self._close_windows(before=start - self.window)
+        elif kind == 'lockout':
+            self.lockouts[user] += 1
+            self._trim(self.lockouts)
+        elif kind == 'rate_limit':
+            self.rate_limits[fields['view']] += 1
+            self.rate_limited_users[fields['view'], user] += 1
+            self._trim(self.rate_limited_users)
+        elif kind == 'login':
+            self.logins_total += 1
+
+    def _trim(self, counter):
+        """Keeps the `top` largest entries of `counter` once it holds twice that many."""
+        if len(counter) > 2 * self.top:
+            kept = counter.most_common(self.top)
+            counter.clear()
+            counter.update(dict(kept))
+
+    def _close_windows(self, before):
+        for start in [start for start in self._open if start < before]:
+            counts = self._open.pop(start)
+            if start not in self._fresh:
+                continue # Carried over and reported by an earlier run; nothing new since
+            for user, count in counts.most_common(self.top):
+                self.failed[user, start] += count
+        self._trim(self.failed)
+
+    def open_windows(self):
+        """The open windows' `top` largest counts, {start: {username: failures}}, for resume()."""
+        return {start: dict(counts.most_common(self.top)) for start, counts in self._open.items()}
+
+    def resume(self, windows):
+        """Reopens the windows open_windows() returned at the end of the previous run."""
+        for start, counts in windows.items():
+            start = int(start) # JSON object keys are strings
+            self._open.setdefault(start, Counter()).update(counts)
+            if self._newest is None or start > self._newest:
+                self._newest = start
+
+    def finish(self):
+        """Closes the windows still open; add() may continue afterwards."""
+        self._close_windows(before=float('inf'))
+
+    def as_dict(self, top=None, min_failures=1):
+        top = self.top if top is None else min(top, self.top)
+        self.finish()
+
+        def window(epoch):
+            return timezone.localtime(datetime.fromtimestamp(epoch, dt_timezone.utc)).isoformat()
+        return {
+            'lines': self.lines,
+            'bytes': self.bytes,
+            'first': self.first.isoformat() if self.first else None,
+            'last': self.last.isoformat() if self.last else None,
+            'window_seconds': self.window,
+            'failed_logins': [
+                {'user': user, 'window_start': window(start), 'count': count}
+                for (user, start), count in self.failed.most_common(top) if count >= min_failures
+            ],
+            'failed_logins_total': self.failed_total,
+            'lockouts': [{'user': user, 'count': count} for user, count in self.lockouts.most_common(top)],
+            'rate_limits': [{'view': view, 'count': count} for view, count in self.rate_limits.most_common(top)],
+            'rate_limited_users': [
+                {'view': view, 'user': user, 'count': count}
+                for (view, user), count in self.rate_limited_users.most_common(top)
+            ],
+            'logins_total': self.logins_total,
+        }
+
+
+# --- Files and Resume Offsets ---
+
+def log_family(path):
+    """The rotated copies of `path` (oldest first, plain or .gz), then `path` itself."""
+    family = []
+    for n in range(ROTATED_COPIES, 0, -1):
+        for candidate in (f"{path}.{n}", f"{path}.{n}.gz"):
+            if os.path.exists(candidate):
+                family.append(candidate)
+    if os.path.exists(path):
+        family.append(str(path))
+    return family
+
+
+def _open(path):
+    return gzip.open(path, 'rb') if str(path).endswith('.gz') else open(path, 'rb')
+
+
+def fingerprint(path):
+    """
+    Identifies a log file by a hash of its first line (timestamp, pid and thread
+    make it unique). Unlike an inode it survives both rotation renames and
+    compression; None while the file holds no complete line yet.
+    """
+    with _open(path) as f:
+        first = f.readline(4096)
+    if not first.endswith(b'\n'):
+        return None
+    return hashlib.sha1(first).hexdigest()
+
+
+class OffsetState:
+    """
+    {fingerprint: bytes already processed} and the failed-login windows still
+    open ({window seconds: Report.open_windows()}), kept in a small JSON file.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.offsets = {}
+        self.windows = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.offsets = data.get('offsets', {})
+            self.windows = data.get('windows', {})
+        self.seen = set()
+
+    def save(self):
+        if not self.path:
+            return
+        # Forget files that have rotated out of the family, so the state stays small
+        offsets = {key: offset for key, offset in self.offsets.items() if key in self.seen}
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'offsets': offsets, 'windows': self.windows}, f)
+        os.replace(tmp, self.path)
+
+
+def scan_file(path, report, state):
+    """Feeds the unread complete lines of one file into `report`."""
+    key = fingerprint(path)
+    if key is None:
+        return
+    state.seen.add(key)
+    offset = state.offsets.get(key, 0)
+    with _open(path) as f:
+        if offset:
+            f.seek(offset) # gzip seeks forward by decompressing, still streaming
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break # Being written right now; picked up complete on the next run
+            offset += len(raw)
+            report.lines += 1
+            report.bytes += len(raw)
+            event = parse_line(raw.decode('utf-8', 'replace').rstrip('\r\n'))
+            if event is not None:
+                report.add(*event)
+    state.offsets[key] = offset
+
+
+def scan(paths, window=300, state_path=None, top=20):
+    """
+    Scans every path with its rotated family; returns the Report of lines not
+    seen before, keeping the `top` largest failed-login pairs. With a state
+    file, the failed-login windows the previous run left open count on.
+    """
+    report = Report(window, top)
+    state = OffsetState(state_path)
+    report.resume(state.windows.get(str(window), {}))
+    for path in paths:
+        for member in log_family(path):
+            scan_file(member, report, state)
+    state.windows = {str(window): report.open_windows()} # Only the current window size can continue
+    report.finish()
+    state.save()
+    return report
@@ -0,0 +1,51 @@
+# portal/management/commands/analyze_logs.py
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from portal import loganalytics
+
+
+class Command(BaseCommand):
+    help = (
+        "Aggregates failed logins (per username and time window), lockouts and rate-limit hits "
+        "from portal.log / security.log and their rotated .1-.5 (or .gz) copies, streaming in "
+        "constant memory. With --state only lines added since the previous run are read and the "
+        "failed-login windows it left open keep counting, e.g. from cron:  * * * * * manage.py analyze_logs --state /var/lib/portal/logscan.json --json"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', help='Log files (default: portal.log and security.log in RUNTIME_DIR).')
+        parser.add_argument('--window', type=int, default=300, help='Failed-login window in seconds (default 300).')
+        parser.add_argument('--state', metavar='PATH', help='Resume offsets file; created on the first run.')
+        parser.add_argument('--top', type=int, default=20, help='Rows per table (default 20).')
+        parser.add_argument('--min-failures', type=int, default=1,
+                            help='Only list username/window pairs with at least this many failures.')
+        parser.add_argument('--json', action='store_true', help='Print the report as one JSON object.')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or [settings.RUNTIME_DIR / 'portal.log', settings.RUNTIME_DIR / 'security.log']
+        report = loganalytics.scan(paths, options['window'], options['state'], options['top'])
+        summary = report.as_dict(min_failures=options['min_failures'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary))
+            return
+
+        self.stdout.write(f"{summary['lines']} new lines ({summary['bytes']} bytes), "
+                          f"{summary['first'] or '-'} .. {summary['last'] or '-'}")
+        self.stdout.write(f"\nFailed logins per {summary['window_seconds']}s window "
+                          f"({summary['failed_logins_total']} total):")
+        for row in summary['failed_logins']:
+            self.stdout.write(f"  {row['count']:>6}  {row['window_start']}  {row['user']}")
+        self.stdout.write("\nLockouts (refused attempts):")
+        for row in summary['lockouts']:
+            self.stdout.write(f"  {row['count']:>6}  {row['user']}")
+        self.stdout.write("\nRate-limit hits per view:")
+        for row in summary['rate_limits']:
+            self.stdout.write(f"  {row['count']:>6}  {row['view']}")
+        for row in summary['rate_limited_users']:
+            self.stdout.write(f"  {row['count']:>6}    {row['view']} / {row['user']}")
+        self.stdout.write(f"\nSuccessful logins: {summary['logins_total']}")
@@ -0,0 +1,159 @@
+# portal/management/commands/benchmark.py
+
+import argparse
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from portal import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-tests the portal endpoints (login -> dashboard -> resources -> search) against a "
+        "seeded throwaway database and reports p50/p95/p99 latency, req/s and DB queries per request. "
+        "Examples:\n"
+        "  manage.py benchmark --requests 400 --concurrency 8 --save-baseline bench.json\n"
+        "  manage.py benchmark --baseline bench.json            (fails on regression)\n"
+        "  manage.py benchmark --server                          (through a local HTTP server)\n"
+        "  manage.py benchmark --url http://127.0.0.1:8000 --username u --password p"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint (default 200).')
+        parser.add_argument('--concurrency', type=int, default=4, help='Parallel logged-in sessions (default 4).')
+        parser.add_argument('--endpoints', nargs='+', choices=list(benchmark.ENDPOINTS), default=list(benchmark.ENDPOINTS))
+        parser.add_argument('--resources', type=int, default=500, help='Resource rows to seed (default 500).')
+        parser.add_argument('--server', action='store_true',
+                            help='Serve the throwaway database from a local threaded HTTP server and drive it over HTTP.')
+        parser.add_argument('--url', help='Drive an already running server instead; nothing is seeded, so '
+                                          'pass an existing account with --username/--password.')
+        parser.add_argument('--username', help='Account for --url (seeded runs create one account per session).')
+        parser.add_argument('--password', help='Password of the --username account.')
+        parser.add_argument('--save-baseline', metavar='PATH', help='Write the results as a JSON baseline.')
+        parser.add_argument('--baseline', metavar='PATH', help='Compare against a JSON baseline; regressions fail the run.')
+        parser.add_argument('--tolerance', type=float, default=0.25,
+                            help='Allowed p95 / req/s drift against the baseline, as a fraction (default 0.25).')
+        # Internal: the child process started by --server (database path, state directory, port)
+        parser.add_argument('--serve', nargs=3, metavar=('DB', 'STATE', 'PORT'), help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options['serve']:
+            return self.serve(*options['serve'])
+        if options['concurrency'] < 1 or options['requests'] < 1:
+            raise CommandError("--requests and --concurrency must be at least 1.")
+
+        try:
+            if options['url']:
+                if not (options['username'] and options['password']):
+                    raise CommandError("--url needs an existing account: pass --username and --password.")
+                mode = 'url'
+                accounts = [(options['username'], options['password'])]
+                results = self.drive(lambda: benchmark.HTTPSession(options['url']), options, accounts)
+            else:
+                mode = 'server' if options['server'] else 'inprocess'
+                results = self.seeded_run(options)
+        except benchmark.BenchmarkError as error:
+            raise CommandError(str(error))
+
+        self.print_results(mode, results)
+
+        errors = {name: result['errors'] for name, result in results.items() if result['errors']}
+        if errors:
+            raise CommandError(f"Unexpected response status codes: {errors}")
+
+        if options['save_baseline']:
+            benchmark.save_baseline(options['save_baseline'], results, {
+                'mode': mode,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'django': django.get_version(),
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            })
+            self.stdout.write(f"Baseline written to {options['save_baseline']}")
+
+        if options['baseline']:
+            baseline = benchmark.load_baseline(options['baseline'])
+            if baseline['meta']['mode'] != mode:
+                raise CommandError(f"The baseline was recorded in '{baseline['meta']['mode']}' mode, this run is '{mode}'.")
+            regressions = benchmark.compare(results, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    # --- Modes ---
+
+    def seeded_run(self, options):
+        # A file database, so the worker threads (or the server process) share it
+        with tempfile.TemporaryDirectory() as tmp, \
+                benchmark.throwaway_database(Path(tmp) / 'bench.sqlite3') as connection, \
+                benchmark.isolated_runtime_state(tmp):
+            accounts = benchmark.seed(options['resources'], users=options['concurrency'])
+            if not options['server']:
+                with override_settings(ALLOWED_HOSTS=['testserver']):
+                    return self.drive(benchmark.InProcessSession, options, accounts)
+
+            port = _free_port()
+            server = subprocess.Popen(
+                [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'benchmark',
+                 '--serve', connection.settings_dict['NAME'], tmp, str(port)],
+                cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                _wait_for_port(port, server)
+                base_url = f"http://127.0.0.1:{port}"
+                return self.drive(lambda: benchmark.HTTPSession(base_url), options, accounts)
+            finally:
+                server.terminate()
+                server.wait()
+
+    def drive(self, session_factory, options, accounts):
+        return benchmark.run(
+            session_factory, options['endpoints'], options['requests'], options['concurrency'], accounts,
+        )
+
+    def serve(self, db_path, state_dir, port):
+        """Runs in the child process: a threaded WSGI server over the parent's seeded database."""
+        from django.core.servers.basehttp import get_internal_wsgi_application, run
+        from django.db import connection
+        connection.settings_dict['NAME'] = db_path
+        with benchmark.isolated_runtime_state(state_dir), override_settings(ALLOWED_HOSTS=['127.0.0.1']):
+            run('127.0.0.1', int(port), get_internal_wsgi_application(), threading=True)
+
+    # --- Output ---
+
+    def print_results(self, mode, results):
+        self.stdout.write(f"{'endpoint':<12} {'requests':>8} {'errors':>6} {'req/s':>9} "
+                          f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}   ({mode})")
+        for name, r in results.items():
+            queries = '-' if r['queries'] is None else f"{r['queries']:.1f}"
+            self.stdout.write(f"{name:<12} {r['requests']:>8} {r['errors']:>6} {r['rps']:>9,.1f} "
+                              f"{r['p50']:>9.2f} {r['p95']:>9.2f} {r['p99']:>9.2f} {queries:>8}")
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"The benchmark server exited with status {process.returncode}.")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"The benchmark server did not start listening on port {port} within {timeout}s.")
@@ -0,0 +1,89 @@
+# portal/management/commands/calibrate_hashers.py
+
+import statistics
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.hashers import CalibratedArgon2PasswordHasher, hash_argon2
+
+SAMPLE_PASSWORD = 'calibration-Password-1'
+MIN_MEMORY_KIB = 8192 # Below 8 MiB Argon2 stops being meaningfully memory-hard
+
+
+class Command(BaseCommand):
+    help = (
+        "Times every hasher in PASSWORD_HASHERS on this host, then picks Argon2 time/memory "
+        "parameters that hash in about --target-ms and prints them as PASSWORD_ARGON2_PARAMS. "
+        "Stored hashes are upgraded to the new parameters on each user's next login."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target-ms', type=float, default=200, help='Target latency of one hash (default 200 ms).')
+        parser.add_argument('--max-memory', type=int, help='Upper bound for memory_cost in KiB (default: the configured value).')
+        parser.add_argument('--parallelism', type=int, help='Argon2 lanes/threads per hash (default: the configured value).')
+        parser.add_argument('--samples', type=int, default=3, help='Hashes timed per measurement; the median is used (default 3).')
+
+    def handle(self, *args, **options):
+        self.samples = max(1, options['samples'])
+        self.report_configured_hashers()
+
+        current = CalibratedArgon2PasswordHasher()
+        parallelism = options['parallelism'] or current.parallelism
+        max_memory = options['max_memory'] or current.memory_cost
+        if max_memory < max(MIN_MEMORY_KIB, 8 * parallelism):
+            raise CommandError(f"--max-memory must be at least {max(MIN_MEMORY_KIB, 8 * parallelism)} KiB.")
+
+        params, elapsed = self.calibrate(options['target_ms'], max_memory, parallelism)
+        self.stdout.write(
+            f"\nArgon2id: time_cost={params['time_cost']} memory_cost={params['memory_cost']} KiB "
+            f"parallelism={params['parallelism']} -> {elapsed:.1f} ms per hash (target {options['target_ms']:.0f} ms)"
+        )
+        self.stdout.write("Put this in settings.py (portal.hashers.CalibratedArgon2PasswordHasher reads it):\n")
+        self.stdout.write(f"PASSWORD_ARGON2_PARAMS = {params!r}")
+
+    # --- Measurements ---
+
+    def time_it(self, func):
+        timings = []
+        for _ in range(self.samples):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+
+    def time_argon2(self, time_cost, memory_cost, parallelism):
+        kwargs = {'time_cost': time_cost, 'memory_cost': memory_cost, 'parallelism': parallelism, 'hash_len': 32}
+        return self.time_it(lambda: hash_argon2(SAMPLE_PASSWORD, 'calibrationsalt1', kwargs))
+
+    def report_configured_hashers(self):
+        self.stdout.write(f"{'hasher':<60} {'ms/hash':>9}")
+        for hasher in get_hashers():
+            name = f"{type(hasher).__module__}.{type(hasher).__qualname__}"
+            try:
+                salt = hasher.salt()
+                elapsed = self.time_it(lambda: hasher.encode(SAMPLE_PASSWORD, salt))
+            except ValueError as error: # Library not installed
+                self.stdout.write(f"{name:<60} {'-':>9}   ({error})")
+                continue
+            self.stdout.write(f"{name:<60} {elapsed:>9.1f}")
+
+    def calibrate(self, target_ms, max_memory, parallelism):
+        """
+        RFC 9106 procedure: take as much memory as allowed, halving it only if a
+        single pass already exceeds the target, then spend the remaining budget
+        on passes (the cost is linear in time_cost).
+        """
+        memory = max_memory
+        one_pass = self.time_argon2(1, memory, parallelism)
+        while one_pass > target_ms and memory // 2 >= max(MIN_MEMORY_KIB, 8 * parallelism):
+            memory //= 2
+            one_pass = self.time_argon2(1, memory, parallelism)
+
+        time_cost = max(1, int(target_ms // one_pass))
+        elapsed = self.time_argon2(time_cost, memory, parallelism)
+        while elapsed > target_ms and time_cost > 1:
+            time_cost -= 1
+            elapsed = self.time_argon2(time_cost, memory, parallelism)
+        return {'time_cost': time_cost, 'memory_cost': memory, 'parallelism': parallelism}, elapsed
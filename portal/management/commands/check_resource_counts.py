@@ -0,0 +1,30 @@
+# portal/management/commands/check_resource_counts.py
+
+from django.core.management.base import BaseCommand
+
+from portal import summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares CustomUser.project_count/program_count with the resource table and\n"
+        "repairs drifted users, one short transaction per chunk of users.\n"
+        "  manage.py check_resource_counts\n"
+        "  manage.py check_resource_counts --chunk-size 200 --pause 0.2\n"
+        "  manage.py check_resource_counts --dry-run        (only report drift)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=summary.CHECK_CHUNK_SIZE,
+                            help=f"Users per transaction (default {summary.CHECK_CHUNK_SIZE}).")
+        parser.add_argument('--pause', type=float, default=summary.CHECK_PAUSE,
+                            help=f"Seconds between chunks (default {summary.CHECK_PAUSE}).")
+        parser.add_argument('--dry-run', action='store_true', help="Report drifted users without repairing them.")
+
+    def handle(self, *args, **options):
+        drifted = summary.check_user_counts(max(1, options['chunk_size']), options['pause'], options['dry_run'])
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All user resource counts are exact."))
+            return
+        verb = "would be repaired" if options['dry_run'] else "repaired"
+        self.stdout.write(self.style.WARNING(f"{len(drifted)} users {verb}: {', '.join(map(str, drifted))}"))
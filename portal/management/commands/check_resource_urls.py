@@ -0,0 +1,74 @@
+# portal/management/commands/check_resource_urls.py
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from portal import linkcheck
+
+
+class Command(BaseCommand):
+    help = (
+        "Checks that the resources' URLs still answer (asyncio, bounded global and per-host\n"
+        "concurrency, HEAD then GET, conditional requests) and stores the results with the\n"
+        "time of the check; URLs checked within --max-age are skipped (see portal/linkcheck.py).\n"
+        "  manage.py check_resource_urls\n"
+        "  manage.py check_resource_urls --concurrency 50 --per-host 4 --timeout 5\n"
+        "  manage.py check_resource_urls --max-age 0          (recheck everything)\n"
+        "  manage.py check_resource_urls --loop 600           (background worker: a pass every 10 minutes)\n"
+        "  manage.py check_resource_urls --report             (list broken URLs, check nothing)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, help=f"URLs checked at the same time (default {linkcheck.CONCURRENCY}).")
+        parser.add_argument('--per-host', type=int, help=f"Requests in flight per host (default {linkcheck.PER_HOST}).")
+        parser.add_argument('--timeout', type=float, help=f"Seconds per URL (default {linkcheck.TIMEOUT}).")
+        parser.add_argument('--max-age', type=int, help=f"Recheck URLs checked longer ago than this, in seconds (default {linkcheck.MAX_AGE}).")
+        parser.add_argument('--limit', type=int, help="Check at most this many URLs per pass (the longest unchecked first).")
+        parser.add_argument('--loop', type=float, metavar='SECONDS', help="Keep running: a pass, then this pause, until interrupted.")
+        parser.add_argument('--report', action='store_true', help="Only list the broken URLs and the resources using them.")
+
+    def handle(self, *args, **options):
+        for name in ('concurrency', 'per_host', 'timeout', 'limit'):
+            if options[name] is not None and options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+        if options['report']:
+            self.report()
+            return
+        while True:
+            stats = linkcheck.run(
+                concurrency=options['concurrency'], per_host=options['per_host'], timeout=options['timeout'],
+                max_age=options['max_age'], limit=options['limit'], progress=self.progress if options['verbosity'] > 1 else None,
+            )
+            self.summarize(stats)
+            if options['loop'] is None:
+                break
+            close_old_connections()
+            try:
+                time.sleep(options['loop'])
+            except KeyboardInterrupt:
+                break
+
+    def progress(self, checked, total):
+        self.stdout.write(f"  {checked}/{total}")
+
+    def summarize(self, stats):
+        if not stats.checked:
+            self.stdout.write("No URLs due for a check.")
+            return
+        rate = stats.checked / stats.elapsed if stats.elapsed else float(stats.checked)
+        line = (f"Checked {stats.checked} URLs in {stats.elapsed:.1f} s ({rate:.1f} URLs/s): "
+                f"{stats.ok} ok, {stats.failed} failed, {stats.broken} broken.")
+        self.stdout.write(self.style.WARNING(line) if stats.broken else self.style.SUCCESS(line))
+
+    def report(self):
+        broken = linkcheck.broken_links()
+        if not broken:
+            self.stdout.write(self.style.SUCCESS("No broken resource URLs."))
+            return
+        for check, resources in broken:
+            reason = f"HTTP {check.status}" if check.status else check.error
+            titles = ', '.join(f"#{resource.pk} {resource.title!r}" for resource in resources)
+            self.stdout.write(f"{check.url} ({reason}, {check.failures} checks in a row, last {check.checked_at:%Y-%m-%d %H:%M}): {titles}")
+        self.stdout.write(self.style.WARNING(f"{len(broken)} broken URLs."))
@@ -0,0 +1,45 @@
+# portal/management/commands/find_duplicate_resources.py
+
+from django.core.management.base import BaseCommand
+
+from portal import duplicates
+from portal.models import Resource
+
+
+class Command(BaseCommand):
+    help = (
+        "Lists groups of duplicate resources across the whole table: the same URL once\n"
+        "normalized, or near-identical descriptions (MinHash/LSH, see portal/duplicates.py).\n"
+        "  manage.py find_duplicate_resources\n"
+        "  manage.py find_duplicate_resources --threshold 0.9\n"
+        "  manage.py find_duplicate_resources --reindex     (recompute all fingerprints first)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threshold', type=float, default=None,
+                            help="Description similarity from which resources are grouped "
+                                 "(default settings.RESOURCE_DUPLICATE_SIMILARITY).")
+        parser.add_argument('--reindex', action='store_true',
+                            help="Recompute every normalized URL, signature and LSH bucket first, e.g. after "
+                                 "descriptions or URLs were written with QuerySet.update().")
+        parser.add_argument('--pause', type=float, default=duplicates.REINDEX_PAUSE,
+                            help=f"Seconds between --reindex batches (default {duplicates.REINDEX_PAUSE}).")
+
+    def handle(self, *args, **options):
+        if options['reindex']:
+            count = duplicates.reindex(pause=options['pause'])
+            self.stdout.write(f"Reindexed {count} resources.")
+        clusters = duplicates.cluster(options['threshold'])
+        if not clusters:
+            self.stdout.write(self.style.SUCCESS("No duplicate resources found."))
+            return
+        titles = {}
+        wanted = [pk for members in clusters for pk in members]
+        for start in range(0, len(wanted), 500):
+            titles.update(Resource.objects.filter(pk__in=wanted[start:start + 500]).values_list('pk', 'title'))
+        for members in clusters:
+            original, *copies = members
+            self.stdout.write(f"#{original} {titles[original]!r}: " + ', '.join(f"#{pk} {titles[pk]!r}" for pk in copies))
+        extra = sum(len(members) - 1 for members in clusters)
+        self.stdout.write(self.style.WARNING(
+            f"{len(clusters)} groups of duplicates, {extra} resources beyond the first (oldest) of each."))
@@ -0,0 +1,50 @@
+# portal/management/commands/import_resources.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal.models import CustomUser
+from portal.resource_import import DEFAULT_BATCH_SIZE, ImportFailed, import_resources
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports resources from a CSV file (header: title,description,url,resource_type) or a "
+        "JSON lines file with the same keys. Rows are validated like the add form on the "
+        "resources page; invalid rows are reported and skipped. Valid rows are inserted in "
+        "batches, one transaction each. With --state an interrupted import resumes after the "
+        "last committed batch."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (.csv) or JSON lines (.jsonl, .ndjson) file.')
+        parser.add_argument('--owner', required=True, help='Username recorded as created_by of every resource.')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Input format (default: from the file extension).')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Rows per INSERT transaction (default {DEFAULT_BATCH_SIZE}).')
+        parser.add_argument('--state', metavar='PATH', help='Progress file; rerun with the same file to resume.')
+        parser.add_argument('--dry-run', action='store_true', help='Validate and report only, insert nothing.')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        try:
+            owner = CustomUser.objects.get(username=options['owner'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"No user named {options['owner']!r}.")
+
+        def report_error(row, error):
+            self.stderr.write(f"row {row}: {error}")
+
+        try:
+            state = import_resources(
+                options['path'], owner, options['format'], options['batch_size'],
+                options['state'], options['dry_run'], report_error,
+            )
+        except ImportFailed as exc:
+            hint = f" Rerun with --state {options['state']} to resume." if options['state'] else ""
+            raise CommandError(f"{exc}{hint}")
+        except OSError as exc:
+            raise CommandError(str(exc))
+
+        verb = 'valid' if options['dry_run'] else 'imported'
+        self.stdout.write(f"{state.rows} rows: {state.imported} {verb}, {state.rejected} rejected")
@@ -0,0 +1,27 @@
+# portal/management/commands/rebuild_resource_summary.py
+
+from django.core.management.base import BaseCommand
+
+from portal import summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Recomputes the dashboard summary rows (portal.models.ResourceSummary) from the\n"
+        "resource table and rewrites the ones that drifted from the incremental updates.\n"
+        "  manage.py rebuild_resource_summary\n"
+        "  manage.py rebuild_resource_summary --dry-run        (only report drift)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report drifted rows without rewriting them.")
+
+    def handle(self, *args, **options):
+        drifted = summary.rebuild(dry_run=options['dry_run'])
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("Summary is up to date."))
+            return
+        ordered = sorted(drifted, key=lambda user_id: -1 if user_id is None else user_id) # Site row first
+        names = ', '.join('site' if user_id is None else f"user {user_id}" for user_id in ordered)
+        verb = "would be rewritten" if options['dry_run'] else "rewritten"
+        self.stdout.write(self.style.WARNING(f"{len(drifted)} drifted rows {verb}: {names}"))
@@ -0,0 +1,49 @@
+# portal/management/commands/run_workers.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portal import taskqueue
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the queued background tasks (see portal/taskqueue.py and portal/tasks.py):\n"
+        "--processes forked workers with --threads tasks each, until SIGTERM or Ctrl-C\n"
+        "(running tasks are finished first).\n"
+        "  manage.py run_workers\n"
+        "  manage.py run_workers --processes 2 --threads 8 --visibility-timeout 120\n"
+        "  manage.py run_workers --burst            (run what is due, then exit)\n"
+        "  manage.py run_workers --stats            (queue depth and lag, run nothing)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, help=f"Worker processes (default TASK_WORKER_PROCESSES, {taskqueue.PROCESSES}).")
+        parser.add_argument('--threads', type=int, help=f"Tasks run at the same time per process (default TASK_WORKER_THREADS, {taskqueue.THREADS}).")
+        parser.add_argument('--visibility-timeout', type=float,
+                            help=f"Seconds a claimed task is hidden from other workers (default {taskqueue.VISIBILITY_TIMEOUT}).")
+        parser.add_argument('--poll-interval', type=float, help=f"Seconds between looks at an empty queue (default {taskqueue.POLL_INTERVAL}).")
+        parser.add_argument('--burst', action='store_true', help="Exit once no task is due.")
+        parser.add_argument('--stats', action='store_true', help="Only print the queue depth and lag.")
+
+    def handle(self, *args, **options):
+        for name in ('processes', 'threads', 'visibility_timeout', 'poll_interval'):
+            if options[name] is not None and options[name] <= 0:
+                raise CommandError(f"--{name.replace('_', '-')} must be positive.")
+        if options['stats']:
+            self.stats()
+            return
+        stats = taskqueue.serve(
+            processes=options['processes'], burst=options['burst'], threads=options['threads'],
+            visibility_timeout=options['visibility_timeout'], poll_interval=options['poll_interval'],
+        )
+        processed = stats.done + stats.retried + stats.failed
+        rate = processed / stats.elapsed if stats.elapsed else float(processed)
+        line = (f"Processed {processed} tasks in {stats.elapsed:.1f} s ({rate:.1f} tasks/s): "
+                f"{stats.done} done, {stats.retried} retried, {stats.failed} failed.")
+        self.stdout.write(self.style.WARNING(line) if stats.failed else self.style.SUCCESS(line))
+
+    def stats(self):
+        gauges = taskqueue.gauges()
+        depth = gauges['portal_task_queue_depth']
+        self.stdout.write(', '.join(f"{count} {state}" for state, count in depth.items()) +
+                          f"; the oldest ready task has waited {gauges['portal_task_queue_lag_seconds']['']:.1f} s.")
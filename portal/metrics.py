@@ -0,0 +1,403 @@
+# portal/metrics.py
+
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from . import jsonlog
+from .sqlite_state import SQLiteStateFile
+
+# --- Defaults (override in settings.py) ---
+DEFAULT_FLUSH_INTERVAL = 5 # Seconds between writes of this worker's totals to METRICS_DB
+# ------------------------------------------
+
+
+# --- Metric Definitions ---
+#
+# Fixed buckets (upper bounds) make every observation one bisect + one increment,
+# and let the totals of several workers be merged by plain addition.
+
+HISTOGRAMS = {
+    'portal_request_duration_seconds': (
+        'Wall time per request, by URL name.',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10), 'view',
+    ),
+    'portal_db_queries': (
+        'Database queries per request, by URL name.',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100), 'view',
+    ),
+    'portal_db_duration_seconds': (
+        'Time spent in database queries per request, by URL name.',
+        (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1), 'view',
+    ),
+    'portal_response_size_bytes': (
+        'Response body size, by URL name (streaming responses are not measured).',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576), 'view',
+    ),
+    'portal_task_lag_seconds': (
+        'Time from a background task being due to a worker claiming it, by task.',
+        (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300), 'task',
+    ),
+    'portal_task_duration_seconds': (
+        'Run time of a background task, by task.',
+        (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60), 'task',
+    ),
+}
+COUNTERS = {
+    'portal_responses_total': ('Responses by URL name and status code.', ('view', 'status')),
+    'portal_cache_requests_total': ('Resource cache lookups by URL name, layer and result.', ('view', 'layer', 'result')),
+    'portal_log_records_dropped_total': ('Log records dropped because the log queue was full.', ()),
+    'portal_tasks_enqueued_total': ('Background tasks enqueued (committed), by task.', ('task',)),
+    'portal_tasks_processed_total': ('Background task runs, by task and outcome (done, retried, failed).', ('task', 'outcome')),
+}
+# Read at scrape time rather than counted (see taskqueue.gauges())
+GAUGES = {
+    'portal_task_queue_depth': ('Background tasks in the queue, by state (ready, scheduled, running, failed).', ('state',)),
+    'portal_task_queue_lag_seconds': ('Time the oldest ready background task has been waiting.', ()),
+}
+LABEL_SEP = '\x1f' # Joins label values into one JSON object key
+
+
+class Registry:
+    """
+    This worker's metric totals, updated under one lock per request.
+
+    Histograms are {name: {label value: [bucket counts..., +Inf count, sum]}}
+    (the view, or the task for task histograms) with non-cumulative bucket
+    counts; counters are {name: {label values: count}}.
+    """
+    def __init__(self):
+        self.restart()
+
+    def restart(self):
+        # Also run in a forked child: a lock held by another thread at fork() time
+        # would never be released there, and the child must not re-export the
+        # parent's totals under a second worker id.
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {name: {} for name in HISTOGRAMS}
+            self.counters = {name: {} for name in COUNTERS}
+            self.worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+            self.last_flush = time.monotonic()
+
+    def observe_request(self, view, status, duration, queries, db_time, size, cache_lookups):
+        observations = (
+            ('portal_request_duration_seconds', duration),
+            ('portal_db_queries', queries),
+            ('portal_db_duration_seconds', db_time),
+            ('portal_response_size_bytes', size),
+        )
+        with self._lock:
+            for name, value in observations:
+                self._observe(name, view, value)
+            self._count('portal_responses_total', view, status)
+            for (layer, hit), count in cache_lookups.items():
+                self._count('portal_cache_requests_total', view, layer, 'hit' if hit else 'miss', amount=count)
+
+    def observe_task(self, task, outcome, lag, duration):
+        """One run of a background task by a worker (see taskqueue.py)."""
+        with self._lock:
+            self._observe('portal_task_lag_seconds', task, lag)
+            self._observe('portal_task_duration_seconds', task, duration)
+            self._count('portal_tasks_processed_total', task, outcome)
+
+    def count_enqueued(self, task):
+        with self._lock:
+            self._count('portal_tasks_enqueued_total', task)
+
+    # Callers hold the lock
+
+    def _observe(self, name, label, value):
+        if value is None:
+            return
+        bounds = HISTOGRAMS[name][1]
+        series = self.histograms[name].get(label)
+        if series is None:
+            series = self.histograms[name][label] = [0] * (len(bounds) + 2)
+        series[bisect_left(bounds, value)] += 1
+        series[-1] += value
+
+    def _count(self, name, *labels, amount=1):
+        values = self.counters[name]
+        key = LABEL_SEP.join(str(label) for label in labels)
+        values[key] = values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {
+                'histograms': {name: {view: list(series) for view, series in views.items()}
+                               for name, views in self.histograms.items()},
+                'counters': {name: dict(values) for name, values in self.counters.items()},
+            }
+        snapshot['counters']['portal_log_records_dropped_total'] = {'': jsonlog.dropped_total()}
+        return snapshot
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.restart)
+
+
+# --- Cross-Worker Storage ---
+#
+# Each worker periodically replaces its own row with its cumulative totals; the
+# /metrics view adds up every row. Rows of exited workers are kept, so the
+# exported counters never go backwards when a worker is recycled.
+
+class MetricsStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS metrics_worker (
+            worker TEXT PRIMARY KEY,
+            snapshot TEXT NOT NULL,
+            updated REAL NOT NULL
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path, timeout=5.0):
+        self.db = SQLiteStateFile(path, self.SCHEMA, timeout)
+
+    def save(self, worker, snapshot):
+        self.db.execute(
+            'INSERT INTO metrics_worker (worker, snapshot, updated) VALUES (?, ?, ?)'
+            ' ON CONFLICT (worker) DO UPDATE SET snapshot = excluded.snapshot, updated = excluded.updated',
+            [worker, json.dumps(snapshot, separators=(',', ':')), time.time()],
+        )
+
+    def load_all(self):
+        return [json.loads(snapshot) for (snapshot,) in self.db.execute('SELECT snapshot FROM metrics_worker')]
+
+
+_store = None
+
+
+def get_store():
+    """Returns the store at settings.METRICS_DB, or None when metrics stay per-process."""
+    global _store
+    path = getattr(settings, 'METRICS_DB', None)
+    if path is None:
+        return None
+    if _store is None:
+        _store = MetricsStore(path)
+    return _store
+
+
+@receiver(setting_changed)
+def _reset_store(setting, **kwargs):
+    global _store
+    if setting == 'METRICS_DB':
+        _store = None
+
+
+def _flush_due(force):
+    """True (and the interval restarted) when this worker's totals should be written now."""
+    now = time.monotonic()
+    if not force and now - registry.last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL):
+        return False
+    registry.last_flush = now
+    return True
+
+
+def _save():
+    store = get_store()
+    if store is not None:
+        store.save(registry.worker, registry.snapshot())
+
+
+def flush(force=False):
+    """Writes this worker's totals to the shared store, at most once per METRICS_FLUSH_INTERVAL."""
+    if _flush_due(force):
+        _save()
+
+
+async def aflush():
+    """flush() for the event loop: the SQLite write runs in a worker thread."""
+    if _flush_due(False):
+        await sync_to_async(_save, thread_sensitive=False)()
+
+
+def merge(snapshots):
+    """Adds up worker snapshots series by series."""
+    merged = {'histograms': {name: {} for name in HISTOGRAMS}, 'counters': {name: {} for name in COUNTERS}}
+    for snapshot in snapshots:
+        for name, views in snapshot.get('histograms', {}).items():
+            target = merged['histograms'].setdefault(name, {})
+            for view, series in views.items():
+                if view in target:
+                    target[view] = [a + b for a, b in zip(target[view], series)]
+                else:
+                    target[view] = list(series)
+        for name, values in snapshot.get('counters', {}).items():
+            target = merged['counters'].setdefault(name, {})
+            for key, count in values.items():
+                target[key] = target.get(key, 0) + count
+    return merged
+
+
+def collect():
+    """Returns the totals of every worker (just this one without METRICS_DB)."""
+    store = get_store()
+    if store is None:
+        return registry.snapshot()
+    flush(force=True)
+    return merge(store.load_all())
+
+
+# --- Prometheus Text Format ---
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshot, gauges=None):
+    """
+    Renders merged totals in the Prometheus text exposition format (version 0.0.4),
+    plus `gauges` ({name in GAUGES: {label values: value}}) if given.
+    """
+    lines = []
+    for name, (help_text, bounds, label) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for value, series in sorted(snapshot['histograms'].get(name, {}).items()):
+            cumulative = 0
+            for bound, count in zip((*bounds, '+Inf'), series[:-1]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(**{label: value, 'le': bound})} {cumulative}")
+            lines.append(f"{name}_sum{_labels(**{label: value})} {_number(series[-1])}")
+            lines.append(f"{name}_count{_labels(**{label: value})} {cumulative}")
+    for kind, definitions, values in (('counter', COUNTERS, snapshot['counters']), ('gauge', GAUGES, gauges or {})):
+        for name, (help_text, label_names) in definitions.items():
+            if name not in values and kind == 'gauge':
+                continue
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for key, count in sorted(values.get(name, {}).items()):
+                lines.append(f"{name}{_labels(**dict(zip(label_names, key.split(LABEL_SEP))))} {_number(count)}")
+    return '\n'.join(lines) + '\n'
+
+
+# --- Per-Request Collection ---
+
+_cache_lookups = ContextVar('portal_metrics_cache_lookups', default=None)
+
+
+def record_cache(layer, hit):
+    """Attributes one cache lookup to the request being handled (see resource_cache.CacheStats)."""
+    lookups = _cache_lookups.get()
+    if lookups is not None:
+        lookups[layer, hit] = lookups.get((layer, hit), 0) + 1
+
+
+class _QueryTimer:
+    """Queries and their time for one request (see _timed_execute)."""
+    __slots__ = ('count', 'elapsed')
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+
+_query_timer = ContextVar('portal_metrics_query_timer', default=None)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    """
+    Execute wrapper of every connection: times the query for the request in the
+    current context. The context follows the request into sync_to_async threads,
+    where the ORM calls of async views run on those threads' own connections.
+    """
+    timer = _query_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timer.elapsed += time.perf_counter() - start
+        timer.count += 1
+
+
+def _instrument(connection):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+@receiver(connection_created)
+def _instrument_new_connection(sender, connection, **kwargs):
+    _instrument(connection)
+
+
+class MetricsMiddleware:
+    """
+    Records wall time, DB queries and DB time, resource-cache hits/misses and
+    response size for every request, keyed by the resolved URL name. Keep it
+    first in MIDDLEWARE so the timing covers the rest of the stack.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timer, lookups, tokens, start = self._start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self._reset(tokens)
+        self._observe(request, response, timer, lookups, start)
+        flush()
+        return response
+
+    async def __acall__(self, request):
+        timer, lookups, tokens, start = self._start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self._reset(tokens)
+        self._observe(request, response, timer, lookups, start)
+        await aflush()
+        return response
+
+    def _start(self):
+        for connection in connections.all(initialized_only=True): # Connected before this module was imported
+            _instrument(connection)
+        timer, lookups = _QueryTimer(), {}
+        return timer, lookups, (_query_timer.set(timer), _cache_lookups.set(lookups)), time.perf_counter()
+
+    def _reset(self, tokens):
+        _query_timer.reset(tokens[0])
+        _cache_lookups.reset(tokens[1])
+
+    def _observe(self, request, response, timer, lookups, start):
+        duration = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unresolved'
+        size = None if response.streaming else len(response.content)
+        registry.observe_request(view, response.status_code, duration, timer.count, timer.elapsed, size, lookups)
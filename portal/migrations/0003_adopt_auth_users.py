@@ -0,0 +1,95 @@
+# Generated by Django 6.0 on 2026-10-18 15:10
+
+from django.db import migrations
+
+# AUTH_USER_MODEL moves from auth.User to portal.CustomUser (see settings.py).
+# Databases created before that still hold their accounts in auth_user, and
+# django_admin_log.user_id still references it. This moves the accounts over:
+# users keep their id unless a CustomUser already has it (then they get a new
+# one; sessions of such a user fail the session hash check and log out), a
+# CustomUser with the same username wins, and groups, permissions and admin
+# log entries follow the user. auth_user itself is left in place, unused.
+# Fresh databases never get an auth_user table, so this is a no-op there.
+
+USER_COLUMNS = ('password, last_login, is_superuser, username, first_name, last_name, '
+                'email, is_staff, is_active, date_joined')
+
+# auth_user.id -> portal_customuser.id, by username
+ADOPTED = 'SELECT a.id AS old_id, c.id AS new_id FROM auth_user a JOIN portal_customuser c ON c.username = a.username'
+
+ADOPT_SQL = [
+    # Same id where it is free...
+    f"""
+    INSERT INTO portal_customuser (id, {USER_COLUMNS})
+    SELECT id, {USER_COLUMNS} FROM auth_user
+    WHERE username NOT IN (SELECT username FROM portal_customuser)
+      AND id NOT IN (SELECT id FROM portal_customuser)
+    """,
+    # ...a new one otherwise
+    f"""
+    INSERT INTO portal_customuser ({USER_COLUMNS})
+    SELECT {USER_COLUMNS} FROM auth_user
+    WHERE username NOT IN (SELECT username FROM portal_customuser)
+    ORDER BY id
+    """,
+    f"""
+    INSERT OR IGNORE INTO portal_customuser_groups (customuser_id, group_id)
+    SELECT adopted.new_id, g.group_id FROM auth_user_groups g JOIN ({ADOPTED}) adopted ON adopted.old_id = g.user_id
+    """,
+    f"""
+    INSERT OR IGNORE INTO portal_customuser_user_permissions (customuser_id, permission_id)
+    SELECT adopted.new_id, p.permission_id FROM auth_user_user_permissions p JOIN ({ADOPTED}) adopted ON adopted.old_id = p.user_id
+    """,
+    f"""
+    UPDATE django_admin_log SET user_id = (
+        SELECT adopted.new_id FROM ({ADOPTED}) adopted WHERE adopted.old_id = django_admin_log.user_id
+    )
+    """,
+]
+
+
+def retarget_admin_log(cursor):
+    """
+    Points django_admin_log.user_id at portal_customuser. SQLite cannot alter a
+    foreign key in place, so this is its documented rebuild: a copy of the table
+    under the new definition, the rows, then the swap and the indexes. The
+    migration runs with foreign key enforcement off and the schema editor
+    checks every foreign key when it ends.
+    """
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'django_admin_log'")
+    (table_sql,) = cursor.fetchone()
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'django_admin_log' AND sql IS NOT NULL")
+    index_sql = [sql for sql, in cursor.fetchall()]
+    cursor.execute(table_sql.replace('"django_admin_log"', '"new__django_admin_log"', 1)
+                   .replace('REFERENCES "auth_user"', 'REFERENCES "portal_customuser"'))
+    cursor.execute('INSERT INTO "new__django_admin_log" SELECT * FROM "django_admin_log"')
+    cursor.execute('DROP TABLE "django_admin_log"')
+    cursor.execute('ALTER TABLE "new__django_admin_log" RENAME TO "django_admin_log"')
+    for sql in index_sql:
+        cursor.execute(sql)
+
+
+def adopt_auth_users(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if 'auth_user' not in connection.introspection.table_names(cursor):
+            return
+        for statement in ADOPT_SQL:
+            cursor.execute(statement)
+        if connection.introspection.get_relations(cursor, 'django_admin_log')['user_id'][1] == 'auth_user':
+            retarget_admin_log(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admin', '0003_logentry_add_action_flag_choices'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('portal', '0002_remove_resource_domain_alter_resource_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(adopt_auth_users, migrations.RunPython.noop),
+    ]
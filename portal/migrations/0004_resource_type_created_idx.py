@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 01:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0003_adopt_auth_users'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['resource_type', '-created_at', '-id'], name='resource_type_created_idx'),
+        ),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 6.0 on 2026-10-18 02:05
+
+from django.db import migrations
+
+# FTS5 index mirroring Resource.title / Resource.description (SQLite only).
+# External-content table: the text lives once in portal_resource, the FTS table
+# only holds the inverted index. Triggers keep it in sync for every write path,
+# including bulk_create() and QuerySet.update().
+
+BACKFILL_BATCH_SIZE = 1000
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE portal_resource_fts USING fts5(
+        title, description,
+        content='portal_resource', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER portal_resource_fts_ai AFTER INSERT ON portal_resource BEGIN
+        INSERT INTO portal_resource_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER portal_resource_fts_ad AFTER DELETE ON portal_resource BEGIN
+        INSERT INTO portal_resource_fts(portal_resource_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER portal_resource_fts_au AFTER UPDATE OF title, description ON portal_resource BEGIN
+        INSERT INTO portal_resource_fts(portal_resource_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO portal_resource_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS portal_resource_fts_au",
+    "DROP TRIGGER IF EXISTS portal_resource_fts_ad",
+    "DROP TRIGGER IF EXISTS portal_resource_fts_ai",
+    "DROP TABLE IF EXISTS portal_resource_fts",
+]
+
+
+def create_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in CREATE_SQL:
+            cursor.execute(statement)
+
+        # Backfill existing rows in id-ordered batches so a large table never
+        # needs one giant statement (and memory stays bounded).
+        last_id = 0
+        while True:
+            cursor.execute(
+                "SELECT MAX(id), COUNT(*) FROM ("
+                " SELECT id FROM portal_resource WHERE id > %s ORDER BY id LIMIT %s)",
+                [last_id, BACKFILL_BATCH_SIZE],
+            )
+            batch_max, batch_count = cursor.fetchone()
+            if not batch_count:
+                break
+            cursor.execute(
+                "INSERT INTO portal_resource_fts(rowid, title, description)"
+                " SELECT id, title, description FROM portal_resource WHERE id > %s AND id <= %s",
+                [last_id, batch_max],
+            )
+            last_id = batch_max
+
+
+def drop_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in DROP_SQL:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0004_resource_type_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts, drop_fts),
+    ]
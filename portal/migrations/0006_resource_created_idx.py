@@ -0,0 +1,17 @@
+# Generated by Django 6.0 on 2026-10-18 07:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0005_resource_fts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['-created_at', '-id'], name='resource_created_idx'),
+        ),
+    ]
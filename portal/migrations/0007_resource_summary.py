@@ -0,0 +1,53 @@
+# Generated by Django 6.0 on 2026-10-18 09:40
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill(apps, schema_editor):
+    # The same rows portal.summary.rebuild() computes, with the historical models
+    Resource = apps.get_model('portal', 'Resource')
+    ResourceSummary = apps.get_model('portal', 'ResourceSummary')
+    counters = {'PROJECT': 'projects', 'PROGRAM': 'programs'}
+    rows = {None: ResourceSummary(user_id=None)}
+    counts = Resource.objects.order_by().values('created_by', 'resource_type').annotate(count=models.Count('id'))
+    for item in counts:
+        field = counters[item['resource_type']]
+        row = rows.setdefault(item['created_by'], ResourceSummary(user_id=item['created_by'], latest=[]))
+        setattr(row, field, getattr(row, field) + item['count'])
+        setattr(rows[None], field, getattr(rows[None], field) + item['count'])
+    for user_id, row in rows.items():
+        if user_id is not None:
+            row.latest = [
+                {'id': resource.pk, 'title': resource.title, 'resource_type': resource.resource_type,
+                 'created_at': resource.created_at.isoformat()}
+                for resource in Resource.objects.filter(created_by_id=user_id).order_by('-created_at', '-id')[:5]
+            ]
+    ResourceSummary.objects.bulk_create(rows.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0006_resource_created_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('projects', models.PositiveIntegerField(default=0)),
+                ('programs', models.PositiveIntegerField(default=0)),
+                ('latest', models.JSONField(blank=True, default=list)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='resource_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Resource summaries',
+                'constraints': [models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('user', 0), name='resource_summary_one_per_user')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
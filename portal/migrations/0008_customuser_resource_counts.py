@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 11:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0007_resource_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='program_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='project_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
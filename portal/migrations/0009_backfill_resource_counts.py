@@ -0,0 +1,43 @@
+# Generated by Django 6.0 on 2026-10-18 11:05
+
+from django.db import migrations, models, transaction
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 1000 # Users per transaction
+
+
+def backfill(apps, schema_editor):
+    # Non-atomic migration: every batch commits on its own, so the user table is
+    # never locked for the whole backfill (portal.summary.check_user_counts() does
+    # the same to repair drift later)
+    CustomUser = apps.get_model('portal', 'CustomUser')
+    Resource = apps.get_model('portal', 'Resource')
+    ResourceSummary = apps.get_model('portal', 'ResourceSummary')
+
+    def counted(resource_type):
+        count = (Resource.objects.filter(created_by=models.OuterRef('pk'), resource_type=resource_type)
+                 .order_by().values('created_by').annotate(count=models.Count('id')).values('count'))
+        return Coalesce(models.Subquery(count), models.Value(0))
+
+    last = 0
+    while True:
+        with transaction.atomic():
+            ids = list(CustomUser.objects.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:BATCH_SIZE])
+            if not ids:
+                break
+            CustomUser.objects.filter(pk__in=ids).update(project_count=counted('PROJECT'), program_count=counted('PROGRAM'))
+        last = ids[-1]
+    # The per-user counts now live on the user; summary rows keep them for the site only
+    ResourceSummary.objects.filter(user__isnull=False).update(projects=0, programs=0)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('portal', '0008_customuser_resource_counts'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
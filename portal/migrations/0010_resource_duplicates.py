@@ -0,0 +1,39 @@
+# Generated by Django 6.0 on 2026-10-18 13:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0009_backfill_resource_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resource',
+            name='description_minhash',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='resource',
+            name='normalized_url',
+            field=models.CharField(blank=True, editable=False, max_length=300, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='resource',
+            constraint=models.UniqueConstraint(condition=models.Q(('normalized_url__isnull', False)), fields=('normalized_url',), name='resource_unique_normalized_url'),
+        ),
+        migrations.CreateModel(
+            name='ResourceBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.BigIntegerField()),
+                ('resource', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='portal.resource')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket', 'resource'], name='resource_band_bucket_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,111 @@
+# Generated by Django 6.0 on 2026-10-18 13:12
+
+import hashlib
+import re
+import struct
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from django.db import migrations, transaction
+
+BATCH_SIZE = 1000 # Resources per transaction
+
+# --- Frozen copy of the portal.duplicates fingerprints as of this migration ---
+# A migration must not import application code: a later change to the live
+# functions would silently change what this backfill writes. When they change,
+# the change ships its own reindex (portal.duplicates.reindex()); these stay.
+
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 5
+NUM_PERM = 64
+BANDS, ROWS = 16, 4
+SIGNATURE = struct.Struct(f'<{NUM_PERM}I')
+TRACKING_PREFIXES = ('utm_', 'mc_', '_hs', 'pk_')
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'yclid', 'igshid', 'ref', 'ref_src', 'source', 'si'}
+
+
+def normalize_url(url):
+    if not url:
+        return None
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    host = (parts.hostname or '').removeprefix('www.')
+    if not host:
+        return None
+    if port and port not in (80, 443):
+        host += f':{port}'
+    path = re.sub(r'/{2,}', '/', parts.path).rstrip('/')
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not (key.lower() in TRACKING_PARAMS or key.lower().startswith(TRACKING_PREFIXES))
+    )
+    return host + path + ('?' + urlencode(query) if query else '')
+
+
+def signature(text):
+    words = re.findall(r'\w+', (text or '').casefold())
+    grams = {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    if len(grams) < MIN_SHINGLES:
+        return None
+    return list(map(min, zip(*(SIGNATURE.unpack(hashlib.shake_128(gram.encode()).digest(SIGNATURE.size))
+                               for gram in grams))))
+
+
+def pack(values):
+    return SIGNATURE.pack(*values) if values is not None else None
+
+
+def buckets(values):
+    return [
+        int.from_bytes(hashlib.blake2b(struct.pack(f'<B{ROWS}I', band, *values[band * ROWS:(band + 1) * ROWS]),
+                                       digest_size=8).digest(), 'little', signed=True)
+        for band in range(BANDS)
+    ]
+
+# -------------------------------------------------------------------------------
+
+
+def backfill(apps, schema_editor):
+    # Non-atomic migration, one transaction per batch (as 0009). Primary key order:
+    # the oldest resource with a normalized URL holds it, later copies get NULL
+    Resource = apps.get_model('portal', 'Resource')
+    quote = schema_editor.connection.ops.quote_name
+    update = f"UPDATE {quote(Resource._meta.db_table)} SET normalized_url = %s, description_minhash = %s WHERE id = %s"
+    insert = f"INSERT INTO {quote('portal_resourceband')} (resource_id, bucket) VALUES (%s, %s)"
+    claimed, last = set(), 0
+    while True:
+        with transaction.atomic():
+            batch = list(Resource.objects.filter(pk__gt=last).order_by('pk').only('pk', 'url', 'description')[:BATCH_SIZE])
+            if not batch:
+                break
+            updates, bands = [], []
+            for resource in batch:
+                normalized = normalize_url(resource.url)
+                values = signature(resource.description)
+                updates.append((normalized if normalized and normalized not in claimed else None, pack(values), resource.pk))
+                claimed.add(normalized)
+                if values is not None:
+                    bands += [(resource.pk, bucket) for bucket in buckets(values)]
+            with schema_editor.connection.cursor() as cursor:
+                cursor.executemany(update, updates)
+                cursor.executemany(insert, bands)
+        last = batch[-1].pk
+
+
+def clear(apps, schema_editor):
+    apps.get_model('portal', 'ResourceBand').objects.all().delete()
+    apps.get_model('portal', 'Resource').objects.update(normalized_url=None, description_minhash=None)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('portal', '0010_resource_duplicates'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, clear),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portal', '0011_backfill_resource_duplicates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LinkCheck',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(unique=True)),
+                ('checked_at', models.DateTimeField(db_index=True)),
+                ('ok', models.BooleanField(default=False)),
+                ('status', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('error', models.CharField(blank=True, max_length=200)),
+                ('failures', models.PositiveIntegerField(default=0)),
+                ('final_url', models.URLField(blank=True, max_length=2000)),
+                ('etag', models.CharField(blank=True, max_length=200)),
+                ('last_modified', models.CharField(blank=True, max_length=64)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('portal', '0013_task'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['email'], name='customuser_email_idx'),
+        ),
+    ]
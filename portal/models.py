@@ -1,6 +1,7 @@
 # portal/models.py
 
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import AbstractUser
 
 # --- 1. Custom User Model (Fixes E304 Clashes) ---
@@ -31,7 +32,31 @@ class CustomUser(AbstractUser):
         verbose_name='user permissions',
     )
     # --- END CRITICAL FIX ---
-    
+
+    # Resources added by this user, kept exact by F() updates in the transaction
+    # of every Resource write (see portal/summary.py); `manage.py
+    # check_resource_counts` repairs drift
+    project_count = models.PositiveIntegerField(default=0, editable=False)
+    program_count = models.PositiveIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ('project_count', 'program_count')
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Registration's email__iexact check: SQLite walks this index instead of the table
+            models.Index(fields=['email'], name='customuser_email_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Only F() updates move the counters: a full save of a user loaded earlier
+        # (profile edit, admin) must not write back the values it loaded
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.username
 
@@ -55,9 +80,154 @@ class Resource(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     # Link the resource to the CustomUser
     created_by = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
+    # Duplicate detection fingerprints, set on save (see portal/duplicates.py):
+    # the URL without scheme, tracking parameters etc., held by the first resource
+    # with it (NULL for duplicates kept on purpose), and the description's MinHash
+    normalized_url = models.CharField(max_length=300, null=True, blank=True, editable=False)
+    description_minhash = models.BinaryField(null=True, blank=True) # Not editable (BinaryField default)
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # The post_save summary update (portal/summary.py) joins this transaction:
+        # a resource is never stored without being counted, and it is one commit
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        try:
+            with transaction.atomic(using=using):
+                super().save(*args, **kwargs)
+        except IntegrityError:
+            # A concurrent save took the normalized URL after pre_save found it free.
+            # Saved once more without it: pre_save looks again (it only does for a
+            # URL that differs from normalized_url) and keeps this one as a duplicate (NULL)
+            if not self.normalized_url or not (Resource.objects.using(using).filter(normalized_url=self.normalized_url)
+                                               .exclude(pk=self.pk).exists()):
+                raise
+            self.normalized_url = None
+            with transaction.atomic(using=using):
+                super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The stored owner/type, so the summary signals can tell an edit that moves
+        # the resource between counters (see portal/summary.py)
+        if 'created_by_id' in field_names and 'resource_type' in field_names:
+            instance._summary_key = (instance.created_by_id, instance.resource_type)
+        # The stored URL: only a new or changed one is queued for a liveness check
+        if 'url' in field_names:
+            instance._loaded_url = instance.url
+        return instance
+
+    class Meta:
+        verbose_name_plural = "Resources"
+        # Serves the keyset-paginated listings (filter on type, walk (created_at, id) newest-first)
+        indexes = [
+            models.Index(fields=['resource_type', '-created_at', '-id'], name='resource_type_created_idx'),
+            # The same walk over every type (JSON API without ?type=, unfiltered export)
+            models.Index(fields=['-created_at', '-id'], name='resource_created_idx'),
+        ]
+        constraints = [
+            # Partial: NULLs (no URL, kept duplicates) stay out of the index; also a
+            # plain CREATE UNIQUE INDEX on SQLite, where a table constraint would
+            # rebuild the table (and drop the FTS triggers)
+            models.UniqueConstraint(fields=['normalized_url'], condition=models.Q(normalized_url__isnull=False),
+                                    name='resource_unique_normalized_url'),
+        ]
+
+
+class ResourceBand(models.Model):
+    """
+    One LSH band of a resource's description MinHash (see portal/duplicates.py):
+    resources sharing a bucket are near-duplicate candidates.
+    """
+    resource = models.ForeignKey(Resource, on_delete=models.CASCADE, related_name='bands')
+    bucket = models.BigIntegerField()
+
+    class Meta:
+        # Covering: candidate lookups (bucket IN ...) never touch the table
+        indexes = [models.Index(fields=['bucket', 'resource'], name='resource_band_bucket_idx')]
+
+# --- 3. Dashboard Summary (maintained by the Resource signals, see portal/summary.py) ---
+
+class ResourceSummary(models.Model):
+    """
+    Per-user latest additions, plus one site-wide row (user=None) with the
+    resource totals, so the dashboard reads stored numbers instead of aggregating
+    Resource (a user's own counts are CustomUser.project_count/program_count).
+    Updated incrementally on every resource write; rebuilt from scratch by
+    `manage.py rebuild_resource_summary`.
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='resource_summary')
+    # Site row only; 0 on user rows
+    projects = models.PositiveIntegerField(default=0)
+    programs = models.PositiveIntegerField(default=0)
+    # Newest first: [{'id', 'title', 'resource_type', 'created_at'}], at most summary.LATEST_COUNT
+    latest = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return f"Summary for {self.user or 'the site'}"
+
+    class Meta:
+        verbose_name_plural = "Resource summaries"
+        constraints = [
+            # NULLs never collide in the user_id index; this also keeps the site row unique
+            models.UniqueConstraint(Coalesce('user', 0), name='resource_summary_one_per_user'),
+        ]
+
+
+# --- 4. URL Liveness (maintained by `manage.py check_resource_urls`, see portal/linkcheck.py) ---
+
+class LinkCheck(models.Model):
+    """
+    The latest check of one URL used by resources. Keyed by the URL, so resources
+    sharing it share the check; rows of URLs no resource uses any more are pruned.
+    """
+    url = models.URLField(max_length=200, unique=True)
+    checked_at = models.DateTimeField(db_index=True) # Reruns only check the URLs checked before a cutoff
+    ok = models.BooleanField(default=False)
+    status = models.PositiveSmallIntegerField(null=True, blank=True) # Final HTTP status; None: no response
+    error = models.CharField(max_length=200, blank=True) # Why there was no response (timeout, DNS, TLS ...)
+    failures = models.PositiveIntegerField(default=0) # Consecutive failed checks; reset by a success
+    final_url = models.URLField(max_length=2000, blank=True) # Where redirects ended, if elsewhere
+    # Validators of the last 200, sent back as If-None-Match / If-Modified-Since
+    etag = models.CharField(max_length=200, blank=True)
+    last_modified = models.CharField(max_length=64, blank=True)
+
+    def __str__(self):
+        return f"{self.url}: {'ok' if self.ok else self.status or self.error}"
+
+
+# --- 5. Background Tasks (run by `manage.py run_workers`, see portal/taskqueue.py) ---
+
+class Task(models.Model):
+    """
+    One queued call of a registered task function. Deleted once it succeeds;
+    kept as 'failed' (with its last error) when it ran out of attempts.
+    """
+    QUEUED, RUNNING, FAILED = 'queued', 'running', 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=200) # Registered name: module.function
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0) # Claims so far, the running one included
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_at = models.DateTimeField() # Due from then on (enqueue + delay, or the retry time); queue lag is measured from it
+    # When a worker may claim it: run_at while queued, the end of the visibility
+    # timeout while running, NULL once failed
+    available_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=100, blank=True) # Holder of the current claim
+    error = models.TextField(blank=True) # Last failure (exception and traceback tail)
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
     class Meta:
-        verbose_name_plural = "Resources"
\ No newline at end of file
+        indexes = [
+            # Partial: the claim query (available_at <= now, oldest first) walks only
+            # the live queue; finished tasks are deleted, failed ones leave the index
+            models.Index(fields=['available_at'], condition=models.Q(available_at__isnull=False), name='task_available_idx'),
+        ]
@@ -0,0 +1,200 @@
+# portal/pagination.py
+
+import base64
+import binascii
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.http import urlencode
+
+# --- Defaults (override in settings.py) ---
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+# ------------------------------------------
+
+
+def get_page_size(request):
+    """
+    Returns the page size for a listing request.
+    Uses ?page_size= when present, falling back to settings.RESOURCES_PAGE_SIZE,
+    and always clamps to settings.RESOURCES_MAX_PAGE_SIZE.
+    """
+    default = getattr(settings, 'RESOURCES_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, 'RESOURCES_MAX_PAGE_SIZE', MAX_PAGE_SIZE)
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+# --- Cursor Encoding ---
+
+def _token(reverse, created_at, pk):
+    raw = f"{'p' if reverse else 'n'}|{created_at.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def encode_cursor(obj, reverse=False):
+    """
+    Encodes the (created_at, id) position of a row into an opaque URL-safe token.
+    The row is a model instance or a .values() dict.
+    """
+    if isinstance(obj, dict):
+        return _token(reverse, obj['created_at'], obj['id'])
+    return _token(reverse, obj.created_at, obj.pk)
+
+
+def decode_cursor(token):
+    """
+    Decodes a cursor token into (reverse, created_at, id).
+    Returns None for missing or tampered tokens so the caller falls back to page one.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        direction, created_at, pk = base64.urlsafe_b64decode(padded.encode()).decode().split('|')
+        if direction not in ('n', 'p'):
+            return None
+        return direction == 'p', datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+def canonical_cursor(token):
+    """
+    Returns the token re-encoded from its decoded position, or None for a missing
+    or tampered one: any spelling of a position (padding, surplus base64) maps to
+    one value, fit for a cache key.
+    """
+    position = decode_cursor(token)
+    return None if position is None else _token(*position)
+
+
+def link_params(request, cursor_params):
+    """
+    The query parameters the pagination links of a listing carry: the given
+    cursors (validated, canonical) and ?page_size= (clamped) when they were sent.
+    Nothing else from the query string gets into the links.
+    """
+    params = {}
+    for name in cursor_params:
+        cursor = canonical_cursor(request.GET.get(name))
+        if cursor is not None:
+            params[name] = cursor
+    if 'page_size' in request.GET:
+        params['page_size'] = get_page_size(request)
+    return params
+
+
+# --- Keyset Page ---
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated listing.
+    next_query / previous_query are ready-to-use query strings: `params` (see
+    link_params(), e.g. the cursor of the other list on the same page) with this
+    list's cursor moved.
+    """
+    def __init__(self, items, has_next, has_previous, params, cursor_param):
+        self.object_list = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = encode_cursor(items[-1]) if has_next else None
+        self.previous_cursor = encode_cursor(items[0], reverse=True) if has_previous else None
+        self.next_query = self._build_query(params, cursor_param, self.next_cursor)
+        self.previous_query = self._build_query(params, cursor_param, self.previous_cursor)
+
+    @staticmethod
+    def _build_query(params, cursor_param, cursor):
+        if cursor is None:
+            return None
+        return urlencode({**params, cursor_param: cursor})
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+# --- Keyset Paginator ---
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a queryset ordered newest-first on (created_at, id).
+
+    Each page is a single indexed range query fetching page_size + 1 rows, so page
+    N costs the same as page one (unlike OFFSET, which scans every skipped row).
+    The cursor condition is written as `created_at <= c AND (created_at < c OR id < pk)`
+    rather than `created_at < c OR (created_at = c AND id < pk)`: the two are equal,
+    but SQLite can only seek into the (created_at, id) index with the first form.
+    """
+    def __init__(self, queryset, page_size):
+        self.queryset = queryset
+        self.page_size = page_size
+
+    def get_page(self, request, cursor_param):
+        """Returns the KeysetPage addressed by request.GET[cursor_param]."""
+        rows, has_next, has_previous = self.fetch(request.GET.get(cursor_param))
+        return KeysetPage(rows, has_next, has_previous, link_params(request, [cursor_param]), cursor_param)
+
+    def fetch(self, cursor):
+        """
+        Runs the page query for a raw cursor token.
+        Returns (rows, has_next, has_previous) so callers can cache the result.
+        """
+        position = decode_cursor(cursor)
+        size = self.page_size
+
+        if position is None:
+            rows = list(self.queryset.order_by('-created_at', '-id')[:size + 1])
+            return rows[:size], len(rows) > size, False
+
+        reverse, created_at, pk = position
+        if reverse:
+            # Walk backwards (towards newer rows), then flip back to display order.
+            rows = list(
+                self.queryset
+                .filter(Q(created_at__gt=created_at) | Q(id__gt=pk), created_at__gte=created_at)
+                .order_by('created_at', 'id')[:size + 1]
+            )
+            has_previous = len(rows) > size
+            rows = rows[:size][::-1]
+            return rows, bool(rows), has_previous
+
+        rows = list(
+            self.queryset
+            .filter(Q(created_at__lt=created_at) | Q(id__lt=pk), created_at__lte=created_at)
+            .order_by('-created_at', '-id')[:size + 1]
+        )
+        return rows[:size], len(rows) > size, bool(rows)
+
+    async def afetch(self, cursor):
+        """Async ORM twin of fetch(), for the ASGI views (see async_views.py)."""
+        position = decode_cursor(cursor)
+        size = self.page_size
+
+        if position is None:
+            rows = [row async for row in self.queryset.order_by('-created_at', '-id')[:size + 1]]
+            return rows[:size], len(rows) > size, False
+
+        reverse, created_at, pk = position
+        if reverse:
+            rows = [
+                row async for row in self.queryset
+                .filter(Q(created_at__gt=created_at) | Q(id__gt=pk), created_at__gte=created_at)
+                .order_by('created_at', 'id')[:size + 1]
+            ]
+            has_previous = len(rows) > size
+            rows = rows[:size][::-1]
+            return rows, bool(rows), has_previous
+
+        rows = [
+            row async for row in self.queryset
+            .filter(Q(created_at__lt=created_at) | Q(id__lt=pk), created_at__lte=created_at)
+            .order_by('-created_at', '-id')[:size + 1]
+        ]
+        return rows[:size], len(rows) > size, bool(rows)
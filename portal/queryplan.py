@@ -0,0 +1,60 @@
+# portal/queryplan.py
+#
+# EXPLAIN QUERY PLAN checks for the SQL the portal sends to SQLite, used by the
+# query-plan regression tests: record every statement run while the views are
+# exercised, explain each one and report full table scans and temporary B-tree
+# sorts (ORDER BY / GROUP BY / DISTINCT without a usable index).
+
+import re
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# A bare "SCAN table" walks the whole table. "SCAN t USING [COVERING] INDEX i"
+# (an ordered index walk, stopped by LIMIT), "SCAN x VIRTUAL TABLE" (FTS5) and
+# "SCAN CONSTANT ROW" are fine.
+FULL_SCAN = re.compile(r'^SCAN \w+$')
+TEMP_SORT = re.compile(r'^USE TEMP B-TREE')
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'WITH')
+
+
+class QueryRecorder:
+    """execute_wrapper that keeps (sql, params) of every statement."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, params))
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def record_queries(using=DEFAULT_DB_ALIAS):
+    recorder = QueryRecorder()
+    with connections[using].execute_wrapper(recorder):
+        yield recorder
+
+
+def explain(sql, params, using=DEFAULT_DB_ALIAS):
+    """The detail column of EXPLAIN QUERY PLAN, one string per plan step."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(queries, allowed=(), using=DEFAULT_DB_ALIAS):
+    """
+    Returns [(sql, plan)] for the recorded queries whose plan has a full table scan
+    or a temporary B-tree, apart from steps starting with one of the `allowed`
+    strings; each distinct SQL string is explained once.
+    """
+    problems, seen = [], set()
+    for sql, params in queries:
+        if sql in seen or not sql.lstrip().upper().startswith(EXPLAINABLE):
+            continue
+        seen.add(sql)
+        plan = explain(sql, params, using)
+        if any((FULL_SCAN.match(step) or TEMP_SORT.match(step)) and not step.startswith(tuple(allowed)) for step in plan):
+            problems.append((sql, plan))
+    return problems
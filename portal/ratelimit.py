@@ -0,0 +1,225 @@
+# portal/ratelimit.py
+
+import logging
+import math
+import threading
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.shortcuts import render
+from django.utils.module_loading import import_string
+
+from .sqlite_state import SQLiteStateFile
+
+logger = logging.getLogger('portal')
+
+# --- Defaults (override in settings.py) ---
+DEFAULT_BACKEND = 'portal.ratelimit.MemoryBackend'
+PRUNE_EVERY = 1000 # Checks between sweeps of idle (fully refilled) buckets
+# ------------------------------------------
+
+
+# --- Token Bucket ---
+#
+# Each key owns a bucket holding up to `limit` tokens that refills continuously
+# at limit / period tokens per second. A request spends one token; an empty
+# bucket means 429 until the next token arrives. Unlike the old fixed counter,
+# hitting the limit does not push the window further out.
+
+class Decision:
+    """Outcome of one rate-limit check."""
+    __slots__ = ('allowed', 'remaining', 'retry_after')
+
+    def __init__(self, allowed, remaining, retry_after):
+        self.allowed = allowed
+        self.remaining = remaining
+        self.retry_after = retry_after # Seconds until the next token (0 when allowed)
+
+
+def _decide(tokens, limit, period):
+    rate = limit / period
+    if tokens >= 1:
+        return Decision(True, int(tokens - 1), 0)
+    return Decision(False, 0, math.ceil((1 - tokens) / rate))
+
+
+class MemoryBackend:
+    """
+    In-process token buckets guarded by a lock.
+    Exact within one process; each gunicorn worker keeps its own buckets.
+    """
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._checks = 0
+
+    def hit(self, key, limit, period, now=None):
+        now = time.time() if now is None else now
+        rate = limit / period
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (limit, now, None))
+            tokens = min(limit, tokens + (now - updated) * rate)
+            decision = _decide(tokens, limit, period)
+            # A bucket untouched for a whole period is full again, i.e. the same as no bucket.
+            self._buckets[key] = (tokens - 1 if decision.allowed else tokens, now, now + period)
+
+            self._checks += 1
+            if self._checks % PRUNE_EVERY == 0:
+                self._prune(now)
+        return decision
+
+    def _prune(self, now):
+        stale = [key for key, (_, _, expires) in self._buckets.items() if expires <= now]
+        for key in stale:
+            del self._buckets[key]
+
+    def reset(self, key=None):
+        with self._lock:
+            if key is None:
+                self._buckets.clear()
+            else:
+                self._buckets.pop(key, None)
+
+
+class SQLiteBackend:
+    """
+    Token buckets in a small WAL-mode SQLite file shared by every worker on the host.
+    Each check is a single UPSERT ... RETURNING statement, so the read-refill-spend
+    cycle is atomic across processes without any explicit locking.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS ratelimit_bucket (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated REAL NOT NULL,
+            expires REAL NOT NULL,
+            allowed INTEGER NOT NULL
+        ) WITHOUT ROWID;
+    """
+    # SQLite evaluates every SET expression against the pre-update row, so the
+    # refilled token count is computed from the old state in all three places.
+    HIT_SQL = """
+        INSERT INTO ratelimit_bucket (key, tokens, updated, expires, allowed)
+        VALUES (:key, :limit - 1, :now, :now + :period, 1)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = MIN(:limit, tokens + (:now - updated) * :rate)
+                     - (MIN(:limit, tokens + (:now - updated) * :rate) >= 1),
+            allowed = (MIN(:limit, tokens + (:now - updated) * :rate) >= 1),
+            updated = :now,
+            expires = :now + :period
+        RETURNING tokens, allowed
+    """
+
+    def __init__(self, path, timeout=5.0, **options):
+        self.db = SQLiteStateFile(path, self.SCHEMA, timeout)
+        self._checks = 0
+
+    def hit(self, key, limit, period, now=None):
+        now = time.time() if now is None else now
+        tokens, allowed = self.db.execute(
+            self.HIT_SQL, {'key': key, 'limit': limit, 'period': period, 'rate': limit / period, 'now': now},
+        ).fetchone()
+        self._checks += 1
+        if self._checks % PRUNE_EVERY == 0:
+            self.db.execute('DELETE FROM ratelimit_bucket WHERE expires <= ?', [now])
+        if allowed:
+            return Decision(True, int(tokens), 0)
+        return Decision(False, 0, math.ceil((1 - tokens) * period / limit))
+
+    def reset(self, key=None):
+        if key is None:
+            self.db.execute('DELETE FROM ratelimit_bucket')
+        else:
+            self.db.execute('DELETE FROM ratelimit_bucket WHERE key = ?', [key])
+
+
+# --- Backend Selection ---
+
+_backend = None
+
+
+def get_backend():
+    """Returns the configured backend (settings.RATE_LIMIT_BACKEND / RATE_LIMIT_OPTIONS)."""
+    global _backend
+    if _backend is None:
+        backend_class = import_string(getattr(settings, 'RATE_LIMIT_BACKEND', DEFAULT_BACKEND))
+        _backend = backend_class(**getattr(settings, 'RATE_LIMIT_OPTIONS', {}))
+    return _backend
+
+
+@receiver(setting_changed)
+def _reset_backend(setting, **kwargs):
+    global _backend
+    if setting in ('RATE_LIMIT_BACKEND', 'RATE_LIMIT_OPTIONS'):
+        _backend = None
+
+
+def get_limits(view_name, limit, period):
+    """
+    Applies per-view overrides from settings.RATE_LIMITS, e.g.
+    RATE_LIMITS = {'dashboard_view': {'limit': 20, 'period': 60}}
+    """
+    override = getattr(settings, 'RATE_LIMITS', {}).get(view_name, {})
+    return override.get('limit', limit), override.get('period', period)
+
+
+# --- Rate Limiting Decorator ---
+
+def rate_limit(limit, period, per='user'):
+    """
+    Decorator to limit requests with a token bucket (see above), keyed by
+    per='user': the authenticated user's ID (anonymous requests pass), or
+    per='ip': the client address (REMOTE_ADDR), for views anyone can call.
+    Works on sync and async views; the async wrapper runs the backend check in a
+    worker thread, as SQLiteBackend writes (and may wait for) its state file.
+    """
+    if per not in ('user', 'ip'):
+        raise ValueError(f"rate_limit(per=...) must be 'user' or 'ip', not {per!r}.")
+
+    def decorator(view_func):
+        view_name = view_func.__name__
+
+        def _bucket(request, user):
+            """(key, limit, period) of the bucket this request spends from."""
+            view_limit, view_period = get_limits(view_name, limit, period)
+            client = f"ip:{request.META.get('REMOTE_ADDR', '')}" if per == 'ip' else user.id
+            return f"rate_limit:{client}:{view_name}", view_limit, view_period
+
+        def _refuse(request, user, decision, view_limit, view_period):
+            """The 429 response for a refused request, None if it was allowed."""
+            if decision.allowed:
+                return None
+            who = f"address: {request.META.get('REMOTE_ADDR')}" if per == 'ip' else f"user: {user.username}"
+            logger.warning(f"Rate limit exceeded for {who} on view: {view_name}")
+            context = {'limit': view_limit, 'period': view_period, 'retry_after': decision.retry_after}
+            response = render(request, '429_ratelimit.html', context, status=429)
+            response['Retry-After'] = str(decision.retry_after)
+            return response
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_view(request, *args, **kwargs):
+                user = await request.auser() if per == 'user' else None
+                if per == 'ip' or user.is_authenticated:
+                    key, view_limit, view_period = _bucket(request, user)
+                    decision = await sync_to_async(get_backend().hit, thread_sensitive=False)(key, view_limit, view_period)
+                    response = _refuse(request, user, decision, view_limit, view_period)
+                    if response is not None:
+                        return response
+                return await view_func(request, *args, **kwargs)
+        else:
+            @wraps(view_func)
+            def _wrapped_view(request, *args, **kwargs):
+                if per == 'ip' or request.user.is_authenticated:
+                    key, view_limit, view_period = _bucket(request, request.user)
+                    decision = get_backend().hit(key, view_limit, view_period)
+                    response = _refuse(request, request.user, decision, view_limit, view_period)
+                    if response is not None:
+                        return response
+                return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
@@ -0,0 +1,203 @@
+# portal/resource_cache.py
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.template.loader import render_to_string
+from django.utils.http import urlencode
+
+from . import metrics
+from .models import Resource
+from .pagination import KeysetPage, KeysetPaginator, canonical_cursor, link_params
+
+# --- Cache Keys ---
+GENERATION_KEY = "resources:generation"
+MODIFIED_KEY = "resources:modified" # Unix time of the last bump, for Last-Modified
+DEFAULT_TIMEOUT = 300
+# ------------------
+
+PAGE_CURSORS = ('projects_cursor', 'programs_cursor') # The lists of the resources page, each paged on its own
+# Resource columns of a cached row, plus created_by_username
+ROW_FIELDS = ('id', 'title', 'description', 'url', 'resource_type', 'created_at')
+
+
+# --- Hit/Miss Counters ---
+
+class CacheStats:
+    """Thread-safe, per-process hit/miss counters for the resource cache."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, layer, hit):
+        name = f"{layer}_{'hits' if hit else 'misses'}"
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+        metrics.record_cache(layer, hit) # Per-view totals for /metrics
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+# --- Generation (Version) Handling ---
+
+def get_generation():
+    """
+    Returns the current resource generation. Every cache key embeds it, so bumping
+    it orphans all previous entries at once (they simply age out via TIMEOUT).
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Seed from the clock rather than 1, so a lost generation key can never
+        # resurrect entries written under an older, reused number.
+        cache.add(GENERATION_KEY, time.time_ns(), None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    """Invalidates every cached resource list in O(1). Called from portal/signals.py."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), None)
+    cache.set(MODIFIED_KEY, time.time(), None)
+
+
+def get_validators():
+    """
+    Returns (generation, last modified as Unix time) with one cache round trip:
+    the change token behind the ETag / Last-Modified of the JSON API (api.py).
+    A lost timestamp restarts at "now", which can only cause extra full responses.
+    """
+    values = cache.get_many([GENERATION_KEY, MODIFIED_KEY])
+    generation = values.get(GENERATION_KEY) or get_generation()
+    modified = values.get(MODIFIED_KEY)
+    if modified is None:
+        cache.add(MODIFIED_KEY, time.time(), None)
+        modified = cache.get(MODIFIED_KEY)
+    return generation, modified
+
+
+async def aget_generation():
+    """Async twin of get_generation()."""
+    generation = await cache.aget(GENERATION_KEY)
+    if generation is None:
+        await cache.aadd(GENERATION_KEY, time.time_ns(), None)
+        generation = await cache.aget(GENERATION_KEY)
+    return generation
+
+
+def _timeout():
+    return getattr(settings, 'RESOURCES_CACHE_TIMEOUT', DEFAULT_TIMEOUT)
+
+
+def _rows_key(generation, resource_type, cursor, page_size):
+    return f"resources:{generation}:rows:{resource_type}:{page_size}:{canonical_cursor(cursor) or ''}"
+
+
+def _html_key(generation, params, template_name, page_size):
+    # The fragment depends on its link parameters only, already validated and
+    # canonical (see pagination.link_params), so arbitrary query strings cannot
+    # mint new keys or leak into the links other visitors get
+    return f"resources:{generation}:html:{template_name}:{page_size}:{urlencode(params)}"
+
+
+def _queryset(resource_type):
+    # Plain dicts of what the fragments and the JSON API show: no model instances
+    # (and no creator with a password hash) are pickled into the cache
+    queryset = Resource.objects.values(*ROW_FIELDS, created_by_username=F('created_by__username'))
+    return queryset.filter(resource_type=resource_type) if resource_type else queryset
+
+
+def get_row(pk):
+    """One resource as the cached rows hold it, or None."""
+    return _queryset(None).filter(pk=pk).first()
+
+
+# --- Cached Query Layer ---
+
+def get_rows(resource_type, cursor, page_size, generation=None):
+    """
+    Cached equivalent of KeysetPaginator.fetch() for one resource_type list.
+    Returns (rows, has_next, has_previous); rows are dicts (see _queryset()).
+    """
+    generation = generation or get_generation()
+    key = _rows_key(generation, resource_type, cursor, page_size)
+    result = cache.get(key)
+    stats.record('rows', result is not None)
+    if result is None:
+        result = KeysetPaginator(_queryset(resource_type), page_size).fetch(cursor)
+        cache.set(key, result, _timeout())
+    return result
+
+
+async def aget_rows(resource_type, cursor, page_size, generation=None):
+    """Async twin of get_rows() (async cache + async ORM)."""
+    generation = generation or await aget_generation()
+    key = _rows_key(generation, resource_type, cursor, page_size)
+    result = await cache.aget(key)
+    stats.record('rows', result is not None)
+    if result is None:
+        result = await KeysetPaginator(_queryset(resource_type), page_size).afetch(cursor)
+        await cache.aset(key, result, _timeout())
+    return result
+
+
+def get_page(params, resource_type, cursor_param, page_size, generation=None):
+    """
+    Builds a KeysetPage from the cached query layer. `params` are the request's
+    link parameters (pagination.link_params()), cursor_param among them.
+    """
+    rows, has_next, has_previous = get_rows(resource_type, params.get(cursor_param), page_size, generation)
+    return KeysetPage(rows, has_next, has_previous, params, cursor_param)
+
+
+async def aget_page(params, resource_type, cursor_param, page_size, generation=None):
+    """Async twin of get_page()."""
+    rows, has_next, has_previous = await aget_rows(resource_type, params.get(cursor_param), page_size, generation)
+    return KeysetPage(rows, has_next, has_previous, params, cursor_param)
+
+
+# --- Cached Fragment Layer ---
+
+def render_list(request, template_name, resource_type, cursor_param, page_size):
+    """Returns the rendered HTML for one resource list."""
+    generation = get_generation()
+    params = link_params(request, PAGE_CURSORS)
+    key = _html_key(generation, params, template_name, page_size)
+    html = cache.get(key)
+    stats.record('html', html is not None)
+    if html is None:
+        page = get_page(params, resource_type, cursor_param, page_size, generation)
+        html = render_to_string(template_name, {'page': page})
+        cache.set(key, html, _timeout())
+    return html
+
+
+async def arender_list(request, template_name, resource_type, cursor_param, page_size):
+    """
+    Async twin of render_list(). Rendering itself stays synchronous: the rows
+    are plain dicts, so the template does no I/O.
+    """
+    generation = await aget_generation()
+    params = link_params(request, PAGE_CURSORS)
+    key = _html_key(generation, params, template_name, page_size)
+    html = await cache.aget(key)
+    stats.record('html', html is not None)
+    if html is None:
+        page = await aget_page(params, resource_type, cursor_param, page_size, generation)
+        html = render_to_string(template_name, {'page': page})
+        await cache.aset(key, html, _timeout())
+    return html
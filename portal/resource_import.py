@@ -0,0 +1,196 @@
+# portal/resource_import.py
+#
+# Bulk import of resources from CSV or JSON lines, used by
+# `manage.py import_resources`. Every row is checked with ResourceForm (the
+# rules of the add form on the resources page), valid rows are inserted with
+# bulk_create() one transaction per batch, and a state file records the byte
+# offset after each committed batch so an interrupted import resumes there.
+# Only the current batch is held in memory.
+
+import csv
+import hashlib
+import json
+import logging
+import os
+
+from django.db import DatabaseError, reset_queries, transaction
+
+from .forms import ResourceForm
+from .models import Resource
+from . import duplicates, resource_cache, summary
+
+logger = logging.getLogger('portal')
+
+# --- Defaults ---
+DEFAULT_BATCH_SIZE = 500
+# ----------------
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+class ImportFailed(Exception):
+    """A batch could not be written; everything before it is committed."""
+
+
+def detect_format(path):
+    _, extension = os.path.splitext(str(path))
+    try:
+        return FORMATS[extension.lower()]
+    except KeyError:
+        raise ImportFailed(f"Cannot tell the format of {path}; pass csv or jsonl explicitly.") from None
+
+
+# --- Reading ---
+
+class _Lines:
+    """Decoded lines of a binary file; `offset` is the byte position after the last line handed out."""
+
+    def __init__(self, f):
+        self.f = f
+        self.offset = f.tell()
+
+    def __iter__(self):
+        for raw in self.f:
+            self.offset += len(raw)
+            yield raw.decode('utf-8')
+
+
+def read_rows(f, fmt, offset=0):
+    """
+    Yields (row, offset after the row) from a file opened in binary mode,
+    starting at byte `offset`. A row is a dict, or a string describing why the
+    line could not be read. CSV needs a header line; it is always read from the
+    start of the file.
+    """
+    if fmt == 'csv':
+        header_lines = _Lines(f)
+        header = next(csv.reader(header_lines), None)
+        if header is None:
+            return
+        header = [name.lstrip('\ufeff').strip() for name in header]
+        f.seek(max(offset, header_lines.offset))
+        lines = _Lines(f)
+        for values in csv.reader(lines):
+            if not any(values):
+                continue
+            if len(values) != len(header):
+                yield f"expected {len(header)} columns, got {len(values)}", lines.offset
+            else:
+                yield dict(zip(header, values)), lines.offset
+    else:
+        f.seek(offset)
+        lines = _Lines(f)
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield f"invalid JSON: {exc}", lines.offset
+                continue
+            yield (row if isinstance(row, dict) else "expected a JSON object"), lines.offset
+
+
+def validate(row, owner):
+    """Returns (unsaved Resource, None) for a valid row, or (None, error text)."""
+    if isinstance(row, str):
+        return None, row
+    form = ResourceForm(data=row)
+    if not form.is_valid():
+        return None, '; '.join(f"{field}: {' '.join(messages)}" for field, messages in form.errors.items())
+    resource = form.save(commit=False)
+    resource.created_by = owner
+    return resource, None
+
+
+# --- Resume State ---
+
+def fingerprint(f):
+    """Hash of the first 4 KB, so a state file is never applied to a different file."""
+    f.seek(0)
+    digest = hashlib.sha1(f.read(4096)).hexdigest()
+    f.seek(0)
+    return digest
+
+
+class ImportState:
+    """{'fingerprint', 'offset', 'rows', 'imported', 'rejected'} of one import, in a small JSON file."""
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self.offset = self.rows = self.imported = self.rejected = 0
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            if saved.get('fingerprint') != key:
+                raise ImportFailed(f"{path} belongs to a different file; remove it to start over.")
+            self.offset, self.rows = saved['offset'], saved['rows']
+            self.imported, self.rejected = saved['imported'], saved['rejected']
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'fingerprint': self.key, 'offset': self.offset, 'rows': self.rows,
+                       'imported': self.imported, 'rejected': self.rejected}, f)
+        os.replace(tmp, self.path)
+
+
+# --- Import ---
+
+def import_resources(path, owner, fmt=None, batch_size=DEFAULT_BATCH_SIZE, state_path=None, dry_run=False, on_error=None):
+    """
+    Imports the rows of `path` as resources created by `owner`.
+
+    Invalid rows are skipped and passed to on_error(row number, error text).
+    With `state_path` the import continues after the last committed batch of a
+    previous run. Returns the ImportState (totals over all runs). Raises
+    ImportFailed when a batch cannot be written; earlier batches stay committed.
+    """
+    fmt = fmt or detect_format(path)
+    with open(path, 'rb') as f:
+        state = ImportState(None if dry_run else state_path, fingerprint(f))
+        batch, first_row = [], state.rows + 1
+
+        def write_batch():
+            if batch and not dry_run:
+                try:
+                    with transaction.atomic():
+                        # bulk_create() sends no pre_save/post_save, so fingerprint the
+                        # rows, count them in and invalidate the listings here
+                        duplicates.fingerprint_batch(batch)
+                        Resource.objects.bulk_create(batch)
+                        duplicates.index_bands(batch, replace=False)
+                        summary.resources_added(batch)
+                        transaction.on_commit(resource_cache.bump_generation)
+                except DatabaseError as exc:
+                    raise ImportFailed(f"Rows {first_row}-{state.rows} were not imported: {exc}") from exc
+            state.imported += len(batch)
+            batch.clear()
+            reset_queries() # With DEBUG on, the logged INSERTs would otherwise pile up (up to 9000 of them)
+
+        try:
+            for row, offset in read_rows(f, fmt, state.offset):
+                state.rows += 1
+                resource, error = validate(row, owner)
+                if error is not None:
+                    state.rejected += 1
+                    if on_error is not None:
+                        on_error(state.rows, error)
+                else:
+                    batch.append(resource)
+                if len(batch) >= batch_size:
+                    write_batch()
+                    state.offset, first_row = offset, state.rows + 1
+                    state.save()
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ImportFailed(f"Unreadable input after row {state.rows}: {exc}") from exc
+        write_batch()
+        state.offset = f.tell()
+        state.save()
+
+    if not dry_run:
+        logger.info(f"Resources imported by {owner.username} from {path}: {state.imported} imported, {state.rejected} rejected")
+    return state
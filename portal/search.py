@@ -0,0 +1,70 @@
+# portal/search.py
+
+import re
+
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Resource
+
+# --- Search Tuning ---
+MAX_RESULTS = 50
+TITLE_WEIGHT = 10.0 # bm25 column weights: a title hit outranks a description hit
+DESCRIPTION_WEIGHT = 1.0
+SNIPPET_TOKENS = 24
+# ---------------------
+
+# Control characters never typed into a form; used as highlight markers so the
+# text can be HTML-escaped before the <mark> tags are put in.
+_MARK_START, _MARK_END = '\x02', '\x03'
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SEARCH_SQL = f"""
+    SELECT r.id, r.title, r.description, r.url, r.resource_type, r.created_at, r.created_by_id,
+           u.username AS creator_username,
+           bm25(portal_resource_fts, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) AS rank,
+           highlight(portal_resource_fts, 0, '{_MARK_START}', '{_MARK_END}') AS title_highlight,
+           snippet(portal_resource_fts, 1, '{_MARK_START}', '{_MARK_END}', '…', {SNIPPET_TOKENS}) AS description_snippet
+    FROM portal_resource_fts
+    JOIN portal_resource r ON r.id = portal_resource_fts.rowid
+    JOIN portal_customuser u ON u.id = r.created_by_id
+    WHERE portal_resource_fts MATCH %s
+    ORDER BY rank
+    LIMIT %s
+"""
+
+
+def build_match_query(text):
+    """
+    Turns free text into a safe FTS5 MATCH expression.
+    Every word is quoted (so operators like NEAR/OR/- in user input are literal),
+    all words must match, and the last word is a prefix match for search-as-you-type.
+    Returns '' when the text contains no searchable words.
+    """
+    tokens = _TOKEN_RE.findall(text or '')
+    if not tokens:
+        return ''
+    terms = [f'"{token}"' for token in tokens]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def _highlight(value):
+    """Escapes FTS output and swaps the marker characters for <mark> tags."""
+    return mark_safe(escape(value).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def search_resources(text, limit=MAX_RESULTS):
+    """
+    Full-text search over Resource title and description, best match first.
+    Each result is a Resource with extra attributes: rank, creator_username,
+    title_highlight and description_snippet (both HTML-safe).
+    """
+    match = build_match_query(text)
+    if not match:
+        return []
+    results = list(Resource.objects.raw(SEARCH_SQL, [match, limit]))
+    for resource in results:
+        resource.title_highlight = _highlight(resource.title_highlight)
+        resource.description_snippet = _highlight(resource.description_snippet)
+    return results
@@ -0,0 +1,207 @@
+# portal/session_backend.py
+#
+# Session engine (SESSION_ENGINE = 'portal.session_backend') that keeps the
+# django_session table out of the path of ordinary authenticated requests:
+# - reads are served from the shared cache (SESSION_CACHE_ALIAS, the SQLite cache
+#   file every worker uses); the table is read only on a cache miss;
+# - save() writes through to the table only when the data changed or the expiry
+#   moved by SESSION_EXPIRY_REFRESH seconds or more, otherwise it does nothing;
+# - login (cycle_key()) stores the new session with one INSERT when the request
+#   ends instead of INSERT-then-UPDATE, and new keys are not looked up first
+#   (a clash fails the INSERT and another key is drawn);
+# - clear_expired() (manage.py clearsessions) deletes expired rows in short
+#   batches instead of one long write transaction.
+#
+# The table stays the source of truth: the cache entry is written after the row
+# and dropped with it, so losing the cache costs one SELECT per session. The
+# cache must be shared by all workers (a per-process cache would keep serving a
+# session another worker has logged out).
+
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.base import VALID_KEY_CHARS, CreateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.cache import caches
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+logger = logging.getLogger('portal')
+
+KEY_PREFIX = 'portal.session:'
+
+# --- Defaults ---
+EXPIRY_REFRESH = 3600 # Seconds the expiry may slide before an unchanged session is rewritten
+CLEANUP_BATCH_SIZE = 500 # Expired rows deleted per transaction
+CLEANUP_PAUSE = 0.05 # Seconds between batches, so other writers get the lock
+# ----------------
+
+
+class SessionStore(DBStore):
+    """Database sessions, read through the cache and written only when needed."""
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self._stored = None # (fingerprint, expiry timestamp) of the row as last read or written
+        self._pending_insert = False # Set by cycle_key(): the row is created by the next save()
+
+    def _fingerprint(self, data):
+        # The serialized dict, not encode(): signed output differs on every call
+        return self.serializer().dumps(data)
+
+    def _remember(self, data, expires):
+        self._stored = (self._fingerprint(data), expires)
+        try:
+            self._cache.set(KEY_PREFIX + self.session_key, (data, expires), max(int(expires - time.time()), 1))
+        except Exception as e:
+            logger.warning(f"Session cache write failed: {e}")
+
+    def _forget(self, session_key):
+        try:
+            self._cache.delete(KEY_PREFIX + session_key)
+        except Exception as e:
+            logger.warning(f"Session cache delete failed: {e}")
+
+    # --- Reads ---
+
+    def load(self):
+        try:
+            entry = self._cache.get(KEY_PREFIX + self.session_key)
+        except Exception:
+            entry = None # The table still answers
+        if entry is not None and entry[1] > time.time():
+            data, expires = entry
+            self._stored = (self._fingerprint(data), expires)
+            return data
+        s = self._get_session_from_db()
+        if s is None:
+            return {}
+        data = self.decode(s.session_data)
+        self._remember(data, s.expire_date.timestamp())
+        return data
+
+    def exists(self, session_key):
+        try:
+            if self._cache.get(KEY_PREFIX + session_key) is not None:
+                return True
+        except Exception:
+            pass
+        return super().exists(session_key)
+
+    # --- Writes ---
+
+    def _new_key(self):
+        return get_random_string(32, VALID_KEY_CHARS)
+
+    def create(self):
+        while True:
+            self._session_key = self._new_key()
+            try:
+                self.save(must_create=True)
+            except CreateError:
+                continue # Key wasn't unique
+            self.modified = True
+            return
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        expires = self.get_expiry_date().timestamp()
+        if self._pending_insert:
+            while True:
+                try:
+                    super().save(must_create=True)
+                    break
+                except CreateError:
+                    self._session_key = self._new_key()
+            self._pending_insert = False
+        else:
+            if not must_create and self._stored is not None:
+                fingerprint, stored_expires = self._stored
+                refresh = getattr(settings, 'SESSION_EXPIRY_REFRESH', EXPIRY_REFRESH)
+                if fingerprint == self._fingerprint(data) and abs(expires - stored_expires) < refresh:
+                    return
+            super().save(must_create=must_create)
+        self._remember(data, expires)
+
+    def cycle_key(self):
+        """New key for the same data (login); its row is INSERTed by the save() that ends the request."""
+        data = self._session
+        key = self.session_key
+        self._session_key = self._new_key()
+        self._session_cache = data
+        self._stored = None
+        self._pending_insert = True
+        self.modified = True
+        if key:
+            self.delete(key)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        if session_key == self.session_key:
+            self._stored = None
+            self._pending_insert = False
+        # One DELETE, without the SELECT of the stock backend's get().delete()
+        self.model.objects.filter(session_key=session_key).delete()
+        self._forget(session_key)
+
+    @classmethod
+    def clear_expired(cls, batch_size=None, pause=None):
+        """
+        Deletes expired sessions in batches of SESSION_CLEANUP_BATCH_SIZE rows, one
+        short transaction each, sleeping SESSION_CLEANUP_PAUSE seconds between them.
+        Returns the number of rows deleted.
+        """
+        model = cls.get_model_class()
+        if batch_size is None:
+            batch_size = getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', CLEANUP_BATCH_SIZE)
+        if pause is None:
+            pause = getattr(settings, 'SESSION_CLEANUP_PAUSE', CLEANUP_PAUSE)
+        using = router.db_for_write(model)
+        now = timezone.now()
+        deleted = 0
+        while True:
+            with transaction.atomic(using=using):
+                # Walks the expire_date index; the rows go by primary key
+                keys = list(model.objects.using(using).filter(expire_date__lt=now).values_list('pk', flat=True)[:batch_size])
+                if keys:
+                    model.objects.using(using).filter(pk__in=keys).delete()
+            deleted += len(keys)
+            if len(keys) < batch_size:
+                break
+            time.sleep(pause)
+        if deleted:
+            logger.info(f"Cleared {deleted} expired sessions")
+        return deleted
+
+    # --- Async API (async views reach the session through request.auser()) ---
+
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def aexists(self, session_key):
+        return await sync_to_async(self.exists)(session_key)
+
+    async def acreate(self):
+        return await sync_to_async(self.create)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
+
+    async def acycle_key(self):
+        return await sync_to_async(self.cycle_key)()
+
+    async def adelete(self, session_key=None):
+        return await sync_to_async(self.delete)(session_key)
+
+    @classmethod
+    async def aclear_expired(cls):
+        return await sync_to_async(cls.clear_expired)()
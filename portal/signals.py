@@ -0,0 +1,77 @@
+# portal/signals.py
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .models import CustomUser, Resource
+from . import availability, duplicates, resource_cache, summary, tasks
+
+
+# --- Resource Cache Invalidation ---
+
+@receiver(post_save, sender=Resource)
+@receiver(post_delete, sender=Resource)
+def invalidate_resource_cache(sender, instance, **kwargs):
+    """
+    Bumps the resource cache generation once the write is committed.
+    Bumping before commit would let a concurrent reader re-cache the old rows
+    under the new generation.
+    """
+    transaction.on_commit(resource_cache.bump_generation)
+
+
+# --- Dashboard Summary ---
+
+@receiver(post_save, sender=Resource)
+def update_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    """Counts the resource in (or moves it on an edit) inside the saving transaction."""
+    if raw: # loaddata: the fixture brings (or rebuild() makes) its own summary rows
+        return
+    if created:
+        summary.resources_added([instance])
+    else:
+        summary.resource_changed(instance, getattr(instance, '_summary_key', None))
+    instance._summary_key = (instance.created_by_id, instance.resource_type)
+
+
+@receiver(post_delete, sender=Resource)
+def update_summary_on_delete(sender, instance, **kwargs):
+    summary.resource_removed(instance)
+
+
+# --- Duplicate Detection ---
+
+@receiver(pre_save, sender=Resource)
+def fingerprint_resource(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Normalized URL and description MinHash of full saves (`reindex` catches the rest)."""
+    if raw or update_fields is not None:
+        return
+    duplicates.fingerprint(instance)
+
+
+@receiver(post_save, sender=Resource)
+def index_resource_bands(sender, instance, created, raw=False, **kwargs):
+    """Rewrites the resource's LSH buckets inside the saving transaction when its signature changed."""
+    if not raw and getattr(instance, '_bands_stale', False):
+        duplicates.index_bands([instance], replace=not created)
+        instance._bands_stale = False
+
+
+# --- Username / Email Availability ---
+
+@receiver(post_save, sender=CustomUser)
+def mark_names_taken(sender, instance, **kwargs):
+    """A new or renamed user's username and email are taken from now on in this worker."""
+    availability.get_index().add(instance.username, instance.email)
+
+
+# --- Background Work (portal/tasks.py, run by `manage.py run_workers`) ---
+
+@receiver(post_save, sender=Resource)
+def queue_url_check(sender, instance, created, raw=False, **kwargs):
+    """Queues a liveness check of a new or changed URL; the task row commits with the resource."""
+    if raw or not instance.url or (not created and instance.url == getattr(instance, '_loaded_url', None)):
+        return
+    tasks.check_resource_url.delay(instance.pk)
+    instance._loaded_url = instance.url
@@ -0,0 +1,35 @@
+# portal/sqlite_state.py
+
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStateFile:
+    """
+    Per-thread, fork-aware connections to a small WAL-mode SQLite file.
+
+    Used for hot runtime state (rate-limit buckets, login lockouts) that must be
+    shared by every worker process on the host but does not belong in the main
+    database. Connections are opened lazily in autocommit mode; a connection
+    inherited across fork() is never reused by the child.
+    """
+    def __init__(self, path, schema, timeout=5.0):
+        self.path = str(path)
+        self.schema = schema
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL') # Losing the last few writes on power loss is harmless here
+            conn.executescript(self.schema)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
@@ -0,0 +1,45 @@
+// portal/static/portal/register.js
+//
+// Live availability of the username on the registration page: asks
+// /register/check/ (data-check-url on the form) once typing pauses and shows
+// the answer under the field. The form still validates everything on submit,
+// the email included (the endpoint does not answer for emails).
+
+(function () {
+    var form = document.querySelector('form[data-check-url]');
+    if (!form) {
+        return;
+    }
+    var DELAY = 300; // Milliseconds of no typing before asking
+
+    ['username'].forEach(function (field) {
+        var input = form.querySelector('[name="' + field + '"]');
+        if (!input) {
+            return;
+        }
+        var note = document.createElement('span');
+        note.className = 'availability';
+        input.insertAdjacentElement('afterend', note);
+        var timer = null;
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            note.textContent = '';
+            var value = input.value.trim();
+            if (!value) {
+                return;
+            }
+            timer = setTimeout(function () {
+                fetch(form.dataset.checkUrl + '?' + new URLSearchParams([[field, value]]), {credentials: 'same-origin'})
+                    .then(function (response) { return response.ok ? response.json() : {}; })
+                    .then(function (result) {
+                        var answer = result[field];
+                        if (answer && answer.value === input.value.trim()) {
+                            note.textContent = answer.available ? 'Available' : 'Already taken';
+                            note.classList.toggle('taken', !answer.available);
+                        }
+                    })
+                    .catch(function () {}); // The submit still validates
+            }, DELAY);
+        });
+    });
+})();
@@ -0,0 +1,298 @@
+# portal/static_assets.py
+#
+# Static asset pipeline.
+# - Collect time: CompressedManifestStaticFilesStorage (STORAGES['staticfiles'])
+#   writes content-hashed copies (style.3f2a…c1.css, recorded in staticfiles.json)
+#   and .gz / .br variants of every compressible file next to the originals.
+# - Run time: StaticFilesWSGI / StaticFilesASGI wrap the Django application
+#   (myproject/wsgi.py, myproject/asgi.py) and answer STATIC_URL requests from
+#   STATIC_ROOT before Django sees them. They pick the smallest variant the client
+#   accepts, send hashed names as immutable for a year, answer revalidations with
+#   304, and hand the open file to the server (wsgi.file_wrapper /
+#   http.response.pathsend / http.response.zerocopysend) so servers that support it
+#   use sendfile() and the bytes never pass through Python.
+# STATIC_ROOT is indexed once, when the wrapper starts: restart the workers after
+# collectstatic, as a deploy does anyway.
+
+import asyncio
+import gzip
+import logging
+import mimetypes
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError: # Optional: without it only .gz variants are written
+    brotli = None
+
+logger = logging.getLogger('portal')
+
+# --- Defaults ---
+COMPRESSIBLE = ('.css', '.js', '.mjs', '.map', '.svg', '.json', '.txt', '.html', '.xml', '.ico', '.ttf', '.otf', '.eot')
+MIN_COMPRESS_SIZE = 256 # Bytes; smaller files gain nothing worth a second lookup
+MIN_SAVING = 0.05 # A variant is kept only if it is at least 5% smaller
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600 # Hashed names never change content
+STATIC_MAX_AGE = 60 # Unhashed names (e.g. referenced by hand), see STATIC_CACHE_MAX_AGE
+BLOCK_SIZE = 64 * 1024 # Read size when the server cannot send the file itself
+# ----------------
+
+# Preferred first: Brotli is ~15-20% smaller than gzip on CSS/JS
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+# --- Storage (collectstatic) ---
+
+def _gzip(data):
+    return gzip.compress(data, compresslevel=9, mtime=0) # mtime=0: same input, same bytes
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also writes name.gz and, when the brotli package
+    is installed, name.br next to every compressible file it collects (originals and
+    hashed copies both).
+    """
+    # Pages still render from a STATIC_ROOT collected without a manifest (the
+    # names are then hashed on the fly); collectstatic writes the manifest.
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            for compressed in self.compress(name):
+                yield name, compressed, True
+
+    def compress(self, name):
+        """Writes the worthwhile variants of one stored file; returns their names."""
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return []
+        written = []
+        compressors = [('.gz', _gzip)] + ([('.br', _brotli)] if brotli is not None else [])
+        for suffix, compressor in compressors:
+            compressed_name = name + suffix
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            compressed = compressor(data)
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                self._save(compressed_name, ContentFile(compressed))
+                written.append(compressed_name)
+        return written
+
+
+# --- Serving ---
+
+def accepted_encodings(header):
+    """Content codings with q > 0 in an Accept-Encoding header ('*' included)."""
+    accepted = set()
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding and q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class Asset:
+    """One URL: its variants [(encoding, path, size, etag)] and fixed headers."""
+
+    def __init__(self, path, immutable):
+        stat = os.stat(path)
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.mtime = int(stat.st_mtime)
+        content_type, _ = mimetypes.guess_type(path)
+        if content_type is None:
+            content_type = 'application/octet-stream'
+        elif content_type.startswith('text/') or content_type in ('application/javascript', 'image/svg+xml', 'application/json'):
+            content_type += '; charset=utf-8'
+        self.content_type = content_type
+        max_age = IMMUTABLE_MAX_AGE if immutable else getattr(settings, 'STATIC_CACHE_MAX_AGE', STATIC_MAX_AGE)
+        self.cache_control = f"public, max-age={max_age}" + (", immutable" if immutable else "")
+        self.variants = []
+        for encoding, suffix in ENCODINGS:
+            if os.path.isfile(path + suffix):
+                self.variants.append(self._variant(encoding, path + suffix))
+        self.variants.append(self._variant(None, path))
+
+    @staticmethod
+    def _variant(encoding, path):
+        stat = os.stat(path)
+        return encoding, path, stat.st_size, f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+    def choose(self, accept_encoding):
+        accepted = accepted_encodings(accept_encoding) if accept_encoding else set()
+        for variant in self.variants:
+            if variant[0] is None or variant[0] in accepted or '*' in accepted:
+                return variant
+
+    def not_modified(self, etag, if_none_match, if_modified_since):
+        if if_none_match:
+            return etag in [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        if if_modified_since:
+            try:
+                return int(parsedate_to_datetime(if_modified_since).timestamp()) >= self.mtime
+            except (TypeError, ValueError):
+                return False
+        return False
+
+
+class StaticFiles:
+    """
+    Index of STATIC_ROOT by URL path and the response logic shared by the WSGI and
+    ASGI wrappers. Only indexed files are served, so no request path ever reaches
+    the filesystem.
+    """
+
+    def __init__(self, root=None, url=None):
+        self.root = str(root if root is not None else settings.STATIC_ROOT or '')
+        self.prefix = '/' + (url if url is not None else settings.STATIC_URL or '').lstrip('/')
+        self.assets = {}
+        if self.root and os.path.isdir(self.root) and self.prefix != '/':
+            self._index()
+
+    def _index(self):
+        storage = CompressedManifestStaticFilesStorage(location=self.root)
+        hashed = set(storage.hashed_files.values()) # From staticfiles.json
+        suffixes = [suffix for _, suffix in ENCODINGS]
+        for directory, _, files in os.walk(self.root):
+            present = set(files)
+            for filename in files:
+                if any(filename.endswith(suffix) and filename[:-len(suffix)] in present for suffix in suffixes):
+                    continue # A variant, found through its original
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                self.assets[self.prefix + name] = Asset(path, name in hashed)
+        logger.info(f"Indexed {len(self.assets)} static files under {self.root}")
+
+    def handles(self, path):
+        return bool(self.assets) and path.startswith(self.prefix)
+
+    def respond(self, method, path, get_header):
+        """
+        (status, headers, file path or None for no body), or None when the path is
+        not a static file (the application answers, e.g. with a 404).
+        """
+        asset = self.assets.get(unquote(path))
+        if asset is None:
+            return None
+        if method not in ('GET', 'HEAD'):
+            return 405, [('Allow', 'GET, HEAD'), ('Content-Length', '0')], None
+        encoding, file_path, size, etag = asset.choose(get_header('accept-encoding'))
+        headers = [
+            ('Cache-Control', asset.cache_control),
+            ('ETag', etag),
+            ('Last-Modified', asset.last_modified),
+        ]
+        if len(asset.variants) > 1:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if asset.not_modified(etag, get_header('if-none-match'), get_header('if-modified-since')):
+            return 304, headers, None
+        headers += [('Content-Type', asset.content_type), ('Content-Length', str(size))]
+        if encoding:
+            headers.append(('Content-Encoding', encoding))
+        return 200, headers, file_path if method == 'GET' else None
+
+
+STATUS_LINES = {200: '200 OK', 304: '304 Not Modified', 405: '405 Method Not Allowed'}
+
+
+class _FileIterator:
+    """Block-by-block body for WSGI servers without wsgi.file_wrapper."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def __iter__(self):
+        while block := self.f.read(BLOCK_SIZE):
+            yield block
+
+    def close(self):
+        self.f.close()
+
+
+class StaticFilesWSGI:
+    """WSGI middleware serving STATIC_ROOT ahead of the wrapped application."""
+
+    def __init__(self, application, files=None):
+        self.application = application
+        self.files = files if files is not None else StaticFiles()
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        result = None
+        if self.files.handles(path):
+            def get_header(name):
+                return environ.get('HTTP_' + name.upper().replace('-', '_'))
+            result = self.files.respond(environ['REQUEST_METHOD'], path, get_header)
+        if result is None:
+            return self.application(environ, start_response)
+        status, headers, file_path = result
+        start_response(STATUS_LINES[status], headers)
+        if file_path is None:
+            return []
+        f = open(file_path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        # gunicorn's and uWSGI's file wrappers send the file with sendfile()
+        return file_wrapper(f, BLOCK_SIZE) if file_wrapper else _FileIterator(f)
+
+
+class StaticFilesASGI:
+    """ASGI middleware serving STATIC_ROOT ahead of the wrapped application."""
+
+    def __init__(self, application, files=None):
+        self.application = application
+        self.files = files if files is not None else StaticFiles()
+
+    async def __call__(self, scope, receive, send):
+        result = None
+        if scope['type'] == 'http' and self.files.handles(scope['path']):
+            headers = {name.decode('latin-1').lower(): value.decode('latin-1') for name, value in scope['headers']}
+            result = self.files.respond(scope['method'], scope['path'], headers.get)
+        if result is None:
+            return await self.application(scope, receive, send)
+        status, headers, file_path = result
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+        })
+        if file_path is None:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        extensions = scope.get('extensions') or {}
+        if 'http.response.pathsend' in extensions:
+            await send({'type': 'http.response.pathsend', 'path': file_path})
+            return
+        with open(file_path, 'rb') as f:
+            if 'http.response.zerocopysend' in extensions:
+                await send({'type': 'http.response.zerocopysend', 'file': f})
+                return
+            while True:
+                block = await asyncio.to_thread(f.read, BLOCK_SIZE)
+                more = len(block) == BLOCK_SIZE
+                await send({'type': 'http.response.body', 'body': block, 'more_body': more})
+                if not more:
+                    break
@@ -0,0 +1,247 @@
+# portal/summary.py
+#
+# Incremental maintenance of the numbers derived from Resource:
+# - CustomUser.project_count / program_count, the resources each user added;
+# - ResourceSummary, behind the dashboard: each user's latest additions and
+#   the site-wide totals.
+# The Resource signals (portal/signals.py) call in here inside the writing
+# transaction (Resource.save() is atomic for this): counters move with F()
+# expressions in a single UPDATE, so concurrent workers never lose an
+# increment, and the user's latest additions are rewritten in one UPDATE.
+# import_resources reports its bulk inserts here as well (bulk_create() sends
+# no signals).
+# rebuild() recomputes the summary rows from Resource (`manage.py
+# rebuild_resource_summary`) and check_user_counts() the user counters, a chunk
+# of users per transaction (`manage.py check_resource_counts`), to repair
+# drift, e.g. after raw SQL writes.
+
+import time
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value, Window
+from django.db.models.functions import Coalesce, Greatest, RowNumber
+
+from .models import CustomUser, Resource, ResourceSummary
+
+LATEST_COUNT = 5 # Latest additions kept per user
+COUNTERS = {'PROJECT': 'projects', 'PROGRAM': 'programs'} # ResourceSummary (site row)
+USER_COUNTERS = {'PROJECT': 'project_count', 'PROGRAM': 'program_count'} # CustomUser
+
+# --- Defaults ---
+CHECK_CHUNK_SIZE = 1000 # Users compared (and repaired) per transaction
+CHECK_PAUSE = 0.05 # Seconds between chunks, so other writers get the lock
+# ----------------
+
+
+def entry(resource):
+    """What the dashboard shows of one resource in the latest additions."""
+    return {
+        'id': resource.pk,
+        'title': resource.title,
+        'resource_type': resource.resource_type,
+        'created_at': resource.created_at.isoformat(),
+    }
+
+
+# --- Incremental Updates ---
+
+def _rows(user_id):
+    return ResourceSummary.objects.filter(user_id=user_id) # None: the site row
+
+
+def _moves(deltas, fields):
+    # {resource type: delta} -> F() updates; MAX(.., 0) so drift cannot break the CHECK constraint
+    return {fields[resource_type]: Greatest(F(fields[resource_type]) + delta, Value(0))
+            for resource_type, delta in deltas.items() if delta}
+
+
+def _count_user(user_id, deltas):
+    """Moves a user's counters in one UPDATE (nothing if the user is being deleted)."""
+    changes = _moves(deltas, USER_COUNTERS)
+    if changes:
+        CustomUser.objects.filter(pk=user_id).update(**changes)
+
+
+def _update_or_create(user_id, changes, defaults):
+    """UPDATEs a summary row, creating it with `defaults` if it does not exist yet."""
+    if _rows(user_id).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            ResourceSummary.objects.create(user_id=user_id, **defaults)
+    except IntegrityError: # Another worker created it first
+        _rows(user_id).update(**changes)
+
+
+def _count_site(deltas):
+    changes = _moves(deltas, COUNTERS)
+    if changes:
+        _update_or_create(None, changes, {COUNTERS[t]: max(delta, 0) for t, delta in deltas.items()})
+
+
+def _stored_latest(user_id):
+    """The row's latest additions (None without a row), locked for this transaction."""
+    return _rows(user_id).select_for_update().values_list('latest', flat=True).first()
+
+
+def _recent(user_id):
+    resources = Resource.objects.filter(created_by_id=user_id).order_by('-created_at', '-id')[:LATEST_COUNT]
+    return [entry(resource) for resource in resources]
+
+
+def resources_added(resources):
+    """Counts in newly created resources (one from post_save, or a bulk_create() batch)."""
+    by_user = defaultdict(list)
+    for resource in resources:
+        by_user[resource.created_by_id].append(resource)
+    site = Counter()
+    with transaction.atomic(savepoint=False):
+        for user_id, added in by_user.items():
+            deltas = Counter(resource.resource_type for resource in added)
+            site.update(deltas)
+            _count_user(user_id, deltas)
+            newest = sorted(added, key=lambda resource: (resource.created_at, resource.pk), reverse=True)
+            latest = ([entry(resource) for resource in newest] + (_stored_latest(user_id) or []))[:LATEST_COUNT]
+            _update_or_create(user_id, {'latest': latest}, {'latest': latest})
+        _count_site(site)
+
+
+def resource_removed(resource):
+    """Counts out a deleted resource (post_delete)."""
+    user_id, deltas = resource.created_by_id, {resource.resource_type: -1}
+    with transaction.atomic(savepoint=False):
+        _count_user(user_id, deltas)
+        latest = _stored_latest(user_id)
+        if latest is not None and any(item['id'] == resource.pk for item in latest):
+            # Refilled from Resource, so the next older addition moves up
+            _rows(user_id).update(latest=_recent(user_id))
+        _count_site(deltas)
+
+
+def resource_changed(resource, previous):
+    """
+    An edit of a saved resource (post_save). previous is its (owner id, type) as
+    loaded from the database, or None when unknown; a change moves it between
+    counters. The latest additions that list it are refreshed.
+    """
+    current = (resource.created_by_id, resource.resource_type)
+    with transaction.atomic(savepoint=False):
+        if previous is not None and previous != current:
+            users, site = defaultdict(Counter), Counter()
+            for (user_id, resource_type), delta in ((previous, -1), (current, 1)):
+                users[user_id][resource_type] += delta
+                site[resource_type] += delta
+            for user_id, deltas in users.items():
+                _count_user(user_id, deltas)
+                latest = _recent(user_id)
+                _update_or_create(user_id, {'latest': latest}, {'latest': latest})
+            _count_site(site)
+            return
+        latest = _stored_latest(resource.created_by_id)
+        if latest is not None:
+            refreshed = [entry(resource) if item['id'] == resource.pk else item for item in latest]
+            if refreshed != latest:
+                _rows(resource.created_by_id).update(latest=refreshed)
+
+
+# --- Reads ---
+
+def _split(rows, user):
+    rows = {row.user_id: row for row in rows}
+    return rows.get(user.pk) or ResourceSummary(user=user), rows.get(None) or ResourceSummary()
+
+
+def _dashboard_rows(user):
+    return ResourceSummary.objects.filter(Q(user=user) | Q(user__isnull=True))
+
+
+def for_dashboard(user):
+    """(the user's summary, the site-wide summary), unsaved empty ones if missing; one query."""
+    return _split(_dashboard_rows(user), user)
+
+
+async def afor_dashboard(user):
+    return _split([row async for row in _dashboard_rows(user)], user)
+
+
+# --- Rebuild ---
+
+EMPTY = {'projects': 0, 'programs': 0, 'latest': []}
+
+
+def compute():
+    """Every row as it should be, from Resource: {user id or None: field values}."""
+    rows = defaultdict(lambda: dict(EMPTY, latest=[]))
+    counts = Resource.objects.order_by().values('resource_type').annotate(count=Count('id'))
+    for item in counts:
+        rows[None][COUNTERS[item['resource_type']]] += item['count']
+    rows[None] # The site row exists even without resources
+    rank = Window(RowNumber(), partition_by=F('created_by'), order_by=[F('created_at').desc(), F('id').desc()])
+    recent = Resource.objects.annotate(rank=rank).filter(rank__lte=LATEST_COUNT).order_by('created_by', 'rank')
+    for resource in recent:
+        rows[resource.created_by_id]['latest'].append(entry(resource))
+    return dict(rows)
+
+
+def rebuild(dry_run=False):
+    """
+    Rewrites the rows that differ from compute() (missing, extra or wrong; an
+    empty user row counts as missing) in one transaction. Returns the user ids
+    (None for the site row) that had drifted.
+    """
+    with transaction.atomic():
+        expected = compute()
+        actual = {
+            row.user_id: {'projects': row.projects, 'programs': row.programs, 'latest': row.latest}
+            for row in ResourceSummary.objects.select_for_update()
+        }
+        drifted = [user_id for user_id in expected.keys() | actual.keys()
+                   if expected.get(user_id, EMPTY) != actual.get(user_id, EMPTY) or user_id not in actual]
+        if drifted and not dry_run:
+            stale = Q(user_id__in=[user_id for user_id in drifted if user_id is not None])
+            if None in drifted:
+                stale |= Q(user__isnull=True)
+            ResourceSummary.objects.filter(stale).delete()
+            ResourceSummary.objects.bulk_create(
+                ResourceSummary(user_id=user_id, **expected[user_id]) for user_id in drifted if user_id in expected
+            )
+    return drifted
+
+
+def _counted(resource_type):
+    """Correlated COUNT of a user's resources of one type, for UPDATE ... SET."""
+    count = (Resource.objects.filter(created_by=OuterRef('pk'), resource_type=resource_type)
+             .order_by().values('created_by').annotate(count=Count('id')).values('count'))
+    return Coalesce(Subquery(count), Value(0))
+
+
+def check_user_counts(chunk_size=CHECK_CHUNK_SIZE, pause=CHECK_PAUSE, dry_run=False):
+    """
+    Compares CustomUser.project_count/program_count with Resource, chunk_size users
+    (in primary key order) per short transaction, and resets the drifted ones with
+    one UPDATE per chunk that counts at write time. Returns the drifted user ids.
+    """
+    drifted, last = [], 0
+    while True:
+        with transaction.atomic():
+            users = list(CustomUser.objects.filter(pk__gt=last).order_by('pk')
+                         .values_list('pk', *USER_COUNTERS.values())[:chunk_size])
+            if not users:
+                break
+            last = users[-1][0]
+            actual = defaultdict(Counter)
+            counts = (Resource.objects.filter(created_by__in=[user[0] for user in users]).order_by()
+                      .values_list('created_by', 'resource_type').annotate(Count('id')))
+            for user_id, resource_type, count in counts:
+                actual[user_id][resource_type] = count
+            wrong = [pk for pk, *stored in users
+                     if stored != [actual[pk][resource_type] for resource_type in USER_COUNTERS]]
+            if wrong and not dry_run:
+                CustomUser.objects.filter(pk__in=wrong).update(
+                    **{field: _counted(resource_type) for resource_type, field in USER_COUNTERS.items()})
+            drifted += wrong
+        if len(users) < chunk_size:
+            break
+        time.sleep(pause)
+    return drifted
@@ -0,0 +1,340 @@
+# portal/taskqueue.py
+#
+# Background tasks kept in the project's database (the Task table): work that
+# need not finish before the response leaves the request path, with no broker
+# to run next to the site.
+# - `@task` registers a function; `func.delay(*args, **kwargs)` is one INSERT.
+#   Inside a transaction the row commits or rolls back with the writes that
+#   asked for it, so a worker never sees a task for data that was never saved.
+# - `manage.py run_workers` runs them: processes x threads. Each process claims
+#   up to as many due tasks as it has idle threads with one UPDATE ...
+#   RETURNING (oldest first, through a partial index on available_at) and runs them on its pool;
+#   the results of a round are written back in one transaction.
+# - A claimed task is hidden for the visibility timeout. A worker that dies (or
+#   hangs) mid-task leaves it to be claimed again once that passes: tasks run
+#   at least once, so they must be safe to repeat. Lost claims count as
+#   attempts too: the claim that finds one past max_attempts marks it failed,
+#   so a task that kills its worker does not take down every worker in turn.
+# - A task that raises is retried after an exponential backoff (with jitter)
+#   until max_attempts; then it is kept as 'failed' with its last error.
+# - Enqueues, runs by outcome, queue lag (due -> claimed) and run times go to
+#   the request metrics (portal/metrics.py); /metrics/ adds the queue depth.
+# Task functions live in `<app>/tasks.py` of the installed apps (imported by
+# the workers like admin.py modules are).
+
+import functools
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connections, router, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from . import metrics
+from .models import Task
+
+logger = logging.getLogger('portal')
+
+# --- Defaults ---
+PROCESSES = 1 # Worker processes started by run_workers
+THREADS = 4 # Tasks run at the same time per process
+VISIBILITY_TIMEOUT = 300 # Seconds a claimed task stays hidden from other workers
+MAX_ATTEMPTS = 5 # Runs of a task before it is marked failed
+RETRY_BACKOFF = 10 # Seconds before the first retry; doubled for each further one
+MAX_BACKOFF = 3600
+POLL_INTERVAL = 0.5 # Seconds an idle worker waits before looking again
+REPORT_INTERVAL = 60 # Seconds between a worker's throughput lines in the log
+ERROR_LENGTH = 2000 # Characters of the last traceback kept on the task
+# ----------------
+
+RunStats = namedtuple('RunStats', 'done retried failed elapsed')
+
+
+def _option(name, default):
+    return getattr(settings, f'TASK_{name}', default)
+
+
+# --- Registration and Enqueueing ---
+
+_registry = {}
+
+
+class TaskFunction:
+    """A registered task: call it to run inline, .delay() to queue it."""
+
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        functools.update_wrapper(self, func)
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        return enqueue(self.name, args, kwargs, max_attempts=self.max_attempts)
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """Registers a task function: `@task` or `@task(max_attempts=3)`."""
+    def register(func):
+        registered = TaskFunction(func, name or f'{func.__module__}.{func.__qualname__}', max_attempts)
+        _registry[registered.name] = registered
+        return registered
+    return register(func) if func is not None else register
+
+
+def enqueue(name, args=(), kwargs=None, delay=0, max_attempts=None):
+    """Queues a call of the registered task `name` (arguments must be JSON), due in `delay` seconds."""
+    run_at = timezone.now() + timedelta(seconds=delay)
+    queued = Task.objects.create(
+        name=name, args=list(args), kwargs=kwargs or {}, run_at=run_at, available_at=run_at,
+        max_attempts=max_attempts or _option('MAX_ATTEMPTS', MAX_ATTEMPTS),
+    )
+    transaction.on_commit(lambda: metrics.registry.count_enqueued(name))
+    return queued
+
+
+# --- Claiming and Running ---
+
+# Due rows that still have attempts left are claimed; the others (their last
+# claim expired without a result) are marked failed in the same statement
+CLAIM_SQL = """
+    UPDATE {table} SET
+        status = CASE WHEN attempts < max_attempts THEN %s ELSE %s END,
+        available_at = CASE WHEN attempts < max_attempts THEN %s END,
+        worker = CASE WHEN attempts < max_attempts THEN %s ELSE '' END,
+        error = CASE WHEN attempts < max_attempts THEN error ELSE %s END,
+        attempts = CASE WHEN attempts < max_attempts THEN attempts + 1 ELSE attempts END
+    WHERE id IN (SELECT id FROM {table} WHERE available_at <= %s ORDER BY available_at, id LIMIT %s)
+    RETURNING *
+"""
+LOST_ERROR = "No result: the worker of the last attempt died or hung past the visibility timeout"
+
+
+def claim(worker, limit, visibility_timeout=VISIBILITY_TIMEOUT):
+    """
+    Takes up to `limit` due tasks for `worker` (unique per claim) and hides them
+    for `visibility_timeout` seconds. Returns (tasks, claim time). Due tasks
+    whose attempts ran out while claimed are marked failed instead.
+    One UPDATE ... RETURNING (SQLite 3.35+): concurrent workers never get the
+    same row, and there is no second query to fetch what was claimed. An empty
+    queue costs one read instead, as the UPDATE takes the write lock.
+    """
+    now = timezone.now()
+    if not Task.objects.filter(available_at__lte=now).exists():
+        return [], now
+    using = router.db_for_write(Task)
+    adapt = connections[using].ops.adapt_datetimefield_value
+    deadline = now + timedelta(seconds=visibility_timeout)
+    sql = CLAIM_SQL.format(table=connections[using].ops.quote_name(Task._meta.db_table))
+    params = [Task.RUNNING, Task.FAILED, adapt(deadline), worker, LOST_ERROR, adapt(now), limit]
+    claimed = []
+    for row in sorted(Task.objects.raw(sql, params, using=using), key=lambda row: row.pk):
+        if row.status == Task.RUNNING:
+            claimed.append(row)
+        else:
+            logger.error(f"Task {row.name} #{row.pk} failed after {row.attempts} attempts: {LOST_ERROR}")
+            metrics.registry.observe_task(row.name, 'failed', None, None)
+    return claimed, now
+
+
+def execute(claimed):
+    """Runs a claimed Task in this thread; returns (traceback text or None, seconds)."""
+    close_old_connections()
+    start = time.perf_counter()
+    try:
+        registered = _registry.get(claimed.name)
+        if registered is None:
+            raise LookupError(f"no task named {claimed.name} is registered")
+        registered.func(*claimed.args, **claimed.kwargs)
+        error = None
+    except Exception:
+        error = traceback.format_exc()[-ERROR_LENGTH:]
+    finally:
+        close_old_connections()
+    return error, time.perf_counter() - start
+
+
+def backoff(attempts):
+    """Seconds before the retry that follows failed attempt number `attempts`."""
+    delay = min(_option('RETRY_BACKOFF', RETRY_BACKOFF) * 2 ** (attempts - 1), MAX_BACKOFF)
+    return delay * random.uniform(0.5, 1) # Jitter: tasks that failed together do not come back together
+
+
+def finish(worker, results, claimed_at):
+    """
+    Writes back one claim's [(Task, error or None, seconds)] in one transaction:
+    done tasks are deleted, failed ones rescheduled or marked failed. Tasks whose
+    claim passed to another worker meanwhile are left alone. Returns the outcome
+    counts.
+    """
+    outcomes = {'done': 0, 'retried': 0, 'failed': 0}
+    now = timezone.now()
+    with transaction.atomic():
+        done = [claimed.pk for claimed, error, _ in results if error is None]
+        if done:
+            Task.objects.filter(pk__in=done, worker=worker).delete()
+        for claimed, error, duration in results:
+            mine = Task.objects.filter(pk=claimed.pk, worker=worker)
+            if error is None:
+                outcome = 'done'
+            elif claimed.attempts < claimed.max_attempts:
+                outcome = 'retried'
+                delay = backoff(claimed.attempts)
+                retry_at = now + timedelta(seconds=delay)
+                mine.update(status=Task.QUEUED, run_at=retry_at, available_at=retry_at, worker='', error=error)
+                logger.warning(f"Task {claimed.name} #{claimed.pk} raised (attempt {claimed.attempts} of {claimed.max_attempts}), "
+                               f"retrying in {delay:.0f} s: {error.strip().splitlines()[-1]}")
+            else:
+                outcome = 'failed'
+                mine.update(status=Task.FAILED, available_at=None, worker='', error=error)
+                logger.error(f"Task {claimed.name} #{claimed.pk} failed after {claimed.attempts} attempts: {error}")
+            outcomes[outcome] += 1
+            lag = max((claimed_at - claimed.run_at).total_seconds(), 0.0)
+            metrics.registry.observe_task(claimed.name, outcome, lag, duration)
+    return outcomes
+
+
+# --- Workers ---
+
+class Worker:
+    """
+    One process's dispatch loop: claims as many tasks as it has idle threads,
+    runs them on a thread pool and writes back the results. Stops when `stop`
+    is set (after the running tasks), or in `burst` mode once nothing is due.
+    """
+
+    def __init__(self, threads=None, visibility_timeout=None, poll_interval=None, burst=False, stop=None):
+        self.threads = threads or _option('WORKER_THREADS', THREADS)
+        self.visibility_timeout = visibility_timeout or _option('VISIBILITY_TIMEOUT', VISIBILITY_TIMEOUT)
+        self.poll_interval = poll_interval or _option('POLL_INTERVAL', POLL_INTERVAL)
+        self.burst = burst
+        self.stop = stop or threading.Event()
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.claims = 0
+
+    def _claim(self, limit):
+        """(claim token, tasks, claim time); the token tells this claim's rows from any other."""
+        self.claims += 1
+        token = f'{self.name}:{self.claims}'
+        try:
+            return (token, *claim(token, limit, self.visibility_timeout))
+        except DatabaseError as exc: # e.g. "database is locked" past the timeout: look again later
+            logger.warning(f"Task worker {self.name} could not claim tasks: {exc}")
+            return token, [], timezone.now()
+
+    def run(self):
+        autodiscover_modules('tasks')
+        totals = {'done': 0, 'retried': 0, 'failed': 0}
+        start = reported = time.monotonic()
+        reported_count = 0
+        running = {} # future -> (Task, claim token, claim time)
+        with ThreadPoolExecutor(self.threads, thread_name_prefix='task') as pool:
+            while True:
+                if not self.stop.is_set() and len(running) < self.threads:
+                    token, claimed, claimed_at = self._claim(self.threads - len(running))
+                    for item in claimed:
+                        running[pool.submit(execute, item)] = (item, token, claimed_at)
+                if not running:
+                    if self.stop.is_set() or self.burst:
+                        break
+                    self.stop.wait(self.poll_interval)
+                    continue
+                # With idle threads, look for new tasks again after the poll interval at the latest
+                busy = len(running) == self.threads
+                finished, _ = wait(running, timeout=None if busy else self.poll_interval, return_when=FIRST_COMPLETED)
+                # Written back per claim: the claim token guards the write
+                rounds = {}
+                for future in finished:
+                    item, token, claimed_at = running.pop(future)
+                    rounds.setdefault((token, claimed_at), []).append((item, *future.result()))
+                for (token, claimed_at), results in rounds.items():
+                    try:
+                        for outcome, count in finish(token, results, claimed_at).items():
+                            totals[outcome] += count
+                    except DatabaseError as exc: # Unacknowledged: they run again after the visibility timeout
+                        logger.warning(f"Task worker {self.name} could not record {len(results)} results: {exc}")
+                metrics.flush()
+                now = time.monotonic()
+                if now - reported >= REPORT_INTERVAL:
+                    count = sum(totals.values())
+                    logger.info(f"Task worker {self.name}: {count - reported_count} tasks in {now - reported:.0f} s "
+                                f"({(count - reported_count) / (now - reported):.1f}/s)")
+                    reported, reported_count = now, count
+        metrics.flush(force=True)
+        return RunStats(totals['done'], totals['retried'], totals['failed'], time.monotonic() - start)
+
+
+def _child(results, options):
+    stop = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stop.set())
+    results.put(Worker(stop=stop, **options).run())
+    connections.close_all()
+
+
+def serve(processes=None, burst=False, **options):
+    """
+    Runs `processes` Workers (forked; this process waits for them) until SIGTERM
+    or Ctrl-C, or until the queue is drained in `burst` mode. `options` go to
+    Worker. Returns the RunStats of all of them added up.
+    """
+    processes = processes or _option('WORKER_PROCESSES', PROCESSES)
+    stop = threading.Event()
+    handlers = {signum: signal.signal(signum, lambda *args: stop.set()) for signum in (signal.SIGTERM, signal.SIGINT)}
+    try:
+        if processes == 1:
+            return Worker(burst=burst, stop=stop, **options).run()
+        connections.close_all() # Never share a database connection across fork()
+        context = multiprocessing.get_context('fork')
+        results = context.SimpleQueue()
+        children = [context.Process(target=_child, args=(results, dict(options, burst=burst)), name=f'task-worker-{i}')
+                    for i in range(processes)]
+        for child in children:
+            child.start()
+        while any(child.is_alive() for child in children):
+            if stop.wait(0.2):
+                for child in children:
+                    if child.is_alive():
+                        child.terminate() # SIGTERM: finish the running tasks, then exit
+                for child in children:
+                    child.join()
+        stats = [results.get() for child in children if child.exitcode == 0]
+        return RunStats(sum(s.done for s in stats), sum(s.retried for s in stats), sum(s.failed for s in stats),
+                        max((s.elapsed for s in stats), default=0.0))
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+
+
+# --- Queue State ---
+
+def gauges(now=None):
+    """The queue's depth by state and its lag, for /metrics/ (metrics.GAUGES); one query."""
+    now = now or timezone.now()
+    ready = Q(available_at__lte=now)
+    counts = Task.objects.aggregate(
+        ready=Count('pk', filter=ready),
+        scheduled=Count('pk', filter=Q(status=Task.QUEUED, available_at__gt=now)),
+        running=Count('pk', filter=Q(status=Task.RUNNING, available_at__gt=now)),
+        failed=Count('pk', filter=Q(status=Task.FAILED)),
+        oldest=Min('available_at', filter=ready),
+    )
+    oldest = counts.pop('oldest')
+    return {
+        'portal_task_queue_depth': counts,
+        'portal_task_queue_lag_seconds': {'': (now - oldest).total_seconds() if oldest else 0.0},
+    }
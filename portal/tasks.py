@@ -0,0 +1,21 @@
+# portal/tasks.py
+#
+# The portal's background tasks (see portal/taskqueue.py), run by `manage.py
+# run_workers`. They run at least once, so each must be safe to repeat.
+
+from . import linkcheck
+from .models import Resource
+from .taskqueue import task
+
+
+@task(max_attempts=3)
+def check_resource_url(resource_id):
+    """
+    Liveness check of a newly submitted or changed Resource.url, so a dead link
+    shows up without waiting for the next `check_resource_urls` pass. Checks the
+    resource's URL as it is now; skipped if the resource is gone or the URL was
+    checked within LINK_CHECK_MAX_AGE.
+    """
+    url = Resource.objects.filter(pk=resource_id).values_list('url', flat=True).first()
+    if url:
+        linkcheck.check_urls([url])
@@ -0,0 +1,54 @@
+# portal/test_runner.py
+#
+# settings.TEST_RUNNER: `manage.py test` leaves the working tree as it found it.
+# The runtime files (cache, rate-limit, lockout and metrics stores, portal.log)
+# move to a throwaway directory for the run, in this process through settings
+# overrides and in the subprocesses some tests start through PORTAL_RUNTIME_DIR
+# (read by settings.py).
+
+import copy
+import logging.config
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class IsolatedRuntimeTestRunner(DiscoverRunner):
+    """DiscoverRunner with the runtime files in a temporary directory."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._runtime = tempfile.TemporaryDirectory(prefix='portal-test-')
+        self._environ = os.environ.get('PORTAL_RUNTIME_DIR')
+        os.environ['PORTAL_RUNTIME_DIR'] = self._runtime.name
+        runtime = Path(self._runtime.name)
+
+        caches = copy.deepcopy(settings.CACHES)
+        caches['default']['LOCATION'] = runtime / 'django_cache.sqlite3'
+        logging_config = copy.deepcopy(settings.LOGGING)
+        logging_config['handlers']['file']['filename'] = runtime / 'portal.log'
+        self._overrides = override_settings(
+            CACHES=caches,
+            RATE_LIMIT_OPTIONS={**settings.RATE_LIMIT_OPTIONS, 'path': runtime / 'ratelimit.sqlite3'},
+            LOGIN_LOCKOUT_DB=runtime / 'lockout.sqlite3',
+            METRICS_DB=runtime / 'metrics.sqlite3',
+            LOGGING=logging_config,
+        )
+        self._overrides.enable()
+        # Logging was configured at django.setup(); the file handler opens its
+        # file on the first record only, so nothing was written to portal.log yet
+        logging.config.dictConfig(logging_config)
+
+    def teardown_test_environment(self, **kwargs):
+        self._overrides.disable()
+        logging.config.dictConfig(settings.LOGGING) # Closes the handler writing into the directory
+        if self._environ is None:
+            os.environ.pop('PORTAL_RUNTIME_DIR', None)
+        else:
+            os.environ['PORTAL_RUNTIME_DIR'] = self._environ
+        self._runtime.cleanup()
+        super().teardown_test_environment(**kwargs)
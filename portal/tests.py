@@ -1,3 +1,1918 @@
-from django.test import TestCase
+# portal/tests.py
 
-# Create your tests here.
+import ast
+import asyncio
+import csv
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, SimpleTestCase, TestCase, TransactionTestCase, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.http import HttpResponse
+from django.urls import path, resolve, reverse
+from django.utils import timezone
+
+from .cache_backends import SQLiteCache
+from .db_router import ReadReplicaRouter
+from .forms import CustomUserCreationForm
+from .hashers import CalibratedArgon2PasswordHasher, get_pool, shutdown_pool
+from .jsonlog import JSONFormatter, QueuedRotatingFileHandler, RequestLogContextMiddleware
+from .lockout import LockoutStore
+from .loganalytics import Report, parse_line, scan
+from .models import CustomUser, LinkCheck, Resource, ResourceSummary, Task
+from .pagination import KeysetPaginator, encode_cursor
+from .queryplan import explain, plan_problems, record_queries
+from .ratelimit import MemoryBackend, SQLiteBackend
+from .resource_import import import_resources
+from .views import MAX_LOGIN_ATTEMPTS
+from . import async_views, benchmark, export, metrics, urls
+from .search import build_match_query, search_resources
+from . import availability, duplicates, jsonlog, linkcheck, resource_cache, session_backend, static_assets, summary, taskqueue, tasks
+
+# Keeps tests away from the on-disk cache directory
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTests(TestCase):
+    """
+    Tests for the cursor pagination used by resources_view.
+    """
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.user = CustomUser.objects.create_user(username='pager', password='Password123')
+        # Created in a single burst, so several rows share a created_at value and
+        # only the id tie-breaker keeps the ordering total.
+        for i in range(7):
+            Resource.objects.create(title=f"Project {i}", description="d", resource_type='PROJECT', created_by=self.user)
+        self.queryset = Resource.objects.filter(resource_type='PROJECT')
+
+    def _walk(self, direction, page):
+        query = page.next_query if direction == 'next' else page.previous_query
+        request = self.factory.get(f"/resources/?{query}")
+        return KeysetPaginator(self.queryset, 3).get_page(request, 'projects_cursor')
+
+    def test_forward_and_back_cover_every_row_once(self):
+        """Walking forward visits every row exactly once; walking back returns the same pages."""
+        page = KeysetPaginator(self.queryset, 3).get_page(self.factory.get('/resources/'), 'projects_cursor')
+        self.assertFalse(page.has_previous)
+        pages = [[r.pk for r in page]]
+        while page.has_next:
+            page = self._walk('next', page)
+            pages.append([r.pk for r in page])
+
+        expected = list(self.queryset.order_by('-created_at', '-id').values_list('pk', flat=True))
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+
+        page = self._walk('previous', page)
+        self.assertEqual([r.pk for r in page], pages[1])
+        self.assertTrue(page.has_next)
+
+    def test_each_page_is_one_query(self):
+        """Deep pages cost exactly one query, the same as page one."""
+        page = KeysetPaginator(self.queryset, 3).get_page(self.factory.get('/resources/'), 'projects_cursor')
+        page = self._walk('next', page)
+        with self.assertNumQueries(1):
+            self._walk('next', page)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        request = self.factory.get('/resources/?projects_cursor=not-a-cursor')
+        page = KeysetPaginator(self.queryset, 3).get_page(request, 'projects_cursor')
+        self.assertFalse(page.has_previous)
+        self.assertEqual(len(page), 3)
+
+    def test_resources_view_renders_paginated_lists(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('resources'), {'page_size': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'class="resource-item', count=5)
+        self.assertContains(response, 'Older projects')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResourceCacheTests(TestCase):
+    """
+    Tests for the generation-versioned resource cache.
+    """
+    def setUp(self):
+        cache.clear()
+        resource_cache.stats.reset()
+        self.user = CustomUser.objects.create_user(username='cacher', password='Password123')
+        self.client.force_login(self.user)
+
+    def test_second_render_is_served_from_cache(self):
+        self.client.get(reverse('resources'))
+        # The user lookup only; the session and the lists come from the cache.
+        with self.assertNumQueries(1):
+            self.client.get(reverse('resources'))
+        counts = resource_cache.stats.snapshot()
+        self.assertEqual(counts['html_hits'], 2)
+        self.assertEqual(counts['html_misses'], 2)
+
+    def test_save_and_delete_invalidate(self):
+        self.client.get(reverse('resources'))
+        generation = resource_cache.get_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            resource = Resource.objects.create(title="Fresh", description="d", resource_type='PROGRAM', created_by=self.user)
+        self.assertNotEqual(resource_cache.get_generation(), generation)
+        self.assertContains(self.client.get(reverse('resources')), "Fresh")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resource.delete()
+        self.assertNotContains(self.client.get(reverse('resources')), "Fresh")
+
+    def test_fragments_ignore_unknown_and_tampered_parameters(self):
+        for i in range(3):
+            Resource.objects.create(title=f"P{i}", description="d", resource_type='PROJECT', created_by=self.user)
+        first = self.client.get(reverse('resources'), {'page_size': 2, 'utm_source': 'first', 'programs_cursor': 'bogus'})
+        self.assertNotContains(first, 'utm_source')
+        self.assertNotContains(first, 'bogus')
+        self.assertContains(first, 'href="?page_size=2&amp;projects_cursor=')
+        resource_cache.stats.reset()
+        self.client.get(reverse('resources'), {'page_size': '2', 'utm_source': 'second', 'programs_cursor': 'other'})
+        self.assertEqual(resource_cache.stats.snapshot(), {'html_hits': 2}) # Same keys as the first visit
+
+    def test_cached_rows_are_plain_values(self):
+        Resource.objects.create(title="P", description="d", resource_type='PROJECT', created_by=self.user)
+        rows, has_next, has_previous = resource_cache.get_rows('PROJECT', None, 20)
+        self.assertEqual(set(rows[0]), {*resource_cache.ROW_FIELDS, 'created_by_username'})
+        self.assertEqual(rows[0]['created_by_username'], 'cacher')
+
+
+class ResourceSearchTests(TestCase):
+    """
+    Tests for the FTS5 resource search.
+    """
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='searcher', password='Password123')
+        self.kernel = Resource.objects.create(title="Kernel internship", description="Work on the <b>scheduler</b>.",
+                                              resource_type='PROGRAM', created_by=self.user)
+        self.other = Resource.objects.create(title="Web portal", description="Touches the kernel once.",
+                                             resource_type='PROJECT', created_by=self.user)
+
+    def test_title_match_ranks_first_and_is_highlighted(self):
+        results = search_resources("kernel")
+        self.assertEqual([r.pk for r in results], [self.kernel.pk, self.other.pk])
+        self.assertEqual(results[0].title_highlight, "<mark>Kernel</mark> internship")
+        self.assertEqual(results[0].creator_username, 'searcher')
+
+    def test_snippet_is_escaped(self):
+        result = search_resources("scheduler")[0]
+        self.assertIn("&lt;b&gt;<mark>scheduler</mark>&lt;/b&gt;", result.description_snippet)
+
+    def test_index_follows_updates_and_deletes(self):
+        Resource.objects.filter(pk=self.other.pk).update(description="Nothing relevant.")
+        self.assertEqual([r.pk for r in search_resources("kernel")], [self.kernel.pk])
+        self.kernel.delete()
+        self.assertEqual(search_resources("kernel"), [])
+
+    def test_query_syntax_is_neutralised(self):
+        self.assertEqual(build_match_query('kern OR "x" NEAR('), '"kern" "OR" "x" "NEAR"*')
+        self.assertEqual(build_match_query(' ?! '), '')
+        self.assertEqual([r.pk for r in search_resources("intern")], [self.kernel.pk])
+
+
+class TokenBucketTests(TestCase):
+    """
+    Tests for the rate limiter backends and the @rate_limit decorator.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.backends = [MemoryBackend(), SQLiteBackend(path=Path(self.tmpdir.name) / 'rl.sqlite3')]
+
+    def test_bucket_drains_and_refills(self):
+        for backend in self.backends:
+            with self.subTest(backend=type(backend).__name__):
+                results = [backend.hit('k', 3, 60, now=1000).allowed for _ in range(4)]
+                self.assertEqual(results, [True, True, True, False])
+                # One token comes back every 20 seconds; a denied hit does not delay it.
+                denied = backend.hit('k', 3, 60, now=1010)
+                self.assertFalse(denied.allowed)
+                self.assertEqual(denied.retry_after, 10)
+                self.assertTrue(backend.hit('k', 3, 60, now=1020).allowed)
+                self.assertFalse(backend.hit('k', 3, 60, now=1020).allowed)
+
+    def test_sqlite_backend_is_atomic_across_connections(self):
+        """Every thread gets its own connection; exactly `limit` hits may pass."""
+        backend = self.backends[1]
+        allowed = []
+
+        def worker():
+            for _ in range(25):
+                allowed.append(backend.hit('shared', 40, 3600).allowed)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(allowed.count(True), 40)
+
+    @override_settings(RATE_LIMIT_BACKEND='portal.ratelimit.MemoryBackend', RATE_LIMITS={'dashboard_view': {'limit': 2, 'period': 60}})
+    def test_dashboard_returns_429_with_retry_after(self):
+        user = CustomUser.objects.create_user(username='limited', password='Password123')
+        self.client.force_login(user)
+        statuses = [self.client.get(reverse('dashboard')).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response['Retry-After'], '30')
+
+
+class LockoutStoreTests(TestCase):
+    """
+    Tests for the shared failed-login counter store.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.store = LockoutStore(Path(self.tmpdir.name) / 'lockout.sqlite3')
+
+    def test_attempts_lock_then_expire(self):
+        results = [self.store.attempt('u', 3, 300, now=1000) for _ in range(4)]
+        self.assertEqual([r.admitted for r in results], [True, True, True, False])
+        self.assertEqual(results[2].count, 3)
+        # The refused attempt does not extend the lockout.
+        self.assertEqual(self.store.attempt('u', 3, 300, now=1100).ttl, 200)
+        self.assertEqual(self.store.status('u', now=1100), (3, 200))
+        # After expiry the counter starts over.
+        self.assertEqual(self.store.status('u', now=1300), (0, 0))
+        fresh = self.store.attempt('u', 3, 300, now=1300)
+        self.assertTrue(fresh.admitted)
+        self.assertEqual(fresh.count, 1)
+
+    def test_purge_removes_only_expired(self):
+        self.store.attempt('old', 3, 60, now=1000)
+        self.store.attempt('new', 3, 600, now=1000)
+        self.assertEqual(self.store.purge(now=1100), 1)
+        self.assertEqual(self.store.status('new', now=1100)[0], 1)
+
+
+class ParallelLoginLockoutTests(TransactionTestCase):
+    """
+    Fires parallel bad logins for one username; every request runs on its own
+    thread with its own DB and lockout-store connections, like separate workers.
+    """
+    PARALLEL_REQUESTS = 20
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        CustomUser.objects.create_user(username='victim', password='Correct-Horse-9')
+
+    def test_lockout_triggers_at_exactly_max_attempts(self):
+        with self.settings(LOGIN_LOCKOUT_DB=Path(self.tmpdir.name) / 'lockout.sqlite3'):
+            barrier = threading.Barrier(self.PARALLEL_REQUESTS)
+            statuses = []
+
+            def bad_login():
+                client = Client()
+                barrier.wait()
+                statuses.append(client.post(reverse('login'), {'username': 'victim', 'password': 'wrong'}).status_code)
+
+            with self.assertLogs('portal', 'WARNING') as logs:
+                threads = [threading.Thread(target=bad_login) for _ in range(self.PARALLEL_REQUESTS)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+            checked = [line for line in logs.output if 'Failed login attempt' in line]
+            refused = [line for line in logs.output if 'Access denied for user' in line]
+            self.assertEqual(len(statuses), self.PARALLEL_REQUESTS)
+            self.assertEqual(len(checked), MAX_LOGIN_ATTEMPTS)
+            self.assertEqual(len(refused), self.PARALLEL_REQUESTS - MAX_LOGIN_ATTEMPTS)
+
+            # Even the correct password is refused while locked out.
+            response = self.client.post(reverse('login'), {'username': 'victim', 'password': 'Correct-Horse-9'})
+            self.assertTrue(response.context['is_locked_out'])
+
+
+class SQLiteCacheTests(TestCase):
+    """
+    Tests for the single-file SQLite cache backend.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.location = Path(self.tmpdir.name) / 'cache.sqlite3'
+        self.cache = SQLiteCache(self.location, {'TIMEOUT': 60, 'OPTIONS': {'MAX_ENTRIES': 30, 'CULL_EVERY': 10}})
+
+    def test_basic_operations_and_expiry(self):
+        self.cache.set('obj', {'a': [1, 2]})
+        self.cache.set('flag', True)
+        self.cache.set('gone', 1, timeout=0)
+        self.assertEqual(self.cache.get('obj'), {'a': [1, 2]})
+        self.assertIs(self.cache.get('flag'), True)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertFalse(self.cache.add('obj', 'other'))
+        self.assertTrue(self.cache.add('gone', 'back'))
+        self.assertEqual(self.cache.get_many(['obj', 'gone', 'missing']), {'obj': {'a': [1, 2]}, 'gone': 'back'})
+
+    def test_ttl(self):
+        self.cache.set('k', 1, timeout=30)
+        self.cache.set('forever', 1, timeout=None)
+        self.assertEqual(self.cache.ttl('k'), 30)
+        self.assertIsNone(self.cache.ttl('forever'))
+        self.assertEqual(self.cache.ttl('missing'), 0)
+
+    def test_incr_is_atomic_across_connections(self):
+        self.cache.set('hits', 0)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+        def worker():
+            other = SQLiteCache(self.location, {})
+            for _ in range(50):
+                other.incr('hits')
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('hits'), 400)
+        self.assertEqual(self.cache.decr('hits', 100), 300)
+
+    def test_cull_keeps_table_bounded(self):
+        self.cache.set_many({f"k{i}": i for i in range(100)})
+        (count,) = self.cache.db.execute('SELECT COUNT(*) FROM cache_entry').fetchone()
+        self.assertLessEqual(count, 100 - 100 // 3)
+        self.cache.cull()
+        (count,) = self.cache.db.execute('SELECT COUNT(*) FROM cache_entry').fetchone()
+        self.assertLess(count, 100 - 100 // 3)
+
+    async def test_async_api_waits_for_a_lock_off_the_event_loop(self):
+        await self.cache.aset('k', 1)
+        locker = sqlite3.connect(self.location, isolation_level=None)
+        try:
+            locker.execute('BEGIN IMMEDIATE')
+            pending = asyncio.ensure_future(self.cache.aset('k', 2))
+            await asyncio.sleep(0.2) # Only runs if aset() left the loop free
+            self.assertFalse(pending.done())
+            locker.execute('COMMIT')
+            await pending
+        finally:
+            locker.close()
+        self.assertEqual(await self.cache.aget_many(['k', 'missing']), {'k': 2})
+        self.assertEqual(await self.cache.aincr('k', 3), 5)
+
+
+class ASYNC_URLCONF:
+    """The URLconf portal/urls.py builds when settings.PORTAL_ASYNC_VIEWS is on."""
+    urlpatterns = [
+        path('login/', async_views.login_view, name='login'),
+        path('dashboard/', async_views.dashboard_view, name='dashboard'),
+        path('resources/', async_views.resources_view, name='resources'),
+        *[pattern for pattern in urls.urlpatterns if pattern.name not in ('login', 'dashboard', 'resources')],
+    ]
+
+
+@override_settings(ROOT_URLCONF=ASYNC_URLCONF, CACHES=LOCMEM_CACHES, RATE_LIMIT_BACKEND='portal.ratelimit.MemoryBackend')
+class AsyncViewTests(TestCase):
+    """
+    Tests for the ASGI views in async_views.py, driven through AsyncClient.
+    """
+    def setUp(self):
+        cache.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.user = CustomUser.objects.create_user(username='async', password='Correct-Horse-9')
+
+    async def test_login_success_and_failure(self):
+        with self.settings(LOGIN_LOCKOUT_DB=Path(self.tmpdir.name) / 'lockout.sqlite3'):
+            response = await self.async_client.post('/login/', {'username': 'async', 'password': 'wrong'})
+            self.assertContains(response, f"You have {MAX_LOGIN_ATTEMPTS - 1} attempts remaining.")
+            # The form was validated, as in views.login_view
+            self.assertIn('Please enter a correct username and password.', response.context['form'].non_field_errors()[0])
+            response = await self.async_client.post('/login/', {'username': 'async', 'password': 'Correct-Horse-9'})
+            self.assertRedirects(response, '/dashboard/', fetch_redirect_response=False)
+
+    async def test_lockout_store_writes_leave_the_event_loop(self):
+        threads = []
+        attempt, reset = LockoutStore.attempt, LockoutStore.reset
+
+        def record(method):
+            def recorded(*args, **kwargs):
+                threads.append(threading.get_ident())
+                return method(*args, **kwargs)
+            return recorded
+
+        with self.settings(LOGIN_LOCKOUT_DB=Path(self.tmpdir.name) / 'lockout.sqlite3'), \
+                mock.patch.object(LockoutStore, 'attempt', record(attempt)), mock.patch.object(LockoutStore, 'reset', record(reset)):
+            response = await self.async_client.post('/login/', {'username': 'async', 'password': 'Correct-Horse-9'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    async def test_resources_list_and_add(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post('/resources/', {
+            'title': 'Async project', 'description': 'd', 'url': 'https://example.com', 'resource_type': 'PROJECT',
+        })
+        self.assertEqual(response.status_code, 302)
+        response = await self.async_client.get('/resources/')
+        self.assertContains(response, 'Async project')
+        self.assertContains(response, 'User: async')
+
+    async def test_queries_of_async_views_are_measured(self):
+        # The ORM calls run in sync_to_async threads, not on the event loop's connections
+        await self.async_client.aforce_login(self.user)
+        metrics.registry.reset()
+        with self.settings(METRICS_DB=None):
+            await self.async_client.get('/dashboard/')
+        queries = metrics.registry.snapshot()['histograms']['portal_db_queries']['dashboard']
+        self.assertGreater(queries[-1], 0) # Sum of the observed query counts
+        durations = metrics.registry.snapshot()['histograms']['portal_db_duration_seconds']['dashboard']
+        self.assertGreater(durations[-1], 0)
+
+    async def test_metrics_flush_leaves_the_event_loop(self):
+        threads = []
+        save = metrics.MetricsStore.save
+
+        def recorded(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return save(*args, **kwargs)
+
+        await self.async_client.aforce_login(self.user)
+        with self.settings(METRICS_DB=Path(self.tmpdir.name) / 'metrics.sqlite3', METRICS_FLUSH_INTERVAL=0), \
+                mock.patch.object(metrics.MetricsStore, 'save', recorded):
+            await self.async_client.get('/dashboard/')
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    @override_settings(RATE_LIMITS={'dashboard_view': {'limit': 1, 'period': 60}})
+    async def test_dashboard_rate_limit(self):
+        threads = []
+        hit = MemoryBackend.hit
+
+        def recorded(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return hit(*args, **kwargs)
+
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.object(MemoryBackend, 'hit', recorded):
+            first = await self.async_client.get('/dashboard/')
+            second = await self.async_client.get('/dashboard/')
+        self.assertEqual((first.status_code, second.status_code), (200, 429))
+        self.assertIn('Retry-After', second)
+        # The backend check left the event loop (SQLiteBackend writes a file)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+class BenchmarkTests(TransactionTestCase):
+    """
+    Tests for the load driver behind `manage.py benchmark`.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def test_in_process_run_logs_in_and_counts_queries(self):
+        with benchmark.isolated_runtime_state(self.tmpdir.name):
+            accounts = benchmark.seed(resources=10, users=2)
+            results = benchmark.run(benchmark.InProcessSession, ['login_page', 'dashboard', 'resources', 'search'],
+                                    requests=4, concurrency=2, accounts=accounts)
+
+        self.assertEqual(list(results), ['login_page', 'dashboard', 'resources', 'search'])
+        for result in results.values():
+            self.assertEqual((result['requests'], result['errors']), (4, 0))
+            self.assertLessEqual(result['p50'], result['p99'])
+        self.assertEqual(results['login_page']['queries'], 0)
+        self.assertGreater(results['dashboard']['queries'], 0)
+
+    def test_compare_flags_regressions_only(self):
+        base = {'requests': 10, 'errors': 0, 'rps': 100.0, 'p50': 5.0, 'p95': 10.0, 'p99': 12.0, 'queries': 2}
+        baseline = {'meta': {}, 'endpoints': {'dashboard': base}}
+        self.assertEqual(benchmark.compare({'dashboard': dict(base, p95=12.0, rps=80.0)}, baseline, 0.25), [])
+        regressions = benchmark.compare({'dashboard': dict(base, p95=20.0, rps=50.0, queries=3)}, baseline, 0.25)
+        self.assertEqual(len(regressions), 3)
+        # Endpoints without a baseline entry are not compared
+        self.assertEqual(benchmark.compare({'search': dict(base, p95=99.0)}, baseline, 0.25), [])
+
+
+# Cheap Argon2 costs so the hashing tests stay fast
+FAST_ARGON2 = {'time_cost': 1, 'memory_cost': 8192, 'parallelism': 1}
+
+
+@override_settings(PASSWORD_ARGON2_PARAMS=FAST_ARGON2)
+class CalibratedHasherTests(TestCase):
+    """
+    Tests for the settings-driven Argon2 hasher and the hashing process pool.
+    """
+    def _cost(self, encoded):
+        decoded = CalibratedArgon2PasswordHasher().decode(encoded)
+        return decoded['time_cost'], decoded['memory_cost'], decoded['parallelism']
+
+    def test_hash_uses_configured_cost(self):
+        self.assertEqual(self._cost(make_password('Correct-Horse-9')), (1, 8192, 1))
+
+    def test_stored_hash_is_upgraded_on_next_login(self):
+        user = CustomUser.objects.create_user(username='old', password='Correct-Horse-9')
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        with self.settings(PASSWORD_ARGON2_PARAMS=dict(FAST_ARGON2, time_cost=2),
+                           LOGIN_LOCKOUT_DB=Path(tmpdir.name) / 'lockout.sqlite3'):
+            response = self.client.post(reverse('login'), {'username': 'old', 'password': 'Correct-Horse-9'})
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        user.refresh_from_db()
+        self.assertEqual(self._cost(user.password), (2, 8192, 1))
+
+    def test_hash_verifies(self):
+        self.assertIsNone(get_pool()) # Off by default
+        encoded = make_password('Correct-Horse-9')
+        self.assertTrue(check_password('Correct-Horse-9', encoded))
+        self.assertFalse(check_password('wrong', encoded))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_hashing_runs_in_one_shared_pool(self):
+        self.addCleanup(shutdown_pool)
+        pools = []
+        threads = [threading.Thread(target=lambda: pools.append(get_pool())) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(map(id, pools))), 1)
+        self.assertEqual(pools[0]._max_workers, 1)
+        encoded = make_password('Correct-Horse-9')
+        self.assertTrue(check_password('Correct-Horse-9', encoded))
+        self.assertFalse(check_password('wrong', encoded))
+        self.assertEqual(self._cost(encoded), (1, 8192, 1))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMIT_BACKEND='portal.ratelimit.MemoryBackend')
+class MetricsTests(TestCase):
+    """
+    Tests for MetricsMiddleware and the /metrics/ endpoint.
+    """
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        settings_override = self.settings(METRICS_DB=Path(self.tmpdir.name) / 'metrics.sqlite3')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = CustomUser.objects.create_user(username='metrics', password='Correct-Horse-9')
+        self.client.force_login(self.user)
+
+    def test_requests_are_recorded_per_url_name(self):
+        self.client.get(reverse('resources'))
+        self.client.get(reverse('resources'))
+        self.client.get('/no-such-page/')
+        body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('portal_request_duration_seconds_count{view="resources"} 2', body)
+        self.assertIn('portal_request_duration_seconds_bucket{view="resources",le="+Inf"} 2', body)
+        self.assertIn('portal_responses_total{view="resources",status="200"} 2', body)
+        self.assertIn('portal_responses_total{view="unresolved",status="404"} 1', body)
+        self.assertIn('portal_db_queries_count{view="resources"} 2', body)
+        self.assertIn('portal_response_size_bytes_count{view="resources"} 2', body)
+        # First render misses both lists, the second is served from the fragment cache
+        self.assertIn('portal_cache_requests_total{view="resources",layer="html",result="miss"} 2', body)
+        self.assertIn('portal_cache_requests_total{view="resources",layer="html",result="hit"} 2', body)
+
+    def test_totals_of_all_workers_are_added_up(self):
+        self.client.get(reverse('dashboard'))
+        other = metrics.Registry()
+        other.observe_request('dashboard', 200, 0.2, 4, 0.01, 100, {})
+        metrics.get_store().save(other.worker, other.snapshot())
+
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('portal_request_duration_seconds_count{view="dashboard"} 2', body)
+        self.assertIn('portal_responses_total{view="dashboard",status="200"} 2', body)
+
+    def test_only_allowed_addresses_can_scrape(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.8').status_code, 403)
+
+
+class TestRunnerTests(SimpleTestCase):
+    """
+    The test run writes its runtime files outside the working tree (portal/test_runner.py).
+    """
+    def test_runtime_files_are_in_a_temporary_directory(self):
+        runtime = Path(os.environ['PORTAL_RUNTIME_DIR'])
+        self.assertNotEqual(runtime, settings.BASE_DIR)
+        paths = [settings.CACHES['default']['LOCATION'], settings.RATE_LIMIT_OPTIONS['path'],
+                 settings.LOGIN_LOCKOUT_DB, settings.METRICS_DB]
+        paths += [handler.baseFilename for handler in logging.getLogger('portal').handlers if hasattr(handler, 'baseFilename')]
+        self.assertEqual(len(paths), 5)
+        self.assertEqual({Path(path).parent for path in paths}, {runtime})
+
+
+class JSONLoggingTests(TestCase):
+    """
+    Tests for the queued JSON-lines log handler and the request log context.
+    """
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.path = Path(self.tmpdir.name) / 'portal.log'
+        self.logger = logging.getLogger('portal.tests.jsonlog')
+        self.logger.propagate = False
+        self.addCleanup(setattr, self.logger, 'propagate', True)
+
+    def _handler(self, **kwargs):
+        handler = QueuedRotatingFileHandler(self.path, **kwargs)
+        handler.setFormatter(JSONFormatter())
+        self.logger.addHandler(handler)
+        self.addCleanup(handler.close)
+        self.addCleanup(self.logger.removeHandler, handler)
+        return handler
+
+    def _lines(self, path=None):
+        return [json.loads(line) for line in (path or self.path).read_text().splitlines()]
+
+    def test_records_carry_request_fields(self):
+        handler = self._handler()
+        user = CustomUser.objects.create_user(username='logged', password='Correct-Horse-9')
+
+        def view(request):
+            self.logger.warning(f"Failed login attempt for user: {request.user.username}.")
+            return HttpResponse()
+
+        request = RequestFactory().get('/dashboard/', HTTP_X_REQUEST_ID='abc-123')
+        request.resolver_match = resolve('/dashboard/')
+        request.user = user
+        response = RequestLogContextMiddleware(view)(request)
+        self.logger.info("outside any request")
+        handler.flush()
+
+        inside, outside = self._lines()
+        self.assertEqual(response['X-Request-ID'], 'abc-123')
+        self.assertEqual((inside['level'], inside['message']), ('WARNING', 'Failed login attempt for user: logged.'))
+        self.assertEqual((inside['request_id'], inside['user_id'], inside['view']), ('abc-123', user.pk, 'dashboard'))
+        self.assertGreaterEqual(inside['latency_ms'], 0)
+        self.assertNotIn('request_id', outside)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        handler = self._handler(queue_size=2)
+        handler._writer = threading.current_thread() # Stand-in writer that never drains
+        self.addCleanup(setattr, handler, '_writer', None)
+        for i in range(5):
+            self.logger.info(f"record {i}")
+        self.assertEqual(handler.dropped, 3)
+
+    def test_batches_roll_the_file_over(self):
+        handler = self._handler(maxBytes=2000, backupCount=2)
+        for i in range(100):
+            self.logger.info(f"record {i}")
+        handler.flush()
+        rotated = Path(f"{self.path}.1")
+        self.assertTrue(rotated.exists())
+        self.assertLessEqual(self.path.stat().st_size, 2000)
+        self.assertEqual(self._lines()[-1]['message'], 'record 99')
+
+    def test_later_handlers_get_the_record_untouched(self):
+        handler = self._handler()
+        seen = []
+        later = logging.Handler()
+        later.emit = seen.append
+        self.logger.addHandler(later)
+        self.addCleanup(self.logger.removeHandler, later)
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            self.logger.exception("failed with %s", 'args')
+        handler.flush()
+
+        (record,) = seen
+        self.assertIs(record.exc_info[0], ValueError)
+        self.assertEqual((record.msg, record.args), ("failed with %s", ('args',)))
+        (line,) = self._lines()
+        self.assertEqual(line['message'], 'failed with args')
+        self.assertIn('ValueError: boom', line['exc'])
+
+    def test_one_fork_hook_restarts_every_handler(self):
+        with mock.patch('os.register_at_fork') as register:
+            first, second = self._handler(), self._handler()
+        register.assert_not_called()
+        queues = (first.queue, second.queue)
+
+        jsonlog._restart_queues() # What the child runs after os.fork()
+        self.assertIsNot(first.queue, queues[0])
+        self.assertIsNot(second.queue, queues[1])
+        self.logger.info("after the fork")
+        first.flush()
+        second.flush()
+        self.assertEqual([line['message'] for line in self._lines()], ['after the fork', 'after the fork'])
+
+
+class LogAnalyticsTests(TestCase):
+    """
+    Tests for the streaming log scan behind `manage.py analyze_logs`.
+    """
+    TEXT = (
+        "WARNING 2025-12-14 16:05:01,100 views 1 2 Failed login attempt for user: eve.\n"
+        "WARNING 2025-12-14 16:05:02,100 views 1 2 Failed login attempt for username: eve\n"
+        "Traceback (most recent call last):\n"
+        "WARNING 2025-12-14 16:06:00,100 views 1 2 Access denied for user eve: Locked out for 300 seconds.\n"
+    )
+    JSON = (
+        '{"ts": "2025-12-14T10:41:00.000Z", "level": "WARNING", "message": "Failed login attempt for user: eve."}\n'
+        '{"ts": "2025-12-14T10:42:00.000Z", "level": "WARNING", "message": "Rate limit exceeded for user: bob on view: dashboard_view"}\n'
+    )
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.log = Path(self.tmpdir.name) / 'portal.log'
+        self.state = Path(self.tmpdir.name) / 'state.json'
+
+    def test_text_json_and_gzipped_copies_are_aggregated(self):
+        with gzip.open(f"{self.log}.2.gz", 'wt') as f:
+            f.write(self.TEXT)
+        self.log.write_text(self.JSON)
+        report = scan([self.log], window=300)
+
+        # 16:05 IST and 10:41 UTC (16:11 IST) fall into two different 5-minute windows
+        self.assertEqual(sorted(report.failed.values()), [1, 2])
+        self.assertEqual(report.lockouts['eve'], 1)
+        self.assertEqual(report.rate_limited_users['dashboard_view', 'bob'], 1)
+        self.assertEqual(report.lines, 6)
+
+    def test_resume_reads_only_new_complete_lines_across_rotation(self):
+        self.log.write_text(self.TEXT)
+        self.assertEqual(scan([self.log], state_path=self.state).lines, 4)
+
+        with open(self.log, 'a') as f:
+            f.write(self.JSON + 'WARNING 2025-12-14 16:07:00,100 views 1 2 Failed log') # Last line still being written
+        report = scan([self.log], state_path=self.state)
+        self.assertEqual((report.lines, report.rate_limits['dashboard_view']), (2, 1))
+
+        # Rotation: the file moves to .1 (and gets its line completed first), a new file starts
+        with open(self.log, 'a') as f:
+            f.write('in attempt for user: eve.\n')
+        self.log.rename(f"{self.log}.1")
+        self.log.write_text(self.JSON)
+        report = scan([self.log], state_path=self.state)
+        self.assertEqual((report.lines, report.failed_total), (3, 2))
+        # Both windows were left open by the earlier runs and count on
+        self.assertEqual(sorted(report.failed.values()), [2, 3])
+        self.assertEqual(scan([self.log], state_path=self.state).lines, 0)
+
+    def test_open_windows_carry_over_between_runs(self):
+        # A run every minute sees a fifth of each 5-minute window at a time
+        start = datetime(2025, 12, 14, 10, 0, tzinfo=dt_timezone.utc)
+        for minute in range(5):
+            ts = (start + timedelta(minutes=minute)).isoformat().replace('+00:00', 'Z')
+            with open(self.log, 'a') as f:
+                for user in ['eve'] + [f"once{minute}-{i}" for i in range(10)]:
+                    f.write(json.dumps({'ts': ts, 'level': 'WARNING', 'message': f"Failed login attempt for user: {user}."}) + '\n')
+            report = scan([self.log], state_path=self.state, top=3)
+            self.assertEqual(report.failed.most_common(1), [(('eve', int(start.timestamp())), minute + 1)])
+        # --min-failures 5 fires within the window, not never
+        summary = report.as_dict(min_failures=5)
+        self.assertEqual([(row['user'], row['count']) for row in summary['failed_logins']], [('eve', 5)])
+        # The state keeps the open windows' top counts only
+        open_windows = json.loads(self.state.read_text())['windows']['300']
+        self.assertEqual([len(users) for users in open_windows.values()], [3])
+        # Nothing new: the window is not reported again
+        self.assertEqual(scan([self.log], state_path=self.state, top=3).as_dict()['failed_logins'], [])
+
+    def test_failed_logins_stay_bounded_over_a_long_stuffing_run(self):
+        start = datetime(2025, 12, 14, 10, 0, tzinfo=dt_timezone.utc)
+        with open(self.log, 'w') as f:
+            for minute in range(100):
+                ts = (start + timedelta(minutes=minute)).isoformat().replace('+00:00', 'Z')
+                for user in [f"victim{minute}-{i}" for i in range(50)] + ['admin'] * (minute % 7):
+                    f.write(json.dumps({'ts': ts, 'level': 'WARNING', 'message': f"Failed login attempt for user: {user}."}) + '\n')
+                    for message in (f"Access denied for user {user}: Locked out for 300 seconds.",
+                                    f"Rate limit exceeded for address: {user} on view: register_check_view"):
+                        f.write(json.dumps({'ts': ts, 'level': 'WARNING', 'message': message}) + '\n')
+        report = Report(window=60, top=3)
+        for line in open(self.log):
+            report.add(*parse_line(line))
+            self.assertLessEqual(len(report._open), 2)
+            for table in (report.failed, report.lockouts, report.rate_limited_users):
+                self.assertLessEqual(len(table), 6)
+        summary = report.as_dict()
+        self.assertEqual([row['count'] for row in summary['failed_logins']], [6, 6, 6])
+        self.assertEqual({row['user'] for row in summary['failed_logins']}, {'admin'})
+        self.assertEqual(summary['failed_logins_total'], 100 * 50 + sum(minute % 7 for minute in range(100)))
+        self.assertEqual(summary['lockouts'][0]['user'], 'admin')
+        self.assertEqual(summary['rate_limited_users'][0]['user'], 'admin')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResourceImportTests(TestCase):
+    """
+    Tests for the batched resource import (`manage.py import_resources`).
+    """
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='importer', password='Password123')
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def write(self, name, text):
+        path = Path(self.tmpdir.name) / name
+        path.write_text(text, encoding='utf-8')
+        return path
+
+    def test_csv_rows_are_validated_like_the_form(self):
+        path = self.write('resources.csv', (
+            '\ufefftitle,description,url,resource_type\n'
+            'Summer Program,"Two lines,\nwith a comma",https://example.com,PROGRAM\n'
+            'Bad Type,d,,COURSE\n'
+            ',no title,,PROJECT\n'
+            'Too,many,columns,PROJECT,x\n'
+            'Open Source,d,,PROJECT\n'
+        ))
+        stdout, stderr = StringIO(), StringIO()
+        generation = resource_cache.get_generation()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_resources', str(path), owner='importer', batch_size=1, stdout=stdout, stderr=stderr)
+
+        self.assertIn("5 rows: 2 imported, 3 rejected", stdout.getvalue())
+        errors = stderr.getvalue()
+        self.assertIn("row 2: resource_type:", errors)
+        self.assertIn("row 3: title:", errors)
+        self.assertIn("row 4: expected 4 columns, got 5", errors)
+        program = Resource.objects.get(title='Summer Program')
+        self.assertEqual((program.description, program.created_by), ("Two lines,\nwith a comma", self.user))
+        self.assertEqual(Resource.objects.count(), 2)
+        self.assertNotEqual(resource_cache.get_generation(), generation)
+
+    def test_interrupted_import_resumes_after_last_committed_batch(self):
+        rows = [json.dumps({'title': f'Resource {i}', 'description': 'd', 'resource_type': 'PROJECT'}) for i in range(7)]
+        rows[4] = '{"title": "broken"'
+        path = self.write('resources.jsonl', '\n'.join(rows) + '\n')
+        state = Path(self.tmpdir.name) / 'state.json'
+
+        def crash(row, error):
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            import_resources(path, self.user, batch_size=2, state_path=state, on_error=crash)
+        # Rows 1-4 were committed in two batches; the crash on row 5 lost nothing else
+        self.assertEqual(Resource.objects.count(), 4)
+
+        errors = []
+        result = import_resources(path, self.user, batch_size=2, state_path=state, on_error=lambda *error: errors.append(error))
+        self.assertEqual([row for row, _ in errors], [5])
+        self.assertEqual((result.rows, result.imported, result.rejected), (7, 6, 1))
+        self.assertEqual(
+            sorted(Resource.objects.values_list('title', flat=True)),
+            ['Resource 0', 'Resource 1', 'Resource 2', 'Resource 3', 'Resource 5', 'Resource 6'],
+        )
+        # Finished: a rerun imports nothing
+        self.assertEqual(import_resources(path, self.user, state_path=state).imported, 6)
+        self.assertEqual(Resource.objects.count(), 6)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMIT_BACKEND='portal.ratelimit.MemoryBackend',
+                   RATE_LIMITS={'export_view': {'limit': 100, 'period': 60}})
+class ResourceExportTests(TestCase):
+    """
+    Tests for the streaming CSV / JSON lines export.
+    """
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='exporter', password='Password123')
+        self.client.force_login(self.user)
+        for i, (kind, day) in enumerate([('PROJECT', 1), ('PROGRAM', 2), ('PROJECT', 3)]):
+            resource = Resource.objects.create(title=f"R{i}", description="Multi\nline, \"quoted\" ✓",
+                                               url=None, resource_type=kind, created_by=self.user)
+            # auto_now_add ignores a value passed to create()
+            Resource.objects.filter(pk=resource.pk).update(created_at=timezone.make_aware(datetime(2025, 3, day, 12)))
+
+    def export(self, **params):
+        response = self.client.get(reverse('export'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_with_type_and_date_filters(self):
+        body = self.export(type='PROJECT', since='2025-03-01', until='2025-03-03T00:00:00')
+        rows = list(csv.reader(StringIO(body.decode('utf-8'))))
+        self.assertEqual(rows[0], ['id', 'title', 'description', 'url', 'resource_type', 'created_at', 'created_by'])
+        self.assertEqual([row[1] for row in rows[1:]], ['R0'])
+        self.assertEqual(rows[1][2:5], ['Multi\nline, "quoted" ✓', '', 'PROJECT'])
+        self.assertEqual(rows[1][6], 'exporter')
+
+    def test_gzipped_jsonl_contains_every_row(self):
+        body = self.export(format='jsonl', gzip='1')
+        entries = [json.loads(line) for line in gzip.decompress(body).decode('utf-8').splitlines()]
+        self.assertEqual([entry['title'] for entry in entries], ['R0', 'R1', 'R2'])
+        self.assertEqual(entries[1]['created_by'], 'exporter')
+        self.assertEqual(datetime.fromisoformat(entries[2]['created_at']), timezone.make_aware(datetime(2025, 3, 3, 12)))
+
+    async def test_asgi_export_streams_asynchronously(self):
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.object(export, 'PIECE_SIZE', 1):
+            response = await self.async_client.get(reverse('export'), {'format': 'jsonl'})
+            self.assertTrue(response.is_async)
+            chunks = response.streaming_content
+            first = await anext(chunks) # Sent before the other rows are read
+            self.assertEqual(json.loads(first)['title'], 'R0')
+            rest = [chunk async for chunk in chunks]
+        self.assertEqual([json.loads(chunk)['title'] for chunk in rest], ['R1', 'R2'])
+
+    def test_invalid_parameters_and_anonymous_access(self):
+        for params in ({'format': 'xml'}, {'type': 'COURSE'}, {'since': '2025-02-30'}, {'until': 'yesterday'}):
+            self.assertEqual(self.client.get(reverse('export'), params).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('export')).status_code, 302)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResourceApiTests(TestCase):
+    """
+    Tests for the conditional JSON API (ETag / Last-Modified from the cache generation).
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='apiuser', password='Password123')
+        self.client.force_login(self.user)
+        for i in range(3):
+            Resource.objects.create(title=f"R{i}", description="d", resource_type='PROJECT', created_by=self.user)
+
+    def test_list_pages_and_revalidates_without_loading_rows(self):
+        response = self.client.get(reverse('api_resources'), {'page_size': 2})
+        data = response.json()
+        self.assertEqual([item['title'] for item in data['results']], ['R2', 'R1'])
+        self.assertEqual(data['results'][0]['created_by'], 'apiuser')
+        self.assertEqual(self.client.get(reverse('api_resources'), {'cursor': data['next']}).json()['results'][0]['title'], 'R0')
+
+        etag = response['ETag']
+        self.assertIn('no-cache', response['Cache-Control'])
+        # The user only (the session is cached): no resource query, not even a cached one
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('api_resources'), {'page_size': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Resource.objects.create(title="New", description="d", resource_type='PROGRAM', created_by=self.user)
+        response = self.client.get(reverse('api_resources'), {'page_size': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['title'], 'New')
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_if_modified_since(self):
+        cache.set(resource_cache.MODIFIED_KEY, time.time() - 60, None)
+        response = self.client.get(reverse('api_resource', args=[Resource.objects.get(title='R1').pk]))
+        self.assertEqual(response.json()['title'], 'R1')
+        last_modified = response['Last-Modified']
+        response = self.client.get(reverse('api_resources'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        # Right after a write no Last-Modified is sent: a second write in the same second would share it
+        resource_cache.bump_generation()
+        response = self.client.get(reverse('api_resources'), HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_errors(self):
+        self.assertEqual(self.client.get(reverse('api_resource', args=[999999])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api_resources'), {'type': 'COURSE'}).status_code, 400)
+        self.assertEqual(self.client.post(reverse('api_resources')).status_code, 405)
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_resources')).status_code, 401)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMIT_BACKEND='portal.ratelimit.MemoryBackend', PASSWORD_ARGON2_PARAMS=FAST_ARGON2)
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on every query the portal views issue against a
+    large resource table and fails on full table scans and temporary B-tree sorts.
+    """
+    ROWS = 20000
+    # Ranking FTS matches by bm25 needs a sort; there is no index on a per-query score
+    ALLOWED = {'/search/': ('USE TEMP B-TREE FOR ORDER BY',)}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username='planner', password='Correct-Horse-9')
+        Resource.objects.bulk_create(
+            (Resource(title=f"Resource {i}", description=f"python {i}", resource_type='PROGRAM' if i % 3 else 'PROJECT',
+                      created_by=cls.user) for i in range(cls.ROWS)),
+            batch_size=2000,
+        )
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        lockout = self.settings(LOGIN_LOCKOUT_DB=Path(self.tmpdir.name) / 'lockout.sqlite3')
+        lockout.enable()
+        self.addCleanup(lockout.disable)
+        # Built (by a table scan) once per worker, not per request
+        availability.get_index().rebuild()
+        self.addCleanup(setattr, availability, '_index', None)
+
+    def requests(self):
+        deep = Resource.objects.filter(resource_type='PROJECT').order_by('-created_at', '-id')[500]
+        after, before = encode_cursor(deep), encode_cursor(deep, reverse=True)
+        yield 'get', '/login/', {}
+        yield 'post', '/login/', {'username': 'planner', 'password': 'Correct-Horse-9'}
+        yield 'get', '/dashboard/', {}
+        yield 'get', '/resources/', {}
+        yield 'get', '/resources/', {'projects_cursor': after, 'programs_cursor': before}
+        yield 'post', '/resources/', {'title': 'New', 'description': 'A new python resource for planning queries',
+                                      'url': 'https://example.com/new', 'resource_type': 'PROJECT'}
+        yield 'get', '/search/', {'q': 'python 123'}
+        yield 'get', '/api/resources/', {}
+        yield 'get', '/api/resources/', {'cursor': after}
+        yield 'get', '/api/resources/', {'type': 'PROJECT', 'cursor': before}
+        yield 'get', f'/api/resources/{deep.pk}/', {}
+        yield 'get', '/export/', {'type': 'PROGRAM', 'since': '2000-01-01'}
+        yield 'post', '/register/', {'username': 'newcomer', 'email': 'n@example.com',
+                                     'password1': 'Correct-Horse-9', 'password2': 'Correct-Horse-9'}
+        yield 'get', '/logout/', {}
+
+    def test_no_full_scans_or_temp_sorts(self):
+        failures = []
+        for method, url, data in self.requests():
+            cache.clear() # Every cached layer misses, so every query runs
+            with record_queries() as recorder:
+                response = getattr(self.client, method)(url, data)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            self.assertLess(response.status_code, 400, url)
+            for sql, plan in plan_problems(recorder.queries, self.ALLOWED.get(url, ())):
+                failures.append(f"{method.upper()} {url}\n  {sql}\n  plan: {plan}")
+        self.assertFalse(failures, '\n\n'.join(failures))
+
+    def test_cursor_pages_seek_into_the_index(self):
+        """Deep pages start at the cursor (a created_at range), not at the newest row."""
+        deep = Resource.objects.order_by('-created_at', '-id')[5000]
+        with record_queries() as recorder:
+            KeysetPaginator(Resource.objects.filter(resource_type='PROGRAM'), 20).fetch(encode_cursor(deep))
+            KeysetPaginator(Resource.objects.all(), 20).fetch(encode_cursor(deep, reverse=True))
+        plans = [step for sql, params in recorder.queries for step in explain(sql, params)]
+        self.assertIn('SEARCH portal_resource USING INDEX resource_type_created_idx (resource_type=? AND created_at<?)', plans)
+        self.assertIn('SEARCH portal_resource USING INDEX resource_created_idx (created_at>?)', plans)
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    """
+    Tests for the read/write routing of the production database profile.
+    """
+    # Run in a fresh interpreter: the profile is read when settings load
+    PROFILE_CHECK = """
+import sqlite3, tempfile
+from benchutils import setup_django, throwaway_database
+setup_django()
+from django.db import connections
+from portal.models import CustomUser
+with tempfile.TemporaryDirectory() as tmp, throwaway_database(tmp + '/db.sqlite3'):
+    CustomUser.objects.create(username='routed')
+    with connections['default'].cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode')
+        print(cursor.fetchone()[0], connections['default'].settings_dict['CONN_MAX_AGE'])
+    user = CustomUser.objects.get(username='routed')
+    print(user._state.db)
+    try:
+        with connections['replica'].cursor() as cursor:
+            cursor.execute("DELETE FROM portal_customuser")
+    except Exception as exc:
+        print(type(exc).__name__, exc)
+"""
+
+    # The first connection of the process is the replica, on a file not in WAL
+    NON_WAL_CHECK = """
+import sqlite3, tempfile
+from benchutils import setup_django, throwaway_database
+setup_django()
+from django.db import connections
+from portal.models import CustomUser
+with tempfile.TemporaryDirectory() as tmp, throwaway_database(tmp + '/db.sqlite3'):
+    CustomUser.objects.create(username='routed')
+    with connections['default'].cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=DELETE')
+    connections.close_all()
+    user = CustomUser.objects.get(username='routed')
+    print(user._state.db, sqlite3.connect(tmp + '/db.sqlite3').execute('PRAGMA journal_mode').fetchone()[0])
+"""
+
+    def run_with_profile(self, script):
+        scripts = Path(__file__).resolve().parent.parent / 'scripts'
+        env = dict(os.environ, PORTAL_DB_PROFILE='production', PYTHONPATH=str(scripts))
+        return subprocess.run([sys.executable, '-c', script], env=env, cwd=scripts,
+                              capture_output=True, text=True, timeout=120, check=True).stdout.split('\n')
+
+    def test_reads_go_to_the_replica_writes_to_default(self):
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_read(Resource), 'replica')
+        self.assertEqual(router.db_for_write(Resource), 'default')
+        self.assertTrue(router.allow_migrate('default', 'portal'))
+        self.assertFalse(router.allow_migrate('replica', 'portal'))
+
+    def test_production_profile(self):
+        output = self.run_with_profile(self.PROFILE_CHECK)
+        self.assertEqual(output[:3], ['wal 600', 'replica', 'OperationalError attempt to write a readonly database'])
+
+    def test_replica_opens_a_file_not_in_wal_yet(self):
+        self.assertEqual(self.run_with_profile(self.NON_WAL_CHECK)[0], 'replica wal')
+
+
+class ReadRoutingInTransactionTests(TestCase):
+    """
+    Reads inside a transaction on 'default' see its uncommitted writes.
+    """
+    def test_reads_stay_on_default_inside_a_transaction(self):
+        # TestCase wraps every test in a transaction on 'default'
+        self.assertEqual(ReadReplicaRouter().db_for_read(Resource), 'default')
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMIT_BACKEND='portal.ratelimit.MemoryBackend',
+                   PASSWORD_ARGON2_PARAMS=FAST_ARGON2)
+class SessionEngineTests(TestCase):
+    """
+    Tests for the cache-backed, write-avoiding session engine.
+    """
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user(username='sessions', password='Correct-Horse-9')
+
+    def session_statements(self, queries):
+        return [query['sql'].split()[0] for query in queries if 'django_session' in query['sql']]
+
+    def test_login_browse_logout(self):
+        with self.captureOnCommitCallbacks(execute=True), CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('login'), {'username': 'sessions', 'password': 'Correct-Horse-9'})
+        self.assertEqual(self.session_statements(queries), ['INSERT'])
+
+        for name in ('dashboard', 'resources'):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(reverse(name)).status_code, 200)
+            self.assertEqual(self.session_statements(queries), [])
+
+        key = self.client.session.session_key
+        self.client.get(reverse('logout'))
+        self.assertFalse(Session.objects.filter(session_key=key).exists())
+        self.assertIsNone(cache.get(session_backend.KEY_PREFIX + key))
+
+    def test_save_writes_only_changes_and_expiry_refreshes(self):
+        store = session_backend.SessionStore()
+        store['n'] = 1
+        store.create()
+        store = session_backend.SessionStore(store.session_key)
+        store['n'] = 1
+        with CaptureQueriesContext(connection) as queries:
+            store.save() # Unchanged, expiry within SESSION_EXPIRY_REFRESH
+            store['n'] = 2
+            store.save()
+            with self.settings(SESSION_EXPIRY_REFRESH=0):
+                store.save()
+        self.assertEqual(self.session_statements(queries), ['UPDATE', 'UPDATE'])
+
+        cache.clear() # A lost cache entry is read back from the table
+        self.assertEqual(session_backend.SessionStore(store.session_key)['n'], 2)
+
+    def test_clear_expired_in_batches(self):
+        expired = timezone.now() - timedelta(days=1)
+        Session.objects.bulk_create(Session(session_key=f"expired{i:03}", session_data='', expire_date=expired) for i in range(7))
+        store = session_backend.SessionStore()
+        store.create()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(session_backend.SessionStore.clear_expired(batch_size=3, pause=0), 7)
+        self.assertEqual(self.session_statements(queries).count('DELETE'), 3)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), [store.session_key])
+
+
+class StaticAssetTests(SimpleTestCase):
+    """
+    Tests for the hashed/precompressed static storage and the WSGI/ASGI serving layer.
+    """
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = tmp.name
+        with self.settings(STATIC_ROOT=self.root):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            self.hashed = static_assets.CompressedManifestStaticFilesStorage().stored_name('portal/style.css')
+        self.files = static_assets.StaticFiles(self.root, '/static/')
+
+    def wsgi(self, path, method='GET', **headers):
+        def fallback(environ, start_response):
+            start_response('404 Not Found', [])
+            return [b'django']
+
+        environ = {'PATH_INFO': path, 'REQUEST_METHOD': method, 'wsgi.file_wrapper': lambda f, size: ('sendfile', f)}
+        environ.update({'HTTP_' + name.upper(): value for name, value in headers.items()})
+        response = {}
+
+        def start_response(status, headers):
+            response.update(status=status, headers=dict(headers))
+        body = static_assets.StaticFilesWSGI(fallback, self.files)(environ, start_response)
+        if isinstance(body, tuple):
+            with body[1] as f:
+                body = [f.read()]
+        return response['status'], response['headers'], b''.join(body)
+
+    def test_collectstatic_writes_hashed_names_and_gzip(self):
+        self.assertRegex(self.hashed, r'^portal/style\.[0-9a-f]{12}\.css$')
+        with open(os.path.join(self.root, 'portal/style.css'), 'rb') as f:
+            original = f.read()
+        with open(os.path.join(self.root, self.hashed + '.gz'), 'rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), original)
+
+    def test_wsgi_negotiates_encoding_and_caches_hashed_names_forever(self):
+        with open(os.path.join(self.root, self.hashed + '.br'), 'wb') as f:
+            f.write(b'brotli')
+        self.files = static_assets.StaticFiles(self.root, '/static/')
+        url = '/static/' + self.hashed
+
+        status, headers, body = self.wsgi(url, ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual((status, headers['Content-Encoding'], body), ('200 OK', 'br', b'brotli'))
+        self.assertEqual(headers['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(headers['Content-Type'], 'text/css; charset=utf-8')
+        status, headers, body = self.wsgi(url, ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        status, identity, body = self.wsgi(url)
+        self.assertNotIn('Content-Encoding', identity)
+        with open(os.path.join(self.root, self.hashed), 'rb') as f:
+            self.assertEqual(body, f.read())
+
+        self.assertEqual(self.wsgi(url, ACCEPT_ENCODING='gzip', IF_NONE_MATCH=headers['ETag'])[0], '304 Not Modified')
+        self.assertEqual(self.wsgi(url, IF_NONE_MATCH=headers['ETag'])[0], '200 OK') # Another variant
+        self.assertEqual(self.wsgi(url, 'HEAD')[2], b'')
+        self.assertEqual(self.wsgi(url, 'POST')[0], '405 Method Not Allowed')
+        self.assertEqual(self.wsgi('/static/portal/style.css')[1]['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(self.wsgi('/static/../settings.py')[2], b'django')
+        self.assertEqual(self.wsgi('/dashboard/')[2], b'django')
+
+    def test_asgi_hands_the_file_to_the_server(self):
+        async def fallback(scope, receive, send):
+            raise AssertionError("static request reached the application")
+
+        async def call(extensions):
+            sent = []
+
+            async def send(message):
+                sent.append(message)
+            scope = {'type': 'http', 'method': 'GET', 'path': '/static/' + self.hashed,
+                     'headers': [(b'accept-encoding', b'gzip')], 'extensions': extensions}
+            await static_assets.StaticFilesASGI(fallback, self.files)(scope, None, send)
+            return sent
+
+        start, body = asyncio.run(call({'http.response.pathsend': {}}))
+        self.assertEqual(start['status'], 200)
+        self.assertIn((b'content-encoding', b'gzip'), start['headers'])
+        self.assertEqual(body, {'type': 'http.response.pathsend', 'path': os.path.join(self.root, self.hashed + '.gz')})
+
+        start, *chunks = asyncio.run(call({}))
+        with open(os.path.join(self.root, self.hashed + '.gz'), 'rb') as f:
+            self.assertEqual(b''.join(chunk['body'] for chunk in chunks), f.read())
+        self.assertFalse(chunks[-1]['more_body'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES, RATE_LIMIT_BACKEND='portal.ratelimit.MemoryBackend')
+class ResourceSummaryTests(TestCase):
+    """
+    Tests for the incrementally maintained dashboard summary (portal/summary.py).
+    """
+    def setUp(self):
+        cache.clear()
+        self.alice = CustomUser.objects.create_user(username='alice', password='Password123')
+        self.bob = CustomUser.objects.create_user(username='bob', password='Password123')
+
+    def add(self, user, title, resource_type='PROJECT'):
+        return Resource.objects.create(title=title, description='d', resource_type=resource_type, created_by=user)
+
+    def test_signals_keep_rows_equal_to_a_rebuild(self):
+        added = [self.add(self.alice, f"A{i}", 'PROJECT' if i % 3 else 'PROGRAM') for i in range(7)]
+        self.add(self.bob, "B0", 'PROGRAM')
+        added[6].delete() # Listed in alice's latest: the next older one moves up
+        moved = Resource.objects.get(pk=added[5].pk)
+        moved.resource_type, moved.title = 'PROGRAM', 'A5 renamed'
+        moved.save()
+        given = Resource.objects.get(pk=added[0].pk)
+        given.created_by = self.bob
+        given.save()
+
+        self.assertEqual(summary.rebuild(dry_run=True), [])
+        self.assertEqual(summary.check_user_counts(dry_run=True), [])
+        mine, site = summary.for_dashboard(self.alice)
+        self.alice.refresh_from_db()
+        self.assertEqual((self.alice.project_count, self.alice.program_count), (3, 2))
+        self.assertEqual([item['title'] for item in mine.latest], ['A5 renamed', 'A4', 'A3', 'A2', 'A1'])
+        self.assertEqual((site.projects, site.programs), (3, 4))
+
+        self.alice.delete() # Cascades to her resources and her row
+        self.assertEqual(summary.rebuild(dry_run=True), [])
+
+    def test_imports_are_counted(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'resources.csv'
+            path.write_text("title,description,url,resource_type\n" + "".join(f"T{i},d,,PROGRAM\n" for i in range(7)))
+            import_resources(path, self.bob, batch_size=3)
+        mine, site = summary.for_dashboard(self.bob)
+        self.bob.refresh_from_db()
+        self.assertEqual((self.bob.program_count, site.programs), (7, 7))
+        self.assertEqual(mine.latest[0]['title'], 'T6')
+        self.assertEqual(summary.rebuild(dry_run=True), [])
+
+    def test_dashboard_reads_stored_numbers(self):
+        self.add(self.alice, "Mine")
+        self.add(self.bob, "Theirs", 'PROGRAM')
+        self.client.force_login(self.alice)
+        self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, "Projects added: 1 | Programs added: 0")
+        self.assertContains(response, "Projects: 1 | Programs: 1")
+        self.assertContains(response, "Mine (Project)")
+        summary_queries = [query['sql'] for query in queries if 'portal_resourcesummary' in query['sql']]
+        self.assertEqual(len(summary_queries), 1)
+        self.assertFalse([query['sql'] for query in queries if 'portal_resource"' in query['sql']])
+
+    def test_rebuild_command_repairs_drift(self):
+        self.add(self.alice, "A")
+        ResourceSummary.objects.filter(user=self.alice).update(projects=5, latest=[])
+        ResourceSummary.objects.filter(user__isnull=True).delete()
+        out = StringIO()
+        call_command('rebuild_resource_summary', '--dry-run', stdout=out)
+        self.assertIn("2 drifted rows would be rewritten: site, user", out.getvalue())
+        call_command('rebuild_resource_summary', stdout=StringIO())
+        self.assertEqual(summary.rebuild(dry_run=True), [])
+        self.assertEqual(summary.for_dashboard(self.alice)[1].projects, 1)
+
+
+class UserResourceCountTests(TestCase):
+    """
+    Tests for the denormalized CustomUser.project_count/program_count.
+    """
+    def setUp(self):
+        self.users = [CustomUser.objects.create_user(username=f"counter{i}", password='Password123') for i in range(5)]
+
+    def counts(self, user):
+        user.refresh_from_db()
+        return user.project_count, user.program_count
+
+    def test_counts_move_with_resource_writes(self):
+        user = self.users[0]
+        with CaptureQueriesContext(connection) as queries:
+            resource = Resource.objects.create(title="P", description="d", resource_type='PROJECT', created_by=user)
+        # Counted in the INSERT's transaction (a savepoint inside TestCase's)
+        statements = [query['sql'] for query in queries]
+        self.assertTrue(statements[0].startswith('SAVEPOINT') and statements[-1].startswith('RELEASE SAVEPOINT'))
+        self.assertEqual(sum(1 for sql in statements if sql.startswith('UPDATE "portal_customuser"')), 1)
+        Resource.objects.create(title="Q", description="d", resource_type='PROGRAM', created_by=user)
+        self.assertEqual(self.counts(user), (1, 1))
+        resource.resource_type = 'PROGRAM'
+        resource.save()
+        self.assertEqual(self.counts(user), (0, 2))
+        resource.delete()
+        self.assertEqual(self.counts(user), (0, 1))
+
+    def test_full_save_of_a_stale_user_keeps_the_counters(self):
+        user = self.users[0]
+        stale = CustomUser.objects.get(pk=user.pk)
+        Resource.objects.create(title="P", description="d", resource_type='PROJECT', created_by=user)
+        stale.first_name = 'Renamed'
+        stale.save()
+        self.assertEqual(self.counts(user), (1, 0))
+        self.assertEqual(user.first_name, 'Renamed')
+
+    def test_check_command_repairs_drift_in_chunks(self):
+        for user in self.users:
+            Resource.objects.create(title="P", description="d", resource_type='PROJECT', created_by=user)
+        CustomUser.objects.filter(pk__in=[self.users[1].pk, self.users[4].pk]).update(project_count=9, program_count=3)
+        out = StringIO()
+        call_command('check_resource_counts', '--dry-run', stdout=out)
+        self.assertIn(f"2 users would be repaired: {self.users[1].pk}, {self.users[4].pk}", out.getvalue())
+        with CaptureQueriesContext(connection) as queries:
+            call_command('check_resource_counts', '--chunk-size', '2', '--pause', '0', stdout=StringIO())
+        self.assertEqual(sum(1 for query in queries if query['sql'].startswith('UPDATE')), 2) # Only the chunks with drift
+        self.assertEqual([self.counts(user) for user in self.users], [(1, 0)] * 5)
+        self.assertEqual(summary.check_user_counts(), [])
+
+
+class AdoptAuthUsersMigrationTests(SimpleTestCase):
+    """
+    Migrating a database from before AUTH_USER_MODEL = 'portal.CustomUser'
+    (the tracked db.sqlite3 is one) moves its auth_user accounts over.
+    """
+    LEGACY_MIGRATION = """
+import os, shutil, sqlite3, tempfile
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+import django
+django.setup()
+from django.core.management import call_command
+from django.db import connection
+with tempfile.TemporaryDirectory() as tmp:
+    path = shutil.copy('db.sqlite3', tmp)
+    legacy = sqlite3.connect(path)
+    legacy.executescript('''
+        DELETE FROM auth_user; DELETE FROM portal_customuser;
+        INSERT INTO auth_user VALUES (1, 'hash1', NULL, 1, 'admin', '', '', '', 1, 1, '2026-01-01 00:00:00');
+        INSERT INTO auth_user VALUES (2, 'hash2', NULL, 0, 'editor', '', '', '', 1, 1, '2026-01-01 00:00:00');
+        INSERT INTO portal_customuser VALUES (2, 'hash3', NULL, 0, 'newcomer', '', '', '', 0, 1, '2026-02-01 00:00:00');
+        INSERT INTO auth_group (id, name) VALUES (1, 'editors');
+        INSERT INTO auth_user_groups (user_id, group_id) VALUES (2, 1);
+        INSERT INTO django_admin_log (object_repr, action_flag, change_message, user_id, action_time)
+        VALUES ('a', 1, '', 1, '2026-01-01 00:00:00'), ('b', 2, '', 2, '2026-01-01 00:00:00');
+    ''')
+    legacy.commit()
+    legacy.close()
+    connection.settings_dict['NAME'] = path
+    call_command('migrate', verbosity=0)
+    with connection.cursor() as cursor:
+        for sql in ('SELECT id, username, password FROM portal_customuser ORDER BY id',
+                    'SELECT u.username FROM portal_customuser_groups g JOIN portal_customuser u ON u.id = g.customuser_id',
+                    'SELECT u.username FROM django_admin_log l JOIN portal_customuser u ON u.id = l.user_id ORDER BY l.id'):
+            cursor.execute(sql)
+            print(cursor.fetchall())
+        print(connection.introspection.get_relations(cursor, 'django_admin_log')['user_id'][1])
+        constraints = connection.introspection.get_constraints(cursor, 'django_admin_log').values()
+        print(sorted(info['columns'][0] for info in constraints if info['index'] and not info['primary_key']))
+    connection.close()
+"""
+
+    def test_auth_users_groups_and_admin_log_move_to_customuser(self):
+        env = {name: value for name, value in os.environ.items() if name != 'PORTAL_DB_PROFILE'}
+        output = subprocess.run([sys.executable, '-c', self.LEGACY_MIGRATION], env=env, cwd=Path(__file__).resolve().parent.parent,
+                                capture_output=True, text=True, timeout=120, check=True).stdout.split('\n')
+        self.assertEqual(output[:5], [
+            # admin keeps id 1; editor's id 2 was taken after the swap, so it gets a new one
+            "[(1, 'admin', 'hash1'), (2, 'newcomer', 'hash3'), (3, 'editor', 'hash2')]",
+            "[('editor',)]",
+            "[('admin',), ('editor',)]",
+            'portal_customuser',
+            # The rebuilt table keeps its indexes
+            "['content_type_id', 'user_id']",
+        ])
+
+
+class AvailabilityTests(TestCase):
+    """
+    Tests for the username/email availability filter (portal/availability.py).
+    """
+    def setUp(self):
+        availability._index = None # Built from this test's users
+        self.addCleanup(setattr, availability, '_index', None)
+        CustomUser.objects.create_user(username='Taken', email='taken@example.com', password='Password123')
+
+    def lookups(self, queries):
+        return [query['sql'] for query in queries if 'LIKE' in query['sql']]
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = availability.BloomFilter(5000, error_rate=0.01)
+        for i in range(5000):
+            bloom.add(f"user{i}")
+        self.assertTrue(all(f"user{i}" in bloom for i in range(5000)))
+        false_positives = sum(f"other{i}" in bloom for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.02)
+
+    def test_free_names_skip_the_table_scan(self):
+        index = availability.get_index()
+        self.assertTrue(index.username_taken('taken')) # Case-insensitive
+        self.assertTrue(index.email_taken('TAKEN@example.com'))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertFalse(index.username_taken('someone-new'))
+            self.assertFalse(index.email_taken('new@example.com'))
+        self.assertEqual(self.lookups(queries), [])
+        self.assertEqual(len(queries), 2) # The pk > last seen look for new users
+
+    def test_users_from_other_workers_are_picked_up(self):
+        index = availability.get_index()
+        self.assertFalse(index.username_taken('elsewhere'))
+        # bulk_create() sends no post_save, as a user saved by another worker
+        CustomUser.objects.bulk_create([CustomUser(username='elsewhere', email='e@example.com', password='!')])
+        self.assertTrue(index.username_taken('Elsewhere'))
+        self.assertTrue(index.email_taken('e@example.com'))
+
+    @override_settings(RATE_LIMIT_BACKEND='portal.ratelimit.MemoryBackend')
+    def test_check_endpoint(self):
+        # Emails are only checked when the whole form is submitted
+        response = self.client.get(reverse('register_check'), {'username': 'TAKEN', 'email': 'taken@example.com'})
+        self.assertEqual(response.json(), {'username': {'value': 'TAKEN', 'available': False}})
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertEqual(self.client.get(reverse('register_check')).json(), {})
+        self.assertEqual(self.client.post(reverse('register_check')).status_code, 405)
+
+    @override_settings(RATE_LIMIT_BACKEND='portal.ratelimit.MemoryBackend',
+                       RATE_LIMITS={'register_check_view': {'limit': 2, 'period': 60}})
+    def test_check_endpoint_is_rate_limited_per_address(self):
+        statuses = [self.client.get(reverse('register_check'), {'username': f"name{i}"}, REMOTE_ADDR='10.0.0.1').status_code
+                    for i in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        other = self.client.get(reverse('register_check'), {'username': 'name'}, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(other.status_code, 200)
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_registration_refuses_taken_names(self):
+        data = {'username': 'taken', 'email': 'taken@example.com', 'password1': 'Correct-Horse-9', 'password2': 'Correct-Horse-9'}
+        form = CustomUserCreationForm(data)
+        self.assertFalse(form.is_valid())
+        self.assertEqual(set(form.errors), {'username', 'email'})
+        response = self.client.post(reverse('register'), dict(data, username='newcomer', email='newcomer@example.com'))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertFalse(availability.get_index().might_be_taken(username='another'))
+        self.assertTrue(availability.get_index().username_taken('NEWCOMER'))
+
+    @override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+    def test_registration_sees_renames_the_filter_missed(self):
+        index = availability.get_index()
+        self.assertFalse(index.username_taken('renamed'))
+        # update() sends no post_save and keeps the pk, as a rename saved by another worker
+        CustomUser.objects.filter(username='Taken').update(username='Renamed', email='renamed@example.com')
+        self.assertFalse(index.might_be_taken(username='renamed')) # Stale until the next rebuild
+        form = CustomUserCreationForm({'username': 'RENAMED', 'email': 'Renamed@example.com',
+                                       'password1': 'Correct-Horse-9', 'password2': 'Correct-Horse-9'})
+        self.assertFalse(form.is_valid())
+        self.assertEqual(set(form.errors), {'username', 'email'})
+
+
+class DuplicateResourceTests(TestCase):
+    """
+    Tests for near-duplicate detection (normalized URLs, MinHash/LSH over descriptions).
+    """
+    DESCRIPTION = ("A twelve week introduction to programming in Python for first year students, "
+                   "with weekly exercises, a final project and mentoring sessions every Friday afternoon.")
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(username='poster', password='Password123')
+        self.original = Resource.objects.create(
+            title="Intro to Python", description=self.DESCRIPTION, url='https://example.com/python/',
+            resource_type='PROGRAM', created_by=self.user,
+        )
+
+    def post(self, **data):
+        self.client.force_login(self.user)
+        data = {'title': 'Python course', 'description': 'Something else entirely, in a few more words than that.',
+                'url': '', 'resource_type': 'PROGRAM', **data}
+        return self.client.post(reverse('resources'), data)
+
+    def test_normalize_url(self):
+        self.assertEqual(duplicates.normalize_url('http://www.Example.com:80//python/?utm_source=x&b=2&a=1&fbclid=z#top'),
+                         'example.com/python?a=1&b=2')
+        self.assertEqual(duplicates.normalize_url('https://example.com/python'), 'example.com/python')
+        self.assertNotEqual(duplicates.normalize_url('https://example.com/python/2'), 'example.com/python')
+        self.assertIsNone(duplicates.normalize_url(''))
+
+    def test_signatures_estimate_similarity(self):
+        edited = self.DESCRIPTION.replace('Friday', 'Thursday')
+        same = duplicates.similarity(duplicates.signature(self.DESCRIPTION), duplicates.signature(edited))
+        other = duplicates.similarity(duplicates.signature(self.DESCRIPTION),
+                                      duplicates.signature("Build a weather station with a Raspberry Pi, sensors and a small web dashboard."))
+        self.assertGreater(same, 0.7)
+        self.assertLess(other, 0.2)
+        self.assertIsNone(duplicates.signature("Too short"))
+        self.assertEqual(self.original.bands.count(), duplicates.BANDS)
+        self.assertEqual(self.original.normalized_url, 'example.com/python')
+
+    def test_migrations_do_not_import_application_code(self):
+        # The 0011 backfill carries a frozen copy of the fingerprints instead
+        for migration in (Path(__file__).resolve().parent / 'migrations').glob('0*.py'):
+            for node in ast.walk(ast.parse(migration.read_text())):
+                if isinstance(node, ast.ImportFrom):
+                    modules = ['.' * node.level + (node.module or '')]
+                elif isinstance(node, ast.Import):
+                    modules = [alias.name for alias in node.names]
+                else:
+                    continue
+                for module in modules:
+                    self.assertFalse(module.startswith(('.', 'portal')), f"{migration.name} imports {module}")
+
+    @override_settings(CACHES=LOCMEM_CACHES, RESOURCE_DUPLICATES='warn')
+    def test_warn_asks_for_confirmation(self):
+        response = self.post(url='http://www.example.com/python?utm_campaign=spring')
+        self.assertContains(response, "already listed: &#x27;Intro to Python&#x27;")
+        self.assertContains(response, 'type="checkbox" name="confirm_duplicate"')
+        self.assertEqual(Resource.objects.count(), 1)
+        self.post(url='http://www.example.com/python?utm_campaign=spring', confirm_duplicate='on')
+        copy = Resource.objects.latest('pk')
+        self.assertEqual(Resource.objects.count(), 2)
+        self.assertIsNone(copy.normalized_url) # The original keeps the URL
+        self.post(url='https://example.com/other', description=self.DESCRIPTION.replace('Friday', 'Monday'))
+        self.assertEqual(Resource.objects.count(), 2) # Near-identical description
+
+    def test_url_taken_by_a_concurrent_save_keeps_the_resource_as_a_duplicate(self):
+        claimable = duplicates._claimable
+        checks = []
+
+        def raced(*args):
+            # The first check ran before the other save committed the same URL
+            checks.append(args)
+            return len(checks) == 1 or claimable(*args)
+
+        copy = Resource(title="Copy", description="d", url='https://example.com/python?utm_source=a',
+                        resource_type='PROGRAM', created_by=self.user)
+        with mock.patch.object(duplicates, '_claimable', raced):
+            copy.save()
+        self.assertEqual(len(checks), 2)
+        copy.refresh_from_db()
+        self.assertIsNone(copy.normalized_url)
+        self.assertEqual(Resource.objects.get(normalized_url='example.com/python'), self.original)
+
+    @override_settings(CACHES=LOCMEM_CACHES, RESOURCE_DUPLICATES='reject')
+    def test_reject_refuses_even_confirmed(self):
+        self.post(url='https://example.com/python', confirm_duplicate='on')
+        self.assertEqual(Resource.objects.count(), 1)
+        self.assertRedirects(self.post(url='https://example.com/java'), reverse('resources'), fetch_redirect_response=False)
+
+    def test_lookup_is_three_index_seeks(self):
+        with record_queries() as recorder:
+            matches = duplicates.find('https://example.com/python?ref=mail', self.DESCRIPTION)
+        self.assertEqual([(match.resource.pk, match.reason) for match in matches], [(self.original.pk, 'url')])
+        self.assertEqual(len(recorder.queries), 3) # URL, buckets, candidates
+        self.assertEqual(plan_problems(recorder.queries), [])
+
+    def test_cluster_command_groups_existing_duplicates(self):
+        Resource.objects.bulk_create([
+            Resource(title="Copy", description=self.DESCRIPTION, url='http://example.com/python?utm_source=a',
+                     resource_type='PROGRAM', created_by=self.user),
+            Resource(title="Reworded", description=self.DESCRIPTION.replace('mentoring', 'tutoring'),
+                     url='https://example.com/learn-python', resource_type='PROGRAM', created_by=self.user),
+            Resource(title="Unrelated", description="Build a weather station with a Raspberry Pi and a web dashboard.",
+                     resource_type='PROJECT', created_by=self.user),
+        ])
+        out = StringIO()
+        call_command('find_duplicate_resources', '--reindex', '--pause', '0', stdout=out)
+        output = out.getvalue()
+        self.assertIn("Reindexed 4 resources.", output)
+        self.assertIn(f"#{self.original.pk} 'Intro to Python': #{self.original.pk + 1} 'Copy', #{self.original.pk + 2} 'Reworded'", output)
+        self.assertIn("1 groups of duplicates, 2 resources beyond the first", output)
+        self.assertNotIn("Unrelated", output)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """The sites behind resource URLs, for LinkCheckTests."""
+    protocol_version = 'HTTP/1.1'
+
+    def respond(self, status, headers=()):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.command, self.path, dict(self.headers)))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            self.send_response(status)
+            for name, value in headers:
+                self.send_header(name, value)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def do_HEAD(self):
+        if self.path == '/no-head':
+            self.respond(405)
+        else:
+            self.do_GET()
+
+    def do_GET(self):
+        if self.path == '/page':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.respond(304, [('ETag', '"v1"')])
+            else:
+                self.respond(200, [('ETag', '"v1"'), ('Last-Modified', 'Sat, 17 Oct 2026 10:00:00 GMT')])
+        elif self.path == '/moved':
+            self.respond(301, [('Location', '/page')])
+        elif self.path == '/slow':
+            time.sleep(1)
+            self.respond(200)
+        elif self.path in ('/no-head',) or self.path.startswith('/item'):
+            self.respond(200)
+        else:
+            self.respond(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(LINK_CHECK_ALLOW_PRIVATE=True, LINK_CHECK_TIMEOUT=0.5)
+class LinkCheckTests(TestCase):
+    """
+    Tests for the resource URL checker against a local stand-in HTTP server.
+    """
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        self.server.lock, self.server.requests, self.server.delay = threading.Lock(), [], 0
+        self.server.in_flight = self.server.max_in_flight = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+        self.user = CustomUser.objects.create_user(username='linker', password='Password123')
+
+    def add(self, *paths):
+        Resource.objects.bulk_create(Resource(title=path, description='d', url=self.base + path, resource_type='PROGRAM',
+                                              created_by=self.user) for path in paths)
+
+    def checks(self):
+        return {check.url.removeprefix(self.base): check for check in LinkCheck.objects.all()}
+
+    def test_results_are_stored(self):
+        self.add('/page', '/no-head', '/moved', '/gone', '/slow')
+        stats = linkcheck.run()
+        self.assertEqual((stats.checked, stats.ok, stats.failed, stats.broken), (5, 3, 2, 0))
+        checks = self.checks()
+        self.assertEqual((checks['/page'].status, checks['/page'].etag), (200, '"v1"'))
+        self.assertEqual(checks['/no-head'].status, 200) # HEAD refused, GET answered
+        self.assertEqual((checks['/moved'].status, checks['/moved'].final_url), (200, self.base + '/page'))
+        self.assertEqual((checks['/gone'].ok, checks['/gone'].status), (False, 404))
+        self.assertIn('no answer within 0.5 s', checks['/slow'].error)
+        self.assertEqual([method for method, path, _ in self.server.requests if path == '/no-head'], ['HEAD', 'GET'])
+
+    def test_reruns_check_only_stale_urls_conditionally(self):
+        self.add('/page', '/gone')
+        linkcheck.run()
+        self.assertEqual(linkcheck.run().checked, 0) # Everything checked within LINK_CHECK_MAX_AGE
+        self.server.requests.clear()
+        stats = linkcheck.run(max_age=0)
+        self.assertEqual(stats.broken, 1) # /gone failed twice in a row
+        method, _, headers = next(request for request in self.server.requests if request[1] == '/page')
+        self.assertEqual((method, headers['If-None-Match']), ('HEAD', '"v1"'))
+        page = self.checks()['/page']
+        self.assertEqual((page.ok, page.status, page.etag), (True, 304, '"v1"'))
+        out = StringIO()
+        call_command('check_resource_urls', '--report', stdout=out)
+        self.assertIn(f"{self.base}/gone (HTTP 404, 2 checks in a row", out.getvalue())
+
+    def test_per_host_concurrency_is_bounded(self):
+        self.server.delay = 0.05
+        self.add(*(f'/item{i}' for i in range(12)))
+        stats = linkcheck.run(concurrency=10, per_host=3)
+        self.assertEqual(stats.ok, 12)
+        self.assertEqual(self.server.max_in_flight, 3)
+
+    def test_a_busy_host_does_not_hold_the_other_hosts_slots(self):
+        other = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+        other.lock, other.requests, other.delay = self.server.lock, self.server.requests, 0 # One log for both hosts
+        other.in_flight = other.max_in_flight = 0
+        threading.Thread(target=other.serve_forever, daemon=True).start()
+        self.addCleanup(other.server_close)
+        self.addCleanup(other.shutdown)
+        self.server.delay = 0.05
+        items = [(f'{self.base}/item{i}', None) for i in range(12)]
+        items.append((f'http://127.0.0.1:{other.server_port}/page', None))
+
+        results = asyncio.run(linkcheck.check_all(items, concurrency=4, per_host=1, timeout=5, allow_private=True))
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(self.server.max_in_flight, 1)
+        # Queued behind the first host, /page would wait for most of its 12 requests
+        self.assertLess([path for _, path, _ in self.server.requests].index('/page'), 3)
+
+    def test_private_addresses_are_refused_by_default(self):
+        self.add('/page')
+        stats = linkcheck.run(allow_private=False)
+        self.assertEqual(stats.failed, 1)
+        self.assertIn('non-public address', self.checks()['/page'].error)
+        self.assertEqual(self.server.requests, [])
+
+    def test_command_reports_rate_and_prunes(self):
+        self.add('/page')
+        out = StringIO()
+        call_command('check_resource_urls', '--max-age', '0', stdout=out)
+        self.assertRegex(out.getvalue(), r"Checked 1 URLs in [\d.]+ s \([\d.]+ URLs/s\): 1 ok, 0 failed, 0 broken")
+        Resource.objects.all().delete()
+        call_command('check_resource_urls', stdout=StringIO())
+        self.assertFalse(LinkCheck.objects.exists())
+
+    def test_new_and_changed_urls_are_queued_for_a_check(self):
+        resource = Resource.objects.create(title='Page', description='d', url=self.base + '/page',
+                                           resource_type='PROGRAM', created_by=self.user)
+        queued = Task.objects.get()
+        self.assertEqual((queued.name, queued.args), ('portal.tasks.check_resource_url', [resource.pk]))
+        resource = Resource.objects.get(pk=resource.pk)
+        resource.title = 'Renamed'
+        resource.save()
+        self.assertEqual(Task.objects.count(), 1) # Same URL: nothing new to check
+        resource.url = self.base + '/gone'
+        resource.save()
+        self.assertEqual(Task.objects.count(), 2)
+
+        tasks.check_resource_url(resource.pk) # What the worker runs
+        self.assertEqual(self.checks()['/gone'].status, 404)
+        self.assertNotIn('/page', self.checks()) # The resource's current URL only
+
+
+
+CALLS = []
+
+
+@taskqueue.task
+def record_call(*args, **kwargs):
+    CALLS.append((args, kwargs))
+
+
+@taskqueue.task(max_attempts=2)
+def always_fails():
+    raise RuntimeError("upstream unavailable")
+
+
+class TaskQueueTests(TestCase):
+    """
+    Tests for the database task queue (portal/taskqueue.py). The tasks run here
+    touch no database: the worker's threads cannot see the test's transaction.
+    """
+    def setUp(self):
+        CALLS.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        settings_override = self.settings(METRICS_DB=Path(self.tmpdir.name) / 'metrics.sqlite3')
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        metrics.registry.reset()
+
+    def test_tasks_commit_with_the_enqueuing_transaction(self):
+        try:
+            with transaction.atomic():
+                record_call.delay('rolled back')
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertFalse(Task.objects.exists())
+        record_call.delay('kept', n=1)
+        self.assertEqual(Task.objects.values_list('name', 'args', 'kwargs').get(),
+                         ('portal.tests.record_call', ['kept'], {'n': 1}))
+
+    def test_worker_runs_due_tasks_and_deletes_them(self):
+        for i in range(10):
+            record_call.delay(i)
+        taskqueue.enqueue(record_call.name, ['later'], delay=3600)
+        stats = taskqueue.Worker(threads=3, burst=True).run()
+        self.assertEqual((stats.done, stats.retried, stats.failed), (10, 0, 0))
+        self.assertEqual(sorted(args[0] for args, _ in CALLS), list(range(10)))
+        self.assertEqual(Task.objects.get().args, ['later']) # Not due yet
+
+    def test_failures_are_retried_with_backoff_then_kept(self):
+        always_fails.delay()
+        stats = taskqueue.Worker(threads=1, burst=True).run()
+        self.assertEqual((stats.done, stats.retried, stats.failed), (0, 1, 0))
+        retry = Task.objects.get()
+        self.assertEqual((retry.status, retry.attempts, retry.worker), (Task.QUEUED, 1, ''))
+        self.assertIn('RuntimeError: upstream unavailable', retry.error)
+        self.assertGreater(retry.available_at, timezone.now() + timedelta(seconds=4)) # RETRY_BACKOFF * [0.5, 1]
+
+        Task.objects.update(run_at=timezone.now(), available_at=timezone.now())
+        stats = taskqueue.Worker(threads=1, burst=True).run()
+        self.assertEqual((stats.done, stats.retried, stats.failed), (0, 0, 1))
+        failed = Task.objects.get()
+        self.assertEqual((failed.status, failed.attempts, failed.available_at), (Task.FAILED, 2, None))
+
+    def test_claims_are_hidden_until_the_visibility_timeout(self):
+        record_call.delay()
+        (first,), claimed_at = taskqueue.claim('worker-a:1', 10, visibility_timeout=60)
+        self.assertEqual(taskqueue.claim('worker-b:1', 10)[0], [])
+        # worker-a died: its claim expires and the task is handed out again
+        Task.objects.update(available_at=timezone.now() - timedelta(seconds=1))
+        (second,), _ = taskqueue.claim('worker-b:1', 10)
+        self.assertEqual((second.pk, second.attempts), (first.pk, 2))
+        taskqueue.finish('worker-a:1', [(first, None, 0.1)], claimed_at) # Too late: not worker-a's any more
+        self.assertTrue(Task.objects.exists())
+        taskqueue.finish('worker-b:1', [(second, None, 0.1)], claimed_at)
+        self.assertFalse(Task.objects.exists())
+
+    def test_tasks_that_lose_their_worker_fail_after_max_attempts(self):
+        taskqueue.enqueue(record_call.name, max_attempts=2)
+        for attempt in (1, 2):
+            (claimed,), _ = taskqueue.claim(f'worker:{attempt}', 10)
+            self.assertEqual(claimed.attempts, attempt)
+            Task.objects.update(available_at=timezone.now() - timedelta(seconds=1)) # Its worker died
+        with self.assertLogs('portal', 'ERROR'):
+            self.assertEqual(taskqueue.claim('worker:3', 10)[0], [])
+        lost = Task.objects.get()
+        self.assertEqual((lost.status, lost.attempts, lost.available_at, lost.worker), (Task.FAILED, 2, None, ''))
+        self.assertEqual(lost.error, taskqueue.LOST_ERROR)
+        self.assertEqual(taskqueue.claim('worker:4', 10)[0], [])
+
+    def test_metrics_report_throughput_and_lag(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                record_call.delay(i)
+        taskqueue.Worker(threads=2, burst=True).run()
+        Task.objects.create(name=record_call.name, run_at=timezone.now() - timedelta(seconds=30),
+                            available_at=timezone.now() - timedelta(seconds=30))
+        body = metrics.render(metrics.registry.snapshot(), taskqueue.gauges())
+        self.assertIn('portal_tasks_enqueued_total{task="portal.tests.record_call"} 3', body)
+        self.assertIn('portal_tasks_processed_total{task="portal.tests.record_call",outcome="done"} 3', body)
+        self.assertIn('portal_task_lag_seconds_count{task="portal.tests.record_call"} 3', body)
+        self.assertIn('portal_task_queue_depth{state="ready"} 1', body)
+        self.assertRegex(body, r'portal_task_queue_lag_seconds 3\d\.\d+')
+
+    def test_command_drains_the_queue_and_reports(self):
+        record_call.delay()
+        out = StringIO()
+        call_command('run_workers', '--burst', '--threads', '2', stdout=out)
+        self.assertRegex(out.getvalue(), r"Processed 1 tasks in [\d.]+ s \([\d.]+ tasks/s\): 1 done, 0 retried, 0 failed")
+        out = StringIO()
+        call_command('run_workers', '--stats', stdout=out)
+        self.assertIn("0 ready, 0 scheduled, 0 running, 0 failed", out.getvalue())
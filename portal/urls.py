@@ -1,16 +1,34 @@
 
 # portal/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
+
+# Under ASGI (settings.PORTAL_ASYNC_VIEWS) the hot views are served by their
+# native async twins; everything else is shared with the WSGI path.
+if settings.PORTAL_ASYNC_VIEWS:
+    from . import async_views as hot_views
+else:
+    hot_views = views
 
 urlpatterns = [
     # Authentication paths
-    path('', views.login_view, name='login'),
-    path('login/', views.login_view, name='login'),
+    path('', hot_views.login_view, name='login'),
+    path('login/', hot_views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('register/', views.register_view, name='register'),
+    path('register/check/', views.register_check_view, name='register_check'),
     
     # Core Application Paths
-    path('dashboard/', views.dashboard_view, name='dashboard'),
-    path('resources/', views.resources_view, name='resources'),
+    path('dashboard/', hot_views.dashboard_view, name='dashboard'),
+    path('resources/', hot_views.resources_view, name='resources'),
+    path('search/', views.search_view, name='search'),
+    path('export/', views.export_view, name='export'),
+
+    # JSON API (conditional GET: ETag / Last-Modified)
+    path('api/resources/', api.resource_list_api, name='api_resources'),
+    path('api/resources/<int:pk>/', api.resource_detail_api, name='api_resource'),
+
+    # Monitoring
+    path('metrics/', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
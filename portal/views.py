@@ -1,11 +1,14 @@
 # portal/views.py
 
+from django.http import HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required 
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib import messages
-from django.core.cache import cache 
-from functools import wraps 
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
 import logging 
 
 # --- Constants for Security ---
@@ -14,74 +17,43 @@ LOCKOUT_TIME = 300 # 5 minutes in seconds
 # -----------------------------
 
 from .forms import ResourceForm, LoginForm, CustomUserCreationForm 
+from .lockout import get_store as get_lockout_store
 from .models import Resource 
+from .pagination import get_page_size
+from .ratelimit import rate_limit
+from .search import search_resources
+from . import availability, export, metrics, resource_cache, summary, taskqueue
 
 logger = logging.getLogger('portal')
 
 
-# --- Rate Limiting Decorator (Unchanged) ---
-
-def rate_limit(limit, period):
-    """Decorator to limit requests by authenticated user ID."""
-    def decorator(view_func):
-        @wraps(view_func)
-        def _wrapped_view(request, *args, **kwargs):
-            if request.user.is_authenticated:
-                cache_key = f"rate_limit:{request.user.id}:{view_func.__name__}"
-                hits = cache.get(cache_key, 0) + 1
-                
-                if hits > limit:
-                    logger.warning(f"Rate limit exceeded for user: {request.user.username} on view: {view_func.__name__}") 
-                    return render(request, '429_ratelimit.html', status=429) 
-                
-                cache.set(cache_key, hits, period)
-            
-            return view_func(request, *args, **kwargs)
-        return _wrapped_view
-    return decorator
-
-
 # --- Authentication Views ---
 
 def login_view(request):
     """
     Handles login and implements a brute-force prevention mechanism.
-    Checks cache on GET/initial load to persist lockout status and calculates remaining time.
+    Failed attempts live in the shared LockoutStore (lockout.py): each POST reserves
+    an attempt atomically before the password is checked, so parallel requests for
+    one username cannot exceed MAX_LOGIN_ATTEMPTS.
     """
     form = LoginForm() 
-    username = request.POST.get('username', '')
     is_locked_out = False
     lockout_time_remaining = 0  # Time in seconds remaining for countdown
-    minutes = LOCKOUT_TIME // 60 
-    
-    # Check current attempts for persistence (based on form data or default empty string)
-    cache_key = f"login_failed:{username}"
-    attempts = cache.get(cache_key, 0)
-    
-    # 1. PERSISTENCE CHECK: Check if the key exists AND if the lockout limit is met
-    if attempts >= MAX_LOGIN_ATTEMPTS:
-        ttl = cache.ttl(cache_key) # Get remaining time in seconds
-        
-        if ttl > 0:
-            is_locked_out = True
-            lockout_time_remaining = ttl
-            # Set message for persistence on page load
-            messages.error(request, f"Access denied. Too many failed login attempts. Account locked.")
+    store = get_lockout_store()
     
     # --- Start POST handling ---
     if request.method == 'POST':
         form = LoginForm(request, data=request.POST) 
         username = request.POST.get('username') # Get the actual posted username
-        
-        # Recalculate cache key for the posted username
         cache_key = f"login_failed:{username}"
-        attempts = cache.get(cache_key, 0)
+
+        # 1. Reserve an attempt (atomic count + expiry), refused once the limit is reached
+        attempt = store.attempt(cache_key, MAX_LOGIN_ATTEMPTS, LOCKOUT_TIME)
 
         # 2. Check if the user is currently locked out based on the submitted username
-        if attempts >= MAX_LOGIN_ATTEMPTS:
+        if not attempt.admitted:
             is_locked_out = True
-            # Get TTL for the submitted username if they try while already locked out
-            lockout_time_remaining = cache.ttl(cache_key) 
+            lockout_time_remaining = attempt.ttl
             messages.error(request, f"Access denied. Too many failed login attempts. Account locked.")
             logger.warning(f"Access denied for user {username}: Locked out for {LOCKOUT_TIME} seconds.")
             # Do NOT continue to validation if locked out
@@ -95,28 +67,21 @@ def login_view(request):
             messages.success(request, f"Welcome back, {user.username}!")
             
             # Reset attempts on success
-            cache.delete(cache_key)
+            store.reset(cache_key)
             
             return redirect('dashboard')
         
-        # 4. Process a new failed login attempt (i.e., wrong credentials, and not yet locked out)
+        # 4. The reserved attempt failed (wrong credentials); it stays counted
         else:
             logger.warning(f"Failed login attempt for user: {username}.") 
-            
-            # Increment failed attempts and set/reset the expiration time
-            try:
-                new_attempts = cache.incr(cache_key, delta=1)
-            except ValueError:
-                cache.set(cache_key, 1, LOCKOUT_TIME)
-                new_attempts = 1
                 
             # Check immediately if this failure triggers the lockout
-            if new_attempts >= MAX_LOGIN_ATTEMPTS:
+            if attempt.count >= MAX_LOGIN_ATTEMPTS:
                 is_locked_out = True 
                 lockout_time_remaining = LOCKOUT_TIME # Set full lockout time
                 messages.error(request, f"Access denied. Too many failed login attempts. Account locked.")
             else:
-                remaining = MAX_LOGIN_ATTEMPTS - new_attempts
+                remaining = MAX_LOGIN_ATTEMPTS - attempt.count
                 messages.error(request, f"Authentication failed. Check your credentials. You have {remaining} attempts remaining.")
                 
     # Final render, pass the form, the lockout flag, and the time remaining
@@ -162,13 +127,35 @@ def register_view(request):
     return render(request, 'register.html', {'form': form})
 
 
+@require_safe
+@never_cache
+@rate_limit(limit=30, period=60, per='ip')
+def register_check_view(request):
+    """
+    Live check for the registration page (static/portal/register.js):
+    ?username=... -> {"username": {"value": ..., "available": bool}}.
+    Free names are answered from the availability filter without a table scan.
+    Anyone can call it, so it is rate limited per client address, and emails
+    are only checked when the whole form is submitted (CustomUserCreationForm):
+    a registered address is not something to answer one keystroke at a time.
+    """
+    value = request.GET.get('username', '').strip()
+    if not value:
+        return JsonResponse({})
+    return JsonResponse({'username': {'value': value, 'available': not availability.get_index().username_taken(value)}})
+
+
 # --- Core Application Views (Unchanged) ---
 
 @login_required 
 @rate_limit(limit=10, period=60) 
 def dashboard_view(request):
-    """Displays the user's dashboard (Feature A1)."""
-    return render(request, 'dashboard.html')
+    """
+    Displays the user's dashboard (Feature A1): their resource counts (stored on
+    request.user), latest additions and the site totals.
+    """
+    mine, site = summary.for_dashboard(request.user)
+    return render(request, 'dashboard.html', {'summary': mine, 'site_summary': site})
 
 
 @login_required 
@@ -176,7 +163,8 @@ def resources_view(request):
     """Handles adding and displaying resources."""
     if request.method == 'POST':
         form = ResourceForm(request.POST)
-        if form.is_valid():
+        # Possible duplicates are refused or sent back for confirmation (RESOURCE_DUPLICATES)
+        if form.is_valid() and form.check_duplicates():
             new_resource = form.save(commit=False)
             new_resource.created_by = request.user 
             new_resource.save()
@@ -188,13 +176,65 @@ def resources_view(request):
     else:
         form = ResourceForm() 
 
-    # Retrieve all resources for display
-    projects = Resource.objects.filter(resource_type='PROJECT').order_by('-created_at')
-    programs = Resource.objects.filter(resource_type='PROGRAM').order_by('-created_at')
+    # Each list is a versioned cache fragment (see resource_cache.py); a miss runs
+    # one keyset page query (see pagination.py)
+    page_size = get_page_size(request)
+    projects_html = resource_cache.render_list(request, 'resources_projects.html', 'PROJECT', 'projects_cursor', page_size)
+    programs_html = resource_cache.render_list(request, 'resources_programs.html', 'PROGRAM', 'programs_cursor', page_size)
 
     context = {
-        'projects': projects, 
-        'programs': programs,
+        'projects_html': projects_html, 
+        'programs_html': programs_html,
         'form': form
     }
-    return render(request, 'resources.html', context)
\ No newline at end of file
+    return render(request, 'resources.html', context)
+
+
+@login_required 
+def search_view(request):
+    """Full-text search over resources (FTS5 index, bm25 ranking)."""
+    query = request.GET.get('q', '').strip()
+    results = search_resources(query) if query else []
+    return render(request, 'search.html', {'query': query, 'results': results})
+
+
+@login_required
+@rate_limit(limit=5, period=60)
+def export_view(request):
+    """
+    Streams the whole resource table as CSV (default) or JSON lines.
+    Query string: format=csv|jsonl, gzip=1, type=PROJECT|PROGRAM, since=/until=
+    (ISO date or date/time, created_at >= since and < until). See export.py;
+    under ASGI the body is an async iterator.
+    """
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in export.CONTENT_TYPES:
+        return HttpResponseBadRequest(f"format must be one of {', '.join(export.CONTENT_TYPES)}.")
+    try:
+        filters = export.parse_filters(request.GET)
+    except ValueError as exc:
+        return HttpResponseBadRequest(str(exc))
+    compress = request.GET.get('gzip') in ('1', 'true')
+
+    logger.info(f"Resource export by {request.user.username}: {request.GET.urlencode() or 'format=csv'}")
+    # Under ASGI a sync iterator would be read to the end before the first byte is sent
+    body = export.astream if isinstance(request, ASGIRequest) else export.stream
+    response = StreamingHttpResponse(
+        body(filters, fmt, compress),
+        content_type='application/gzip' if compress else export.CONTENT_TYPES[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="resources.{fmt}{".gz" if compress else ""}"'
+    return response
+
+
+# --- Monitoring ---
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint: request and task metrics of every worker (see
+    metrics.py), plus the background task queue's depth and lag.
+    """
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'METRICS_ALLOWED_IPS', []):
+        return HttpResponseForbidden()
+    body = metrics.render(metrics.collect(), taskqueue.gauges())
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
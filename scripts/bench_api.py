@@ -0,0 +1,65 @@
+# scripts/bench_api.py
+"""
+Cost of one client poll of the resource list:
+- GET /resources/ (the HTML page, cached fragments);
+- GET /api/resources/ answered in full (rows from the cached query layer);
+- GET /api/resources/ revalidated with If-None-Match / If-Modified-Since -> 304.
+Each line also shows the SQL queries per request and the response size.
+Runs against a throwaway database and the SQLite cache in a temporary directory.
+Usage: python scripts/bench_api.py [resources] [requests]   (default 2000 500)
+"""
+
+import sys
+import time
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state, measure, report
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from portal import resource_cache  # noqa: E402
+from portal.models import CustomUser, Resource  # noqa: E402
+
+
+def describe(client, path, headers, expected):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(path, headers=headers)
+    assert response.status_code == expected, (path, response.status_code)
+    return f"{len(queries)} queries, {len(response.content)} bytes"
+
+
+def main(resources, requests):
+    with throwaway_database(), isolated_runtime_state(), override_settings(ALLOWED_HOSTS=['testserver']):
+        user = CustomUser.objects.create_user(username='bench', password='bench-password-1')
+        Resource.objects.bulk_create(
+            Resource(title=f"Program {i}", description=f"Description {i} " * 10, resource_type='PROGRAM' if i % 2 else 'PROJECT',
+                     url=f"https://example.com/{i}", created_by=user)
+            for i in range(resources)
+        )
+        resource_cache.bump_generation()
+        client = Client()
+        client.force_login(user)
+
+        full = client.get('/api/resources/')
+        # Pretend the last write was a while ago, so Last-Modified is sent
+        resource_cache.cache.set(resource_cache.MODIFIED_KEY, time.time() - 3600, None)
+        full = client.get('/api/resources/')
+        cases = (
+            ('/resources/ (HTML)', '/resources/', {}, 200),
+            ('/api/resources/ (200)', '/api/resources/', {}, 200),
+            ('/api/resources/ If-None-Match (304)', '/api/resources/', {'If-None-Match': full['ETag']}, 304),
+            ('/api/resources/ If-Modified-Since (304)', '/api/resources/', {'If-Modified-Since': full['Last-Modified']}, 304),
+        )
+        for label, path, headers, expected in cases:
+            detail = describe(client, path, headers, expected)
+            client.get(path, headers=headers) # Warm the cache for this exact request
+            report(label, measure(lambda: client.get(path, headers=headers), repeat=requests))
+            print(f"{'':<40} {detail}")
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 2000, int(args[1]) if len(args) > 1 else 500)
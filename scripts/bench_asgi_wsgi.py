@@ -0,0 +1,114 @@
+# scripts/bench_asgi_wsgi.py
+"""
+Side-by-side throughput/latency of the portal views under WSGI and ASGI.
+
+Modes (each runs in its own subprocess, as PORTAL_ASYNC_VIEWS is read at startup):
+  wsgi        sync views through the WSGI handler, CONCURRENCY threads
+  asgi-sync   sync views through the ASGI handler (every request hops to a thread)
+  asgi-async  async_views.py through the ASGI handler, CONCURRENCY tasks
+
+Requests go through Django's in-process test handlers, so the numbers cover the
+full middleware + view + template stack without any network or server overhead.
+Usage: python scripts/bench_asgi_wsgi.py [requests_per_endpoint] [concurrency]
+"""
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ENDPOINTS = ['/login/', '/dashboard/', '/resources/']
+MODES = ['wsgi', 'asgi-sync', 'asgi-async']
+
+
+def summarize(mode, endpoint, timings, elapsed):
+    from benchutils import percentile
+    ordered = sorted(timings)
+    print(f"{mode:<11} {endpoint:<12} {len(ordered) / elapsed:9,.0f} req/s"
+          f"   p50 {percentile(ordered, 0.50):7.2f} ms   p95 {percentile(ordered, 0.95):7.2f} ms"
+          f"   p99 {percentile(ordered, 0.99):7.2f} ms")
+
+
+def seed():
+    from portal.models import CustomUser, Resource
+    user = CustomUser.objects.create_user(username='bench', password='bench-password-1')
+    Resource.objects.bulk_create(
+        Resource(title=f"Resource {i}", description="Benchmark row " * 10,
+                 resource_type='PROJECT' if i % 2 else 'PROGRAM', created_by=user)
+        for i in range(500)
+    )
+    return user
+
+
+def run_wsgi(user, requests, concurrency):
+    from django.test import Client
+    clients = [Client() for _ in range(concurrency)]
+    for client in clients:
+        client.force_login(user)
+
+    for endpoint in ENDPOINTS:
+        def worker(client, count):
+            timings = []
+            for _ in range(count):
+                start = time.perf_counter()
+                assert client.get(endpoint).status_code == 200
+                timings.append((time.perf_counter() - start) * 1000)
+            return timings
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = pool.map(worker, clients, [requests // concurrency] * concurrency)
+            timings = [t for result in results for t in result]
+        summarize('wsgi', endpoint, timings, time.perf_counter() - start)
+
+
+async def run_asgi(mode, user, requests, concurrency):
+    from django.test import AsyncClient
+    clients = [AsyncClient() for _ in range(concurrency)]
+    for client in clients:
+        await client.aforce_login(user)
+
+    for endpoint in ENDPOINTS:
+        async def worker(client, count):
+            timings = []
+            for _ in range(count):
+                start = time.perf_counter()
+                assert (await client.get(endpoint)).status_code == 200
+                timings.append((time.perf_counter() - start) * 1000)
+            return timings
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(worker(client, requests // concurrency) for client in clients))
+        summarize(mode, endpoint, [t for result in results for t in result], time.perf_counter() - start)
+
+
+def run_mode(mode, requests, concurrency):
+    from benchutils import setup_django, throwaway_database, isolated_runtime_state
+    setup_django()
+    from django.test import override_settings
+    with tempfile.TemporaryDirectory() as tmp, throwaway_database(Path(tmp) / 'bench.sqlite3'), \
+            isolated_runtime_state(), override_settings(ALLOWED_HOSTS=['testserver']):
+        user = seed()
+        if mode == 'wsgi':
+            run_wsgi(user, requests, concurrency)
+        else:
+            asyncio.run(run_asgi(mode, user, requests, concurrency))
+
+
+def main(requests, concurrency):
+    print(f"{requests} requests per endpoint, concurrency {concurrency}")
+    for mode in MODES:
+        env = dict(os.environ, PORTAL_ASYNC_VIEWS='1' if mode == 'asgi-async' else '0')
+        subprocess.run([sys.executable, __file__, '--mode', mode, str(requests), str(concurrency)], env=env, check=True)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args[:1] == ['--mode']:
+        run_mode(args[1], int(args[2]), int(args[3]))
+    else:
+        main(int(args[0]) if args else 400, int(args[1]) if len(args) > 1 else 8)
@@ -0,0 +1,64 @@
+# scripts/bench_availability.py
+"""
+Username availability against a CustomUser table of N users:
+- the Bloom filter alone: build time, size, lookups per second, and the false
+  positive rate measured on names that were never registered (against the
+  configured AVAILABILITY_ERROR_RATE);
+- one check of a free and of a taken username: the iexact query alone (what
+  UserCreationForm runs) against portal.availability (filter, plus the pk range
+  look for users from other workers, plus iexact only on a possible match);
+- GET /register/check/ as served now.
+Usage: python scripts/bench_availability.py [users] [probes]   (default 100000 100000)
+"""
+
+import sys
+import time
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state, measure, report
+
+setup_django()
+
+from django.conf import settings  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+from portal import availability  # noqa: E402
+from portal.models import CustomUser  # noqa: E402
+
+
+def main(users, probes):
+    with throwaway_database(), isolated_runtime_state(), override_settings(ALLOWED_HOSTS=['testserver']):
+        CustomUser.objects.bulk_create(
+            (CustomUser(username=f"member{i}", email=f"member{i}@example.com", password='!') for i in range(users)),
+            batch_size=5000,
+        )
+        print(f"{users:,} users")
+        index = availability.get_index()
+        start = time.perf_counter()
+        index.rebuild()
+        bloom = index.filter
+        print(f"build {(time.perf_counter() - start) * 1000:.1f} ms, {len(bloom.bits):,} bytes, "
+              f"{bloom.hashes} hashes, {bloom.count:,} names (capacity {bloom.capacity:,})")
+
+        start = time.perf_counter()
+        false_positives = sum(f"u:stranger{i}" in bloom for i in range(probes))
+        elapsed = time.perf_counter() - start
+        print(f"false positives {false_positives:,} of {probes:,} free names = {false_positives / probes:.4%} "
+              f"(target {settings.AVAILABILITY_ERROR_RATE:.2%}), {probes / elapsed:,.0f} lookups/s")
+
+        def iexact(name):
+            return CustomUser.objects.filter(username__iexact=name).exists()
+        free, taken = 'stranger-0', f"MEMBER{users // 2}"
+        assert not iexact(free) and iexact(taken)
+        assert not index.username_taken(free) and index.username_taken(taken)
+        report("free name, iexact query", measure(lambda: iexact(free), repeat=100))
+        report("free name, availability", measure(lambda: index.username_taken(free), repeat=100))
+        report("taken name, iexact query", measure(lambda: iexact(taken), repeat=100))
+        report("taken name, availability", measure(lambda: index.username_taken(taken), repeat=100))
+
+        client = Client()
+        report("GET /register/check/ (free)",
+               measure(lambda: client.get('/register/check/', {'username': free}), repeat=100))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000, int(sys.argv[2]) if len(sys.argv) > 2 else 100000)
@@ -0,0 +1,77 @@
+# scripts/bench_cache.py
+"""
+Benchmarks portal.cache_backends.SQLiteCache against Django's FileBasedCache.
+Each size is pre-filled (untimed for FileBasedCache, whose every set() lists the
+whole directory to decide on culling), then timed on random get, set, incr,
+get_many(50) and one cull pass. Every operation runs for at most MAX_SECONDS.
+Runs in a temporary directory.
+Usage: python scripts/bench_cache.py [keys ...]   (default: 10000 100000 1000000)
+"""
+
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchutils import setup_django
+
+setup_django()
+
+from django.core.cache.backends.filebased import FileBasedCache  # noqa: E402
+
+from portal.cache_backends import SQLiteCache  # noqa: E402
+
+OPERATIONS = 2000
+MAX_SECONDS = 3
+VALUE = {'hits': 3, 'payload': 'x' * 200}
+
+
+def throughput(label, func, count=OPERATIONS):
+    start = time.perf_counter()
+    done = 0
+    while done < count and time.perf_counter() - start < MAX_SECONDS:
+        func(done)
+        done += 1
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<22} {done / elapsed:12,.1f} ops/s")
+
+
+def bench(name, cache, size):
+    print(f"{name} @ {size:,} keys")
+    start = time.perf_counter()
+    if isinstance(cache, SQLiteCache):
+        for offset in range(0, size, 10000):
+            cache.set_many({f"key:{i}": VALUE for i in range(offset, min(size, offset + 10000))})
+        print(f"  {'fill (set_many)':<22} {size / (time.perf_counter() - start):12,.0f} keys/s")
+    else:
+        cull, cache._cull = cache._cull, lambda: None
+        for i in range(size):
+            cache.set(f"key:{i}", VALUE)
+        cache._cull = cull
+
+    rng = random.Random(size)
+    keys = [f"key:{rng.randrange(size)}" for _ in range(OPERATIONS)]
+    throughput('get (hit)', lambda i: cache.get(keys[i]))
+    throughput('set', lambda i: cache.set(keys[i], VALUE))
+    cache.set('counter', 0)
+    throughput('incr', lambda i: cache.incr('counter'))
+    throughput('get_many(50)', lambda i: cache.get_many(keys[i:i + 50]), count=OPERATIONS // 10)
+
+    start = time.perf_counter()
+    cache._cull() if isinstance(cache, FileBasedCache) else cache.cull()
+    print(f"  {'cull pass':<22} {(time.perf_counter() - start) * 1000:12,.1f} ms")
+
+
+def main(sizes):
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            # MAX_ENTRIES above the fill size so neither backend culls during the fill.
+            params = {'TIMEOUT': 300, 'OPTIONS': {'MAX_ENTRIES': size * 2}}
+            bench('FileBasedCache', FileBasedCache(str(Path(tmp) / 'files'), params), size)
+            bench('SQLiteCache', SQLiteCache(Path(tmp) / 'cache.sqlite3', params), size)
+        print()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
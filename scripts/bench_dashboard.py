@@ -0,0 +1,68 @@
+# scripts/bench_dashboard.py
+"""
+Dashboard numbers for one user (own project/program counts, latest 5 additions,
+site-wide totals):
+- aggregated per request: COUNT ... GROUP BY over the user's and all resources,
+  plus the latest-additions query;
+- read from the stored summary rows (portal.summary.for_dashboard, one query);
+- GET /dashboard/ as served now;
+and what the incremental maintenance costs a write: Resource.objects.create()
+with and without the summary signal receivers.
+Usage: python scripts/bench_dashboard.py [resources] [users]   (default 100000 50)
+"""
+
+import sys
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state, measure, report
+
+setup_django()
+
+from django.db.models import Count  # noqa: E402
+from django.db.models.signals import post_delete, post_save  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+from portal import signals, summary  # noqa: E402
+from portal.models import CustomUser, Resource  # noqa: E402
+
+
+def aggregate(user):
+    mine = dict(Resource.objects.filter(created_by=user).order_by().values_list('resource_type').annotate(Count('id')))
+    latest = list(Resource.objects.filter(created_by=user).order_by('-created_at', '-id')[:summary.LATEST_COUNT])
+    site = dict(Resource.objects.order_by().values_list('resource_type').annotate(Count('id')))
+    return mine, latest, site
+
+
+def main(resources, users):
+    with throwaway_database(), isolated_runtime_state(), override_settings(ALLOWED_HOSTS=['testserver']):
+        owners = [CustomUser.objects.create_user(username=f"bench{i}", password='bench-password-1') for i in range(users)]
+        batch = [
+            Resource(title=f"Resource {i}", description="d" * 100, resource_type='PROGRAM' if i % 3 else 'PROJECT',
+                     created_by=owners[i % users])
+            for i in range(resources)
+        ]
+        Resource.objects.bulk_create(batch, batch_size=5000)
+        summary.rebuild()
+        user = owners[0]
+        print(f"{resources:,} resources over {users} users")
+        report("aggregate per request", measure(lambda: aggregate(user), repeat=100))
+        report("summary rows", measure(lambda: summary.for_dashboard(user), repeat=100))
+
+        client = Client()
+        client.force_login(user)
+        with override_settings(RATE_LIMITS={'dashboard_view': {'limit': 10 ** 6, 'period': 60}}):
+            report("GET /dashboard/", measure(lambda: client.get('/dashboard/'), repeat=100))
+
+        def create():
+            Resource.objects.create(title='New', description='d', resource_type='PROJECT', created_by=user)
+        report("Resource create (with summary)", measure(create, repeat=200))
+        post_save.disconnect(signals.update_summary_on_save, sender=Resource)
+        post_delete.disconnect(signals.update_summary_on_delete, sender=Resource)
+        try:
+            report("Resource create (without)", measure(create, repeat=200))
+        finally:
+            post_save.connect(signals.update_summary_on_save, sender=Resource)
+            post_delete.connect(signals.update_summary_on_delete, sender=Resource)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000, int(sys.argv[2]) if len(sys.argv) > 2 else 50)
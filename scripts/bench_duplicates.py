@@ -0,0 +1,102 @@
+# scripts/bench_duplicates.py
+"""
+Near-duplicate detection (portal.duplicates) over a resource table where
+`copies` of the resources were re-posted with URL variants (tracking parameters,
+http/https, www., trailing slash) and a word or two of the description changed:
+- duplicates.find() for a re-post and for a new resource (what the add form
+  runs), its LSH bucket query alone, and comparing against every stored
+  signature instead;
+- Resource.objects.create() with and without the fingerprint signal receivers;
+- reindex() and cluster() over the whole table, and how many of the planted
+  copies cluster() grouped with their original.
+Usage: python scripts/bench_duplicates.py [resources] [copies]   (default 100000 5000)
+"""
+
+import random
+import sys
+import time
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state, measure, report
+
+setup_django()
+
+from django.db.models.signals import post_save, pre_save  # noqa: E402
+
+from portal import duplicates, signals  # noqa: E402
+from portal.models import CustomUser, Resource, ResourceBand  # noqa: E402
+
+WORDS = ("python data web course project mentor students weekly build learn robot game api design team "
+         "cloud mobile security network research workshop beginner advanced music art science hardware "
+         "open source analytics machine learning database frontend backend testing deploy sensor").split()
+
+
+def description(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 60)))
+
+
+def variant(rng, url):
+    return rng.choice([url.replace('https://', 'http://'), url + '/', url + '?utm_source=newsletter',
+                       url.replace('https://', 'https://www.') + '?fbclid=abc'])
+
+
+def edited(rng, text):
+    words = text.split()
+    words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return ' '.join(words)
+
+
+def main(resources, copies):
+    rng = random.Random(1)
+    with throwaway_database(), isolated_runtime_state():
+        user = CustomUser.objects.create_user(username='bench', password='bench-password-1')
+        rows = [Resource(title=f"Resource {i}", description=description(rng), url=f"https://site{i}.example.com/p/{i}",
+                         resource_type='PROGRAM' if i % 3 else 'PROJECT', created_by=user)
+                for i in range(resources - copies)]
+        originals = rng.sample(range(len(rows)), copies)
+        rows += [Resource(title=f"Copy of {rows[i].title}", description=edited(rng, rows[i].description),
+                          url=variant(rng, rows[i].url), resource_type=rows[i].resource_type, created_by=user)
+                 for i in originals]
+        Resource.objects.bulk_create(rows, batch_size=5000)
+        start = time.perf_counter()
+        duplicates.reindex(pause=0)
+        print(f"{resources:,} resources ({copies:,} planted copies); reindex {time.perf_counter() - start:.1f} s")
+
+        original = Resource.objects.get(title=f"Resource {originals[0]}")
+        repost = (variant(rng, original.url), edited(rng, original.description))
+        fresh = ('https://new.example.com/x', description(rng))
+        assert duplicates.find(*repost) and not duplicates.find(*fresh)
+        report("find(), re-post", measure(lambda: duplicates.find(*repost), repeat=200))
+        report("find(), new resource", measure(lambda: duplicates.find(*fresh), repeat=200))
+        report("signature() alone", measure(lambda: duplicates.signature(fresh[1]), repeat=200))
+        fresh_buckets = duplicates.buckets(duplicates.signature(fresh[1]))
+        report("bucket query alone", measure(
+            lambda: list(ResourceBand.objects.filter(bucket__in=fresh_buckets).values_list('resource_id', flat=True)), repeat=200))
+
+        def scan():
+            values = duplicates.signature(fresh[1])
+            return [pk for pk, data in Resource.objects.values_list('pk', 'description_minhash').iterator(chunk_size=5000)
+                    if data and duplicates.similarity(values, duplicates.unpack(data)) >= duplicates.SIMILARITY]
+        report("compare against every signature", measure(scan, repeat=3))
+
+        def create():
+            Resource.objects.create(title='New', description=description(rng), url=f"https://n.example.com/{rng.random()}",
+                                    resource_type='PROJECT', created_by=user)
+        report("Resource create (fingerprinted)", measure(create, repeat=200))
+        pre_save.disconnect(signals.fingerprint_resource, sender=Resource)
+        post_save.disconnect(signals.index_resource_bands, sender=Resource)
+        try:
+            report("Resource create (without)", measure(create, repeat=200))
+        finally:
+            pre_save.connect(signals.fingerprint_resource, sender=Resource)
+            post_save.connect(signals.index_resource_bands, sender=Resource)
+
+        start = time.perf_counter()
+        clusters = duplicates.cluster()
+        elapsed = time.perf_counter() - start
+        titles = dict(Resource.objects.values_list('pk', 'title'))
+        found = sum(1 for members in clusters for pk in members if titles[pk].startswith('Copy of '))
+        print(f"cluster() {elapsed:.1f} s: {len(clusters):,} groups, {found:,} of {copies:,} copies grouped")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000, int(sys.argv[2]) if len(sys.argv) > 2 else 5000)
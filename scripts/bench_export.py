@@ -0,0 +1,65 @@
+# scripts/bench_export.py
+"""
+Throughput and peak Python memory of the streaming export (portal/export.py)
+for growing table sizes. Peak memory should stay flat while rows grow; for
+contrast the last column builds the same CSV in one string, which is what a
+plain HttpResponse would do.
+Usage: python scripts/bench_export.py [rows ...]   (default: 10000 50000)
+"""
+
+import sys
+import time
+import tracemalloc
+
+from benchutils import setup_django, throwaway_database
+
+setup_django()
+
+from portal import export  # noqa: E402
+from portal.models import CustomUser, Resource  # noqa: E402
+
+
+def seed(count, user):
+    Resource.objects.bulk_create(
+        (Resource(title=f"Program {i}", description=f"Description of program {i}. " * 6,
+                  url=f"https://example.com/{i}", resource_type='PROGRAM' if i % 2 else 'PROJECT', created_by=user)
+         for i in range(count)),
+        batch_size=2000,
+    )
+
+
+def consume(body):
+    size = 0
+    for piece in body:
+        size += len(piece)
+    return size
+
+
+def run(make_body):
+    start = time.perf_counter()
+    consume(make_body())
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    consume(make_body())
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(sizes):
+    with throwaway_database():
+        user = CustomUser.objects.create_user(username='bench', password='bench')
+        seeded = 0
+        for size in sizes:
+            seed(size - seeded, user)
+            seeded = size
+            print(f"\n--- {size} resources ---")
+            for label, fmt, compress in (('csv', 'csv', False), ('jsonl', 'jsonl', False), ('csv + gzip', 'csv', True)):
+                elapsed, peak = run(lambda: export.stream({}, fmt, compress))
+                print(f"stream {label:<12} {size / elapsed:10,.0f} rows/s   peak {peak / 1024 / 1024:6.1f} MiB")
+            elapsed, peak = run(lambda: [''.join(export.csv_lines(export.export_rows({}))).encode()])
+            print(f"{'whole body in memory':<19} {size / elapsed:10,.0f} rows/s   peak {peak / 1024 / 1024:6.1f} MiB")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 50000])
@@ -0,0 +1,74 @@
+# scripts/bench_hashing.py
+"""
+What a login storm does to the requests that do not log in, with Argon2 hashed
+on the request threads (PASSWORD_HASHING_WORKERS = 0) and in the shared
+hashing pool of each given size.
+STORM threads verify passwords back to back at the configured
+PASSWORD_ARGON2_PARAMS cost while this thread times GET /dashboard/ as a
+logged-in user; the storm's verifies per second end each line.
+Usage: python scripts/bench_hashing.py [storm threads] [pool sizes ...]   (default 8  0 1 2)
+"""
+
+import os
+import sys
+import threading
+import time
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state, measure, report
+
+setup_django()
+
+from django.contrib.auth.hashers import check_password, make_password  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+
+from portal.hashers import get_pool, shutdown_pool  # noqa: E402
+from portal.models import CustomUser  # noqa: E402
+
+PASSWORD = 'bench-password-1'
+
+
+def storm(threads, stop, counts):
+    encoded = make_password(PASSWORD)
+
+    def login():
+        while not stop.is_set():
+            check_password(PASSWORD, encoded)
+            counts.append(1)
+
+    workers = [threading.Thread(target=login, daemon=True) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
+def main(threads, sizes):
+    print(f"{os.cpu_count()} CPUs, {threads} threads logging in")
+    fast_hashing = {'time_cost': 1, 'memory_cost': 8192, 'parallelism': 1}
+    with throwaway_database(), isolated_runtime_state(), override_settings(ALLOWED_HOSTS=['testserver']):
+        with override_settings(PASSWORD_ARGON2_PARAMS=fast_hashing): # Only the storm pays the real cost
+            CustomUser.objects.create_user(username='bench', password=PASSWORD)
+            client = Client()
+            client.post('/login/', {'username': 'bench', 'password': PASSWORD})
+        report("GET /dashboard/ (no storm)", measure(lambda: client.get('/dashboard/'), repeat=100))
+        for size in sizes:
+            with override_settings(PASSWORD_HASHING_WORKERS=size):
+                if get_pool() is not None:
+                    get_pool().submit(int).result() # Start the pool outside the timing
+                stop, counts = threading.Event(), []
+                workers = storm(threads, stop, counts)
+                time.sleep(1)
+                start, before = time.perf_counter(), len(counts)
+                timings = measure(lambda: client.get('/dashboard/'), repeat=100)
+                rate = (len(counts) - before) / (time.perf_counter() - start)
+                stop.set()
+                for worker in workers:
+                    worker.join()
+                label = f"pool of {size}" if size else "inline"
+                report(f"GET /dashboard/ ({label})", timings)
+                print(f"{'':<40} storm: {rate:.1f} verifies/s")
+                shutdown_pool()
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(args[0] if args else 8, args[1:] or [0, 1, 2])
@@ -0,0 +1,75 @@
+# scripts/bench_import.py
+"""
+Rows per second for adding resources one at a time, the way resources_view
+does (ResourceForm, save(), one commit per row), versus
+portal.resource_import.import_resources() at a few batch sizes. Also reports
+the peak Python memory of an import (tracemalloc), which should not grow with
+the file size.
+Usage: python scripts/bench_import.py [rows]   (default 20000)
+"""
+
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state
+
+setup_django()
+
+from portal.forms import ResourceForm  # noqa: E402
+from portal.models import CustomUser, Resource  # noqa: E402
+from portal.resource_import import import_resources  # noqa: E402
+
+
+def row(i):
+    return {'title': f"Program {i}", 'description': f"Imported program number {i} " * 4,
+            'url': f"https://example.com/{i}", 'resource_type': 'PROGRAM' if i % 2 else 'PROJECT'}
+
+
+def one_at_a_time(rows, user):
+    start = time.perf_counter()
+    for i in range(rows):
+        form = ResourceForm(row(i))
+        form.is_valid()
+        resource = form.save(commit=False)
+        resource.created_by = user
+        resource.save()
+    return rows / (time.perf_counter() - start)
+
+
+def batched(path, rows, user, batch_size):
+    start = time.perf_counter()
+    import_resources(path, user, batch_size=batch_size)
+    return rows / (time.perf_counter() - start)
+
+
+def peak_memory(path, user):
+    # A separate run: tracemalloc slows Python down several times
+    tracemalloc.start()
+    import_resources(path, user)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main(rows):
+    with throwaway_database(), isolated_runtime_state(), tempfile.TemporaryDirectory() as tmp:
+        user = CustomUser.objects.create_user(username='bench', password='bench')
+        per_row = max(rows // 10, 1)
+        print(f"{'form + save() per row':<32} {one_at_a_time(per_row, user):10,.0f} rows/s   ({per_row} rows)")
+        for size in (rows, rows * 4):
+            path = f"{tmp}/resources-{size}.jsonl"
+            with open(path, 'w') as f:
+                for i in range(size):
+                    f.write(json.dumps(row(i)) + '\n')
+            for batch_size in (100, 500, 2000):
+                Resource.objects.all().delete()
+                rate = batched(path, size, user, batch_size)
+                print(f"{f'import, batch_size={batch_size}':<32} {rate:10,.0f} rows/s   ({size} rows)")
+            Resource.objects.all().delete()
+            print(f"{'import, peak Python memory':<32} {peak_memory(path, user) / 1024 / 1024:10.1f} MiB     ({size} rows)")
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,78 @@
+# scripts/bench_linkcheck.py
+"""
+URLs checked per second by portal.linkcheck (`manage.py check_resource_urls`)
+against local stand-in sites: `hosts` asyncio HTTP servers (one per port, so
+one "host" each for the per-host limit) that answer after `latency` ms, like a
+remote site would. Every fifth URL (/p/<n>/0) refuses HEAD (405) and costs a
+GET as well.
+Runs a full pass at a few concurrency levels, then a rerun that finds nothing
+due, then a forced recheck (304s for the pages that sent an ETag).
+Usage: python scripts/bench_linkcheck.py [urls] [hosts] [latency ms]   (default 2000 20 50)
+"""
+
+import asyncio
+import sys
+import threading
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state
+
+setup_django()
+
+from django.test import override_settings  # noqa: E402
+
+from portal import linkcheck  # noqa: E402
+from portal.models import CustomUser, LinkCheck, Resource  # noqa: E402
+
+
+async def serve(hosts, latency, ready):
+    async def handle(reader, writer):
+        request_line = await reader.readline()
+        headers = []
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            headers.append(line.lower())
+        await asyncio.sleep(latency / 1000)
+        method, path = request_line.split()[:2]
+        if method == b'HEAD' and path.endswith(b'/0'):
+            status = b'405 Method Not Allowed'
+        elif b'if-none-match: "v1"\r\n' in headers:
+            status = b'304 Not Modified'
+        else:
+            status = b'200 OK'
+        writer.write(b'HTTP/1.1 ' + status + b'\r\nETag: "v1"\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+        await writer.drain()
+        writer.close()
+
+    servers = [await asyncio.start_server(handle, '127.0.0.1', 0, backlog=1024) for _ in range(hosts)]
+    ready.append([server.sockets[0].getsockname()[1] for server in servers])
+    await asyncio.Event().wait()
+
+
+def main(urls, hosts, latency):
+    ready = []
+    threading.Thread(target=asyncio.run, args=(serve(hosts, latency, ready),), daemon=True).start()
+    while not ready:
+        pass
+    ports = ready[0]
+    with throwaway_database(), isolated_runtime_state(), override_settings(LINK_CHECK_ALLOW_PRIVATE=True):
+        user = CustomUser.objects.create_user(username='bench', password='bench-password-1')
+        Resource.objects.bulk_create(
+            (Resource(title=f"Resource {i}", description='d', url=f"http://127.0.0.1:{ports[i % hosts]}/p/{i}/{i % 5}",
+                      resource_type='PROGRAM', created_by=user) for i in range(urls)),
+            batch_size=5000,
+        )
+        print(f"{urls:,} URLs on {hosts} hosts, {latency} ms per response")
+        for concurrency, per_host in ((1, 1), (20, 2), (50, 4), (200, 10)):
+            LinkCheck.objects.all().delete()
+            stats = linkcheck.run(concurrency=concurrency, per_host=per_host)
+            print(f"  concurrency {concurrency:>3}, per host {per_host:>2}: {stats.checked / stats.elapsed:8.1f} URLs/s "
+                  f"({stats.ok} ok in {stats.elapsed:.1f} s)")
+        stats = linkcheck.run()
+        print(f"  rerun: {stats.checked} URLs due")
+        stats = linkcheck.run(concurrency=200, per_host=10, max_age=0)
+        print(f"  forced recheck (conditional): {stats.checked / stats.elapsed:8.1f} URLs/s, "
+              f"{LinkCheck.objects.filter(status=304).count():,} answered 304")
+
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:4]]
+    main(*(args + [2000, 20, 50][len(args):]))
@@ -0,0 +1,80 @@
+# scripts/bench_logging.py
+"""
+Log calls per second: the previous synchronous RotatingFileHandler + 'verbose'
+text formatter versus portal.jsonlog.QueuedRotatingFileHandler + JSONFormatter.
+
+For each setup THREADS threads each log CALLS messages (5 MB files, 5 backups,
+so rotation is included). Reported:
+- calls/s and p99 of a single logger.info() call, as seen by the request thread;
+- end-to-end records/s, i.e. including the time to drain the queue to disk.
+A last run with a small queue shows the overload behaviour (drops, not blocking).
+Runs in a temporary directory; no Django setup needed.
+Usage: python scripts/bench_logging.py [calls_per_thread] [threads]   (default 20000 4)
+"""
+
+import logging
+import sys
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+
+from benchutils import percentile
+
+from portal.jsonlog import JSONFormatter, QueuedRotatingFileHandler
+
+VERBOSE = logging.Formatter('{levelname} {asctime} {module} {process:d} {thread:d} {message}', style='{')
+
+
+def run(label, handler, calls, threads):
+    logger = logging.getLogger(f"bench.{label}")
+    logger.handlers[:] = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    samples = []
+
+    def worker(index):
+        timings = []
+        for i in range(calls):
+            start = time.perf_counter()
+            logger.info(f"Failed login attempt for user: user{index}-{i}.")
+            timings.append(time.perf_counter() - start)
+        samples.append(timings)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    emitted = time.perf_counter() - start
+    handler.flush()
+    drained = time.perf_counter() - start
+    handler.close()
+
+    total = calls * threads
+    ordered = sorted(t for timings in samples for t in timings)
+    dropped = getattr(handler, 'dropped', 0)
+    print(f"{label:<34} {total / emitted:10,.0f} calls/s   p99 {percentile(ordered, 0.99) * 1e6:8.1f} us"
+          f"   end-to-end {(total - dropped) / drained:10,.0f} records/s   dropped {dropped}")
+
+
+def main(calls, threads):
+    print(f"{threads} threads x {calls} calls")
+    with tempfile.TemporaryDirectory() as tmp:
+        sync = RotatingFileHandler(f"{tmp}/sync.log", maxBytes=5 * 1024 * 1024, backupCount=5)
+        sync.setFormatter(VERBOSE)
+        run('RotatingFileHandler + text', sync, calls, threads)
+
+        queued = QueuedRotatingFileHandler(f"{tmp}/queued.log", maxBytes=5 * 1024 * 1024, backupCount=5)
+        queued.setFormatter(JSONFormatter())
+        run('QueuedRotatingFileHandler + JSON', queued, calls, threads)
+
+        small = QueuedRotatingFileHandler(f"{tmp}/small.log", maxBytes=5 * 1024 * 1024, backupCount=5, queue_size=1000)
+        small.setFormatter(JSONFormatter())
+        run('  same, queue_size=1000 (overload)', small, calls, threads)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 20000, int(args[1]) if len(args) > 1 else 4)
@@ -0,0 +1,88 @@
+# scripts/bench_metrics.py
+"""
+Checks the per-request cost of portal.metrics.MetricsMiddleware against its budget.
+
+1. Middleware overhead: the same trivial view called through MetricsMiddleware
+   and directly; the difference per request must stay below BUDGET_US.
+2. Full stack: /dashboard/ through the test client with and without the
+   middleware in MIDDLEWARE (informational; the noise is larger than the overhead).
+3. One flush of a realistic snapshot to METRICS_DB (paid once per interval).
+
+Exits with status 1 when the budget is exceeded.
+Usage: python scripts/bench_metrics.py [requests]   (default 20000)
+"""
+
+import statistics
+import sys
+import time
+from contextlib import nullcontext
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state, report, measure
+
+setup_django()
+
+from django.http import HttpResponse  # noqa: E402
+from django.test import Client, RequestFactory, modify_settings, override_settings  # noqa: E402
+from django.urls import resolve  # noqa: E402
+
+from portal import metrics  # noqa: E402
+from portal.models import CustomUser  # noqa: E402
+
+BUDGET_US = 50
+
+
+def per_request_us(handler, request, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        handler(request)
+    return (time.perf_counter() - start) / count * 1_000_000
+
+
+def middleware_overhead(count):
+    request = RequestFactory().get('/dashboard/')
+    request.resolver_match = resolve('/dashboard/')
+
+    def view(request):
+        return HttpResponse('x' * 2048)
+
+    middleware = metrics.MetricsMiddleware(view)
+    rounds = [(per_request_us(view, request, count), per_request_us(middleware, request, count)) for _ in range(5)]
+    bare = statistics.median(r[0] for r in rounds)
+    wrapped = statistics.median(r[1] for r in rounds)
+    print(f"trivial view: bare {bare:7.2f} us   with MetricsMiddleware {wrapped:7.2f} us   "
+          f"overhead {wrapped - bare:6.2f} us/request (budget {BUDGET_US} us)")
+    return wrapped - bare
+
+
+def full_stack(count):
+    user = CustomUser.objects.create_user(username='bench', password='bench-password-1')
+    for label, settings_change in (
+        ('/dashboard/ without metrics', modify_settings(MIDDLEWARE={'remove': 'portal.metrics.MetricsMiddleware'})),
+        ('/dashboard/ with metrics', nullcontext()),
+    ):
+        with settings_change:
+            client = Client()
+            client.force_login(user)
+            report(label, measure(lambda: client.get('/dashboard/'), repeat=count))
+
+
+def flush_cost():
+    for view in ('login', 'dashboard', 'resources', 'search', 'metrics'):
+        for status in (200, 302, 429):
+            metrics.registry.observe_request(view, status, 0.01, 3, 0.002, 4096, {('rows', True): 1, ('html', False): 1})
+    report('flush() of a 5-view snapshot', measure(lambda: metrics.flush(force=True), repeat=200))
+
+
+def main(count):
+    with throwaway_database(), isolated_runtime_state(), override_settings(ALLOWED_HOSTS=['testserver']):
+        overhead = middleware_overhead(count)
+        full_stack(min(count, 500))
+        flush_cost()
+    if overhead > BUDGET_US:
+        print(f"FAIL: MetricsMiddleware costs {overhead:.1f} us per request, budget is {BUDGET_US} us")
+        sys.exit(1)
+    print("OK: within budget")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
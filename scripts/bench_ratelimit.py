@@ -0,0 +1,74 @@
+# scripts/bench_ratelimit.py
+"""
+Microbenchmark of rate-limit checks per second.
+Compares the old cache.get + cache.set counter on the configured cache with the
+token-bucket backends in portal/ratelimit.py, single process and multi-process.
+Usage: python scripts/bench_ratelimit.py [checks]   (default: 20000)
+"""
+
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchutils import setup_django
+
+setup_django()
+
+from django.core.cache import cache, caches  # noqa: E402
+
+from portal.ratelimit import MemoryBackend, SQLiteBackend  # noqa: E402
+
+
+def legacy_check(i):
+    # The pre-token-bucket implementation: non-atomic read-modify-write on the cache.
+    key = f"bench_rate_limit:{i % 100}:dashboard_view"
+    hits = cache.get(key, 0) + 1
+    cache.set(key, hits, 60)
+
+
+def run(label, check, count):
+    start = time.perf_counter()
+    for i in range(count):
+        check(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<45} {count / elapsed:12,.0f} checks/s")
+
+
+def _process_worker(path, count, results):
+    backend = SQLiteBackend(path=path)
+    allowed = sum(backend.hit(f"user:{i % 100}", 10 ** 9, 60).allowed for i in range(count))
+    results.put(allowed)
+
+
+def run_processes(path, processes, count):
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_process_worker, args=(path, count, results)) for _ in range(processes)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    total = sum(results.get() for _ in workers)
+    print(f"{f'SQLiteBackend x {processes} processes':<45} {total / elapsed:12,.0f} checks/s (aggregate)")
+
+
+def main(count):
+    memory = MemoryBackend()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'bench_ratelimit.sqlite3'
+        sqlite = SQLiteBackend(path=path)
+
+        run(f"legacy cache.get+set ({caches['default'].__class__.__name__})", legacy_check, count)
+        run("MemoryBackend", lambda i: memory.hit(f"user:{i % 100}", 10, 60), count)
+        run("SQLiteBackend", lambda i: sqlite.hit(f"user:{i % 100}", 10, 60), count)
+        for processes in (2, 4):
+            run_processes(path, processes, count)
+
+    cache.delete_many([f"bench_rate_limit:{i}:dashboard_view" for i in range(100)])
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,63 @@
+# scripts/bench_search.py
+"""
+Compares the FTS5 search (portal/search.py) against an icontains LIKE scan.
+Usage: python scripts/bench_search.py [rows ...]   (default: 10000 100000)
+"""
+
+import random
+import sys
+
+from benchutils import setup_django, throwaway_database, measure, report
+
+setup_django()
+
+from django.db.models import Q  # noqa: E402
+
+from portal.models import CustomUser, Resource  # noqa: E402
+from portal.search import search_resources  # noqa: E402
+
+# Zipf-like vocabulary: a few very common words plus a long tail, so queries
+# range from "matches a third of the table" to "matches a handful of rows".
+COMMON = "python django backend intern hiring program summer research open source".split()
+RARE = [f"w{i}x" for i in range(50000)]
+QUERIES = ["python", "hiring program", "w1234x", "w77x w78x", "nomatchword"]
+
+
+def seed(count, user):
+    rng = random.Random(count)
+    batch = []
+    for i in range(count):
+        words = rng.sample(COMMON, k=2) + rng.choices(RARE, k=40)
+        rng.shuffle(words)
+        title = ' '.join(words[:4])
+        description = ' '.join(words[4:])
+        batch.append(Resource(title=title, description=description,
+                              resource_type=rng.choice(['PROJECT', 'PROGRAM']), created_by=user))
+        if len(batch) == 5000:
+            Resource.objects.bulk_create(batch)
+            batch = []
+    Resource.objects.bulk_create(batch)
+
+
+def icontains(text):
+    condition = Q()
+    for word in text.split():
+        condition &= Q(title__icontains=word) | Q(description__icontains=word)
+    return list(Resource.objects.filter(condition).select_related('created_by')[:50])
+
+
+def main(sizes):
+    with throwaway_database():
+        user = CustomUser.objects.create_user(username='bench', password='bench')
+        seeded = 0
+        for size in sizes:
+            seed(size - seeded, user)
+            seeded = size
+            print(f"\n--- {size} resources ---")
+            for query in QUERIES:
+                report(f"fts5     '{query}'", measure(lambda: search_resources(query), repeat=20))
+                report(f"icontains '{query}'", measure(lambda: icontains(query), repeat=20))
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,73 @@
+# scripts/bench_sessions.py
+"""
+django_session traffic per request, stock database engine against
+portal.session_backend, both with the default save-on-change behaviour and with
+SESSION_SAVE_EVERY_REQUEST (a sliding expiry).
+One client logs in, loads the dashboard and the resource list, adds a resource,
+polls the list REPEAT times and logs out; every step shows the django_session
+reads and writes it made, the totals end each run, followed by the time of an
+authenticated GET /dashboard/.
+Usage: python scripts/bench_sessions.py [repeat]   (default 20)
+"""
+
+import re
+import sys
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state, measure, report
+
+setup_django()
+
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from portal.models import CustomUser  # noqa: E402
+
+ENGINES = (
+    ('db', 'django.contrib.sessions.backends.db', False),
+    ('portal', 'portal.session_backend', False),
+    ('db, save every request', 'django.contrib.sessions.backends.db', True),
+    ('portal, save every request', 'portal.session_backend', True),
+)
+PASSWORD = 'bench-password-1'
+WRITE = re.compile(r'\s*(INSERT|UPDATE|DELETE)')
+
+
+def session_queries(client, method, path, data=None):
+    with CaptureQueriesContext(connection) as queries:
+        getattr(client, method)(path, data or {})
+    statements = [query['sql'] for query in queries if 'django_session' in query['sql']]
+    writes = sum(1 for sql in statements if WRITE.match(sql))
+    return len(statements) - writes, writes
+
+
+def main(repeat):
+    flow = [
+        ('post', '/login/', {'username': 'bench', 'password': PASSWORD}),
+        ('get', '/dashboard/', None),
+        ('get', '/resources/', None),
+        ('post', '/resources/', {'title': 'New', 'description': 'd', 'url': '', 'resource_type': 'PROJECT'}),
+    ] + [('get', '/resources/', None)] * repeat + [('get', '/logout/', None)]
+    fast_hashing = {'time_cost': 1, 'memory_cost': 8192, 'parallelism': 1}
+    with throwaway_database(), isolated_runtime_state(), \
+            override_settings(ALLOWED_HOSTS=['testserver'], PASSWORD_ARGON2_PARAMS=fast_hashing,
+                              RATE_LIMIT_BACKEND='portal.ratelimit.MemoryBackend'):
+        CustomUser.objects.create_user(username='bench', password=PASSWORD)
+        for label, engine, every_request in ENGINES:
+            with override_settings(SESSION_ENGINE=engine, SESSION_SAVE_EVERY_REQUEST=every_request):
+                print(f"\n{label}")
+                client = Client()
+                reads = writes = 0
+                for step, (method, path, data) in enumerate(flow):
+                    step_reads, step_writes = session_queries(client, method, path, data)
+                    reads += step_reads
+                    writes += step_writes
+                    if step < 5 or step == len(flow) - 1:
+                        print(f"  {method.upper():4} {path:<12} session reads {step_reads}  writes {step_writes}")
+                print(f"  {len(flow)} requests: {reads} session reads, {writes} session writes")
+                client.post('/login/', {'username': 'bench', 'password': PASSWORD})
+                report(f"  GET /dashboard/ ({label})", measure(lambda: client.get('/dashboard/'), repeat=200))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,147 @@
+# scripts/bench_sqlite_profile.py
+"""
+Mixed read/write load on a file-backed SQLite database, with the plain
+settings and with the production profile (PORTAL_DB_PROFILE=production: WAL,
+tuned PRAGMAs, BEGIN IMMEDIATE, persistent connections, reads routed to the
+read-only 'replica' connection).
+
+WORKERS processes (like the workers of a WSGI server) run for SECONDS; every
+operation is one of
+- read (75%): session lookup + a keyset page of resources with their creators;
+- session save (10%): SessionStore.save(), as every login does;
+- resource add (10%): Resource.objects.create(), as resources_view does;
+- read+write (5%): get() then save() in one transaction.atomic(), the shape of
+  update_or_create() and similar ORM code.
+Each operation ends like a request does (close_old_connections()), so the
+plain settings reconnect every time and the profile keeps its connections.
+Reported per profile: operations/s, p50/p99 latency per kind and the share of
+operations that failed with "database is locked".
+Each profile runs in its own process (the profile is read when settings load).
+Usage: python scripts/bench_sqlite_profile.py [workers] [seconds]   (default 8 10)
+"""
+
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from benchutils import PROJECT_ROOT, percentile
+
+PROFILES = ('default', 'production')
+MIX = (('read', 0.75), ('session save', 0.1), ('resource add', 0.1), ('read+write', 0.05))
+
+
+def child(workers, seconds):
+    from benchutils import setup_django, throwaway_database, isolated_runtime_state
+    setup_django()
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.contrib.sessions.models import Session
+    from django.db import OperationalError, close_old_connections, connections, transaction
+    from portal.models import CustomUser, Resource
+    from portal.pagination import KeysetPaginator
+
+    with tempfile.TemporaryDirectory() as tmp, throwaway_database(f"{tmp}/bench.sqlite3"), isolated_runtime_state():
+        user = CustomUser.objects.create_user(username='bench', password='bench')
+        Resource.objects.bulk_create(
+            Resource(title=f"Resource {i}", description="d" * 200, resource_type='PROGRAM' if i % 2 else 'PROJECT', created_by=user)
+            for i in range(5000)
+        )
+        session_keys = []
+        for _ in range(workers * 4):
+            store = SessionStore()
+            store['n'] = 0
+            store.create()
+            session_keys.append(store.session_key)
+        connections.close_all()
+
+        deadline = time.perf_counter() + seconds
+
+        def read(rng):
+            SessionStore(rng.choice(session_keys)).load()
+            KeysetPaginator(Resource.objects.select_related('created_by').filter(resource_type='PROJECT'), 20).fetch(None)
+
+        def session_save(rng):
+            store = SessionStore(rng.choice(session_keys))
+            store['n'] = store.get('n', 0) + 1
+            store.save()
+
+        def resource_add(rng):
+            Resource.objects.create(title='New', description='d', resource_type='PROJECT', created_by=user)
+
+        def read_then_write(rng):
+            with transaction.atomic():
+                session = Session.objects.get(pk=rng.choice(session_keys))
+                session.expire_date += timedelta(seconds=1)
+                session.save(update_fields=['expire_date'])
+
+        operations = {'read': read, 'session save': session_save, 'resource add': resource_add,
+                      'read+write': read_then_write}
+
+        def worker(seed, results):
+            rng = random.Random(seed)
+            timings, errors = defaultdict(list), defaultdict(int)
+            while time.perf_counter() < deadline:
+                kind = rng.choices([k for k, _ in MIX], [w for _, w in MIX])[0]
+                start = time.perf_counter()
+                try:
+                    operations[kind](rng)
+                except OperationalError as exc:
+                    if 'locked' not in str(exc):
+                        raise
+                    errors[kind] += 1
+                    continue
+                finally:
+                    close_old_connections() # What request_finished does: closes unless CONN_MAX_AGE keeps it
+                timings[kind].append(time.perf_counter() - start)
+            connections.close_all()
+            results.put((dict(timings), dict(errors)))
+
+        # Processes, like the workers of a WSGI server: each has its own connections
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        pool = [context.Process(target=worker, args=(n, results)) for n in range(workers)]
+        started = time.perf_counter()
+        for process in pool:
+            process.start()
+        timings, errors = defaultdict(list), defaultdict(int)
+        for _ in pool:
+            worker_timings, worker_errors = results.get()
+            for kind, values in worker_timings.items():
+                timings[kind].extend(values)
+            for kind, count in worker_errors.items():
+                errors[kind] += count
+        for process in pool:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        done = sum(len(values) for values in timings.values())
+        failed = sum(errors.values())
+        print(f"  {done / elapsed:8,.0f} ops/s   locked errors {failed} / {done + failed} "
+              f"({failed / max(done + failed, 1):.1%})")
+        for kind, _ in MIX:
+            ordered = sorted(timings[kind])
+            if ordered:
+                print(f"    {kind:<13} n={len(ordered):<7} p50 {percentile(ordered, 0.5) * 1000:8.2f} ms   "
+                      f"p99 {percentile(ordered, 0.99) * 1000:8.2f} ms   locked {errors[kind]}")
+
+
+def main(workers, seconds):
+    print(f"{workers} workers x {seconds}s, mix: " + ', '.join(f"{kind} {weight:.0%}" for kind, weight in MIX))
+    for profile in PROFILES:
+        print(f"\nPORTAL_DB_PROFILE={profile}", flush=True)
+        env = dict(os.environ, PORTAL_DB_PROFILE=profile)
+        subprocess.run([sys.executable, __file__, '--child', str(workers), str(seconds)],
+                       env=env, cwd=PROJECT_ROOT, check=True)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    if args and args[0] == '--child':
+        child(int(args[1]), float(args[2]))
+    else:
+        main(int(args[0]) if args else 8, float(args[1]) if len(args) > 1 else 10)
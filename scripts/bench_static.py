@@ -0,0 +1,69 @@
+# scripts/bench_static.py
+"""
+Serving collected static files: django.views.static.serve (the view a static()
+URL pattern uses, timed alone, without the middleware in front of it) against
+portal.static_assets' WSGI layer, for the portal stylesheet and two admin assets.
+collectstatic runs into a temporary STATIC_ROOT first, so the layer has hashed
+names and .gz variants to serve. Per file: time per request, bytes on the wire
+for a gzip-accepting client, and the cost of a revalidation.
+Usage: python scripts/bench_static.py [requests]   (default 500)
+"""
+
+import os
+import sys
+import tempfile
+
+from benchutils import setup_django, measure, report
+
+setup_django()
+
+from django.contrib.staticfiles.storage import staticfiles_storage  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+from django.views.static import serve  # noqa: E402
+
+from portal.static_assets import StaticFiles, StaticFilesWSGI  # noqa: E402
+
+FILES = ('portal/style.css', 'admin/js/actions.js', 'admin/css/base.css')
+
+
+def django_serve(root, name, headers):
+    request = RequestFactory().get('/static/' + name, headers=headers)
+    response = serve(request, name, document_root=root)
+    return b''.join(response) if response.status_code == 200 else b''
+
+
+def layer_serve(application, url, headers):
+    environ = RequestFactory().get(url, headers=headers).environ
+    result = {}
+
+    def start_response(status, response_headers):
+        result.update(response_headers)
+    body = application(environ, start_response)
+    # What the server does with the file_wrapper / iterator (sendfile() under gunicorn)
+    data = b''.join(body)
+    getattr(body, 'close', lambda: None)()
+    return data, result
+
+
+def main(requests):
+    with tempfile.TemporaryDirectory() as root, override_settings(STATIC_ROOT=root, DEBUG=False):
+        call_command('collectstatic', interactive=False, verbosity=0)
+        application = StaticFilesWSGI(lambda environ, start_response: [], StaticFiles(root, '/static/'))
+        gzip_client = {'Accept-Encoding': 'gzip, deflate'}
+        for name in FILES:
+            url = staticfiles_storage.url(name)
+            size = os.path.getsize(os.path.join(root, name))
+            print(f"\n{name} ({size:,} bytes) -> {url}")
+            served = django_serve(root, name, gzip_client)
+            report("  static.serve", measure(lambda: django_serve(root, name, gzip_client), repeat=requests))
+            print(f"  {'':<36} {len(served):,} bytes, no Cache-Control")
+            body, headers = layer_serve(application, url, gzip_client)
+            report("  StaticFilesWSGI", measure(lambda: layer_serve(application, url, gzip_client), repeat=requests))
+            print(f"  {'':<36} {len(body):,} bytes ({headers.get('Content-Encoding', 'identity')}), {headers['Cache-Control']}")
+            revalidate = dict(gzip_client, **{'If-None-Match': headers['ETag']})
+            report("  StaticFilesWSGI 304", measure(lambda: layer_serve(application, url, revalidate), repeat=requests))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
@@ -0,0 +1,117 @@
+# scripts/bench_tasks.py
+"""
+The database task queue (portal/taskqueue.py) on a file-backed SQLite database:
+- enqueue: one task per transaction (what a request pays), and many in one;
+- dequeue: `run_workers --burst` over a backlog of TASKS no-op tasks (queue
+  overhead only) and of TASKS/5 tasks waiting 20 ms on I/O, for several
+  process x thread pools; reported as tasks/s with the mean and largest queue
+  lag (due -> claimed) from the task metrics;
+- pickup: the lag of tasks enqueued one by one (every 10 ms) while a worker
+  waits on the queue, i.e. what the poll interval adds.
+Runs with the settings' database profile; compare with
+  PORTAL_DB_PROFILE=production python scripts/bench_tasks.py
+Usage: python scripts/bench_tasks.py [tasks]   (default 5000)
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state, measure, report
+
+setup_django()
+
+import threading  # noqa: E402
+
+from django.db import connections, transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from portal import metrics, taskqueue  # noqa: E402
+from portal.models import Task  # noqa: E402
+
+POOLS = ((1, 1), (1, 4), (1, 16), (2, 8), (4, 8)) # (processes, threads)
+
+
+@taskqueue.task
+def noop():
+    pass
+
+
+@taskqueue.task
+def wait_for_io(seconds):
+    time.sleep(seconds)
+
+
+def queued(count, function=noop, args=()):
+    now = timezone.now()
+    return (Task(name=function.name, args=list(args), run_at=now, available_at=now) for _ in range(count))
+
+
+def lag(snapshot, function):
+    """(mean, upper bound of the highest bucket used) of the queue lag, in seconds."""
+    series = snapshot['histograms']['portal_task_lag_seconds'][function.name]
+    bounds = (*metrics.HISTOGRAMS['portal_task_lag_seconds'][1], float('inf'))
+    count = sum(series[:-1])
+    highest = max(i for i, n in enumerate(series[:-1]) if n)
+    return series[-1] / count, bounds[highest]
+
+
+def reset_metrics():
+    metrics.registry.reset()
+    metrics.get_store().db.execute('DELETE FROM metrics_worker')
+
+
+def drain(label, function, tasks, processes, threads):
+    reset_metrics()
+    connections.close_all()
+    start = time.perf_counter()
+    stats = taskqueue.serve(processes=processes, burst=True, threads=threads, poll_interval=0.05)
+    elapsed = time.perf_counter() - start
+    assert stats.done == tasks and not Task.objects.exists(), stats
+    mean, highest = lag(metrics.collect(), function)
+    print(f"{label:<34} {processes} x {threads:>2}   {tasks / elapsed:8.0f} tasks/s   "
+          f"lag mean {mean * 1000:7.1f} ms, max <= {highest} s")
+
+
+def main(tasks):
+    print(f"Database profile: {os.environ.get('PORTAL_DB_PROFILE', 'default')}, {tasks:,} tasks")
+    with tempfile.TemporaryDirectory() as tmp, throwaway_database(f"{tmp}/bench.sqlite3"), isolated_runtime_state():
+        report("enqueue, one per transaction", measure(lambda: noop.delay(), repeat=tasks))
+        Task.objects.all().delete()
+
+        def batch():
+            with transaction.atomic():
+                for _ in range(100):
+                    noop.delay()
+        timings = measure(batch, repeat=max(tasks // 100, 1))
+        report("enqueue, 100 per transaction (per task)", [t / 100 for t in timings])
+        Task.objects.all().delete()
+
+        for processes, threads in POOLS:
+            Task.objects.bulk_create(queued(tasks))
+            drain("no-op tasks", noop, tasks, processes, threads)
+        io_tasks = tasks // 5
+        for processes, threads in POOLS:
+            Task.objects.bulk_create(queued(io_tasks, wait_for_io, [0.02]))
+            drain("20 ms I/O tasks", wait_for_io, io_tasks, processes, threads)
+
+        reset_metrics()
+        for poll_interval in (0.05, taskqueue.POLL_INTERVAL):
+            worker = taskqueue.Worker(threads=4, poll_interval=poll_interval)
+            thread = threading.Thread(target=worker.run)
+            thread.start()
+            for _ in range(200):
+                noop.delay()
+                time.sleep(0.01)
+            while Task.objects.exists():
+                time.sleep(0.05)
+            worker.stop.set()
+            thread.join()
+            mean, highest = lag(metrics.registry.snapshot(), noop)
+            print(f"pickup, poll every {poll_interval} s           lag mean {mean * 1000:7.1f} ms, max <= {highest} s")
+            reset_metrics()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
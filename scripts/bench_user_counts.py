@@ -0,0 +1,71 @@
+# scripts/bench_user_counts.py
+"""
+"Resources added by this user" for a page of users, three ways:
+- a COUNT query per user (the N+1 of a list page);
+- one query with annotate(Count) (join + GROUP BY over resources);
+- the denormalized CustomUser.project_count/program_count columns;
+plus a top-20 leaderboard by projects (annotate + ORDER BY against the column),
+and the cost of `check_resource_counts` over every user.
+Usage: python scripts/bench_user_counts.py [resources] [users]   (default 100000 1000)
+"""
+
+import sys
+
+from benchutils import setup_django, throwaway_database, isolated_runtime_state, measure, report
+
+setup_django()
+
+from django.db.models import Count, Q  # noqa: E402
+
+from portal import summary  # noqa: E402
+from portal.models import CustomUser, Resource  # noqa: E402
+
+PAGE = 50
+
+
+def main(resources, users):
+    with throwaway_database(), isolated_runtime_state():
+        CustomUser.objects.bulk_create(CustomUser(username=f"bench{i}", password='!') for i in range(users))
+        owners = list(CustomUser.objects.order_by('pk'))
+        Resource.objects.bulk_create(
+            (Resource(title=f"Resource {i}", description="d", resource_type='PROGRAM' if i % 3 else 'PROJECT',
+                      created_by=owners[(i * 7919) % users]) for i in range(resources)),
+            batch_size=5000,
+        )
+        summary.check_user_counts(pause=0) # Counters for the bulk-created rows
+        print(f"{resources:,} resources over {users:,} users, pages of {PAGE} users")
+
+        def per_user():
+            return [(user.username, user.resource_set.filter(resource_type='PROJECT').count(),
+                     user.resource_set.filter(resource_type='PROGRAM').count())
+                    for user in CustomUser.objects.order_by('pk')[:PAGE]]
+
+        def annotated():
+            return list(CustomUser.objects.order_by('pk').annotate(
+                projects=Count('resource', filter=Q(resource__resource_type='PROJECT')),
+                programs=Count('resource', filter=Q(resource__resource_type='PROGRAM')),
+            ).values_list('username', 'projects', 'programs')[:PAGE])
+
+        def columns():
+            return list(CustomUser.objects.order_by('pk').values_list('username', 'project_count', 'program_count')[:PAGE])
+
+        assert per_user() == annotated() == columns()
+        report("COUNT per user (N+1)", measure(per_user, repeat=20))
+        report("annotate(Count)", measure(annotated, repeat=20))
+        report("counter columns", measure(columns, repeat=20))
+
+        def leaderboard_annotated():
+            return list(CustomUser.objects.annotate(projects=Count('resource', filter=Q(resource__resource_type='PROJECT')))
+                        .order_by('-projects', 'pk').values_list('username', 'projects')[:20])
+
+        def leaderboard_columns():
+            return list(CustomUser.objects.order_by('-project_count', 'pk').values_list('username', 'project_count')[:20])
+
+        assert leaderboard_annotated() == leaderboard_columns()
+        report("top 20, annotate(Count)", measure(leaderboard_annotated, repeat=20))
+        report("top 20, counter column", measure(leaderboard_columns, repeat=20))
+        report("check_resource_counts (no drift)", measure(lambda: summary.check_user_counts(pause=0), repeat=5))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000, int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
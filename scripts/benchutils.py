@@ -0,0 +1,42 @@
+# scripts/benchutils.py
+"""
+Shared helpers for the scripts/bench_*.py benchmarks.
+Run benchmarks from the project root, e.g.:  python scripts/bench_search.py
+"""
+
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# Shared with `manage.py benchmark`
+from portal.benchmark import isolated_runtime_state, percentile, throwaway_database  # noqa: E402
+
+
+def setup_django():
+    """Configures Django for a standalone script run from anywhere."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+    import django
+    django.setup()
+
+
+def measure(func, repeat=50):
+    """Calls func repeat times and returns per-call timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def report(label, timings):
+    """Prints a one-line latency summary for a list of millisecond timings."""
+    ordered = sorted(timings)
+    p95 = percentile(ordered, 0.95)
+    print(f"{label:<40} median {statistics.median(ordered):9.3f} ms   p95 {p95:9.3f} ms   n={len(ordered)}")